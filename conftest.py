@@ -0,0 +1,4 @@
+# Author: Chase Smith
+# GitHub username: ChaseSmith67
+# Description: Marks the repository root for pytest, so the tests can import the nes
+#               package without it being installed.
@@ -0,0 +1,34 @@
+# Author: Chase Smith
+# GitHub username: ChaseSmith67
+# Description: The NES emulator package. Importing it has no side effects and loads
+#               nothing else: the names below are imported from their modules the
+#               first time they are used, so a short-lived process only pays for
+#               the parts it touches.
+
+import importlib
+
+# Public name: module it lives in
+EXPORTS = {
+    "System": "main", "system_setup": "main",
+    "CPU": "cpu6502", "Memory": "cpu6502",
+    "Cartridge": "cartridge", "load_rom": "cartridge",
+    "PPU": "ppu", "APU": "apu", "Scheduler": "scheduler", "Controller": "controller",
+    "save_state": "savestate", "load_state": "savestate", "RewindBuffer": "savestate",
+    "assemble": "assembler", "assemble_file": "assembler",
+    "Tracer": "tracer", "Profiler": "profiler", "Debugger": "debugger", "IdleDetector": "idle",
+}
+
+__all__ = sorted(EXPORTS)
+
+
+def __getattr__(name: str):
+    """Imports an exported name's module the first time the name is looked up"""
+    if name not in EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{EXPORTS[name]}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list:
+    return sorted(set(globals()) | set(EXPORTS))
@@ -0,0 +1,9 @@
+# Author: Chase Smith
+# GitHub username: ChaseSmith67
+# Description: Entry point for "python -m nes".
+
+import sys
+
+from .main import main
+
+sys.exit(main())
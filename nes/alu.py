@@ -0,0 +1,62 @@
+# Author: Chase Smith
+# GitHub username: ChaseSmith67
+# Description: Precomputed results and status flags for the 6502's arithmetic,
+#               logic, shift and compare operations, so that each instruction
+#               updates the P register with one lookup and one mask.
+
+from .cache import cached
+
+# Bits of the Processor Status (P) Register
+FLAG_C = 0x01   # Carry Flag
+FLAG_Z = 0x02   # Zero Flag
+FLAG_I = 0x04   # Interrupt Disable
+FLAG_D = 0x08   # Decimal Mode Flag
+FLAG_B = 0x10   # Break Command (only exists on the Stack)
+FLAG_U = 0x20   # Unused, always pushed as 1
+FLAG_V = 0x40   # Overflow
+FLAG_N = 0x80   # Negative Flag
+
+# Masks that keep every flag except the ones an operation sets
+KEEP_NZ = ~(FLAG_N | FLAG_Z) & 0xFF
+KEEP_NZC = ~(FLAG_N | FLAG_Z | FLAG_C) & 0xFF
+KEEP_NVZ = ~(FLAG_N | FLAG_V | FLAG_Z) & 0xFF
+KEEP_NVZC = ~(FLAG_N | FLAG_V | FLAG_Z | FLAG_C) & 0xFF
+
+
+def nz(value: int) -> int:
+    """Returns the Negative and Zero flags for an 8-bit result. Negative is bit 7 of the
+        result, since the 6502 treats bytes as two's complement."""
+    return (value & FLAG_N) | (FLAG_Z if value == 0 else 0)
+
+
+# N and Z flags, indexed by the 8-bit result
+NZ = [nz(value) for value in range(256)]
+
+# (Result, N/Z/C flags) for ASL and LSR, indexed by the value shifted
+ASL = [((value << 1) & 0xFF, nz((value << 1) & 0xFF) | (value >> 7)) for value in range(256)]
+LSR = [(value >> 1, nz(value >> 1) | (value & FLAG_C)) for value in range(256)]
+
+# (Result, N/Z/C flags) for ROL and ROR, indexed by (carry << 8) | value
+ROL = [(((value << 1) & 0xFF) | carry, nz(((value << 1) & 0xFF) | carry) | (value >> 7))
+       for carry in (0, 1) for value in range(256)]
+ROR = [((value >> 1) | (carry << 7), nz((value >> 1) | (carry << 7)) | (value & FLAG_C))
+       for carry in (0, 1) for value in range(256)]
+
+
+def build_compare() -> list:
+    """Returns the N/Z/C flags of every comparison"""
+    return [nz((register - memory) & 0xFF) | (FLAG_C if register >= memory else 0)
+            for register in range(256) for memory in range(256)]
+
+
+# N/Z/C flags for CMP, CPX and CPY, indexed by (register << 8) | memory. With 64K
+# entries it is the slowest table to build, so it goes through the table cache.
+COMPARE = cached("compare", __file__, build_compare)
+
+
+def add(a_val: int, mem_val: int, carry: int) -> tuple:
+    """Returns the (result, N/V/Z/C flags) of adding two bytes and a carry, as ADC does.
+        SBC is the same addition with the memory value inverted."""
+    total = a_val + mem_val + carry
+    result = total & 0xFF
+    return result, NZ[result] | (total >> 8) | (((a_val ^ result) & (mem_val ^ result) & 0x80) >> 1)
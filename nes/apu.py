@@ -0,0 +1,797 @@
+# Author: Chase Smith
+# GitHub username: ChaseSmith67
+# Description: The 2A03 Audio Processing Unit. Register writes are logged with the
+#               cycle they happened on and a frame's audio is synthesized in one batch:
+#               each channel is generated with NumPy as arrays between writes, mixed
+#               through the nonlinear mixer tables and resampled to 44.1 or 48 kHz.
+
+import struct
+
+import numpy as np
+
+from .cache import cached
+from .cpu6502 import IRQ_FRAME, IRQ_DMC
+from .scheduler import Component
+
+CPU_RATE = 1789773      # NTSC CPU clock, Hz
+
+# Length counter values, indexed by the top 5 bits of $4003/$4007/$400B/$400F
+LENGTHS = [10, 254, 20, 2, 40, 4, 80, 6, 160, 8, 60, 10, 14, 12, 26, 14,
+           12, 16, 24, 18, 48, 20, 96, 22, 192, 24, 72, 26, 16, 28, 32, 30]
+
+# Pulse duty cycle sequences, and the triangle's 32-step sequence
+DUTY = np.array([[0, 1, 0, 0, 0, 0, 0, 0],
+                 [0, 1, 1, 0, 0, 0, 0, 0],
+                 [0, 1, 1, 1, 1, 0, 0, 0],
+                 [1, 0, 0, 1, 1, 1, 1, 1]], dtype=np.uint8)
+TRIANGLE = np.array(list(range(15, -1, -1)) + list(range(16)), dtype=np.uint8)
+
+# Timer periods in CPU cycles
+NOISE_PERIODS = [4, 8, 16, 32, 64, 96, 128, 160, 202, 254, 380, 508, 762, 1016, 2034, 4068]
+DMC_RATES = [428, 380, 340, 320, 286, 254, 226, 214, 190, 160, 142, 128, 106, 84, 72, 54]
+
+# Nonlinear mixer: pulse 1 + pulse 2, and 3 * triangle + 2 * noise + DMC, to output level
+PULSE_MIX = np.array([0.0] + [95.52 / (8128.0 / n + 100) for n in range(1, 31)], dtype=np.float32)
+TND_MIX = np.array([0.0] + [163.67 / (24329.0 / n + 100) for n in range(1, 203)], dtype=np.float32)
+
+# Frame sequencer steps, in CPU cycles from the $4017 write, for 4- and 5-step mode
+SEQUENCER_STEPS = ((7457, 14913, 22371, 29829), (7457, 14913, 22371, 37281))
+SEQUENCER_PERIODS = (29830, 37282)
+
+FRAME_IRQ_INHIBIT = 0x40
+BUFFER_CYCLES = 65536   # Cycles of channel output buffered before they must be mixed
+STATE_FORMAT = "<{}q"   # Savestates: every channel's fields, then the frame sequencer's
+
+# Sample numbers, sliced instead of calling np.arange for every span
+CYCLES = np.arange(BUFFER_CYCLES, dtype=np.int32)
+
+noise_tables = None
+
+
+def cycle_noise_states() -> list:
+    """
+    Returns, for each noise mode, the LFSR's states arranged by cycle: order lists
+    the states cycle after cycle, and for every state position is its index in order,
+    start the index of its cycle's first state and length that cycle's length. Any
+    number of steps from any state is then a single lookup.
+    """
+    tables = []
+    states = np.arange(0x8000)
+    for tap in (1, 6):
+        following = ((states >> 1) | (((states ^ (states >> tap)) & 1) << 14)).tolist()
+        order, position, start, length = [], [-1] * 0x8000, [0] * 0x8000, [0] * 0x8000
+        for first in range(0x8000):
+            if position[first] >= 0:
+                continue
+            cycle_start = len(order)
+            state = first
+            while position[state] < 0:
+                position[state] = len(order)
+                order.append(state)
+                state = following[state]
+            size = len(order) - cycle_start
+            for state in order[cycle_start:]:
+                start[state] = cycle_start
+                length[state] = size
+        tables.append((order, position, start, length))
+    return tables
+
+
+def build_noise_tables() -> list:
+    """Returns the noise tables, building them (or reading them from the table cache) the
+        first time a noise channel needs them"""
+    global noise_tables
+    if noise_tables is None:
+        noise_tables = [(np.array(order, dtype=np.int32), position, start, length)
+                        for order, position, start, length in cached("noise", __file__, cycle_noise_states)]
+    return noise_tables
+
+
+def clocks_in(cycles: int, countdown: int, period: int) -> int:
+    """Returns how many times a timer that next expires in countdown cycles, then every
+        period cycles, expires within the given number of cycles"""
+    return 0 if cycles < countdown else (cycles - countdown) // period + 1
+
+
+def clock_array(cycles: int, countdown: int, period: int) -> np.ndarray:
+    """Returns, for each of the given number of cycles, how many times the timer has
+        expired by then"""
+    clocks = CYCLES[:cycles] - (countdown - period)
+    np.maximum(clocks, 0, out=clocks)
+    clocks //= period
+    return clocks
+
+
+def next_countdown(cycles: int, countdown: int, period: int) -> int:
+    """Returns the timer's countdown after the given number of cycles"""
+    if cycles < countdown:
+        return countdown - cycles
+    return period - (cycles - countdown) % period
+
+
+class Envelope(object):
+    """
+    The volume envelope shared by the pulse and noise channels, also holding the
+    length counter halt flag (which doubles as the envelope loop flag)
+    """
+    FIELDS = ("halt", "constant", "volume", "start", "divider", "decay")
+
+    def __init__(self):
+        self.halt = 0
+        self.constant = 0
+        self.volume = 0
+        self.start = 0
+        self.divider = 0
+        self.decay = 0
+
+    def write_control(self, value: int) -> None:
+        """--LC VVVV: length halt/envelope loop, constant volume, volume or period"""
+        self.halt = (value >> 5) & 1
+        self.constant = (value >> 4) & 1
+        self.volume = value & 0x0F
+
+    def clock_envelope(self) -> None:
+        """Quarter frame: decays the envelope"""
+        if self.start:
+            self.start = 0
+            self.decay = 15
+            self.divider = self.volume
+        elif self.divider:
+            self.divider -= 1
+        else:
+            self.divider = self.volume
+            if self.decay:
+                self.decay -= 1
+            elif self.halt:
+                self.decay = 15
+
+    def envelope_level(self) -> int:
+        """The current volume"""
+        return self.volume if self.constant else self.decay
+
+
+class Pulse(Envelope):
+    """
+    A pulse channel ($4000-$4003 or $4004-$4007): an 8-step duty sequence clocked every
+    2 * (timer + 1) CPU cycles, with envelope, sweep and length counter
+    """
+    FIELDS = Envelope.FIELDS + ("enabled", "duty", "sweep_enabled", "sweep_period", "negate", "shift",
+                                "sweep_reload", "sweep_divider", "timer", "length", "step", "countdown")
+
+    def __init__(self, complement: int):
+        super().__init__()
+        self.complement = complement    # Pulse 1 negates with ones' complement
+        self.enabled = 0
+        self.duty = 0
+        self.sweep_enabled = 0
+        self.sweep_period = 0
+        self.negate = 0
+        self.shift = 0
+        self.sweep_reload = 0
+        self.sweep_divider = 0
+        self.timer = 0
+        self.length = 0
+        self.step = 0
+        self.countdown = 2
+
+    def write(self, register: int, value: int) -> None:
+        """Handles a write to one of the channel's four registers"""
+        if register == 0:
+            self.duty = value >> 6
+            self.write_control(value)
+        elif register == 1:
+            self.sweep_enabled = value >> 7
+            self.sweep_period = (value >> 4) & 0x07
+            self.negate = (value >> 3) & 1
+            self.shift = value & 0x07
+            self.sweep_reload = 1
+        elif register == 2:
+            self.timer = (self.timer & 0x700) | value
+        else:
+            self.timer = (self.timer & 0xFF) | ((value & 0x07) << 8)
+            if self.enabled:
+                self.length = LENGTHS[value >> 3]
+            self.step = 0
+            self.start = 1
+
+    def sweep_target(self) -> int:
+        """The period the sweep unit would set"""
+        change = self.timer >> self.shift
+        if self.negate:
+            return self.timer - change - self.complement
+        return self.timer + change
+
+    def clock_half(self) -> None:
+        """Half frame: length counter and sweep"""
+        if self.length and not self.halt:
+            self.length -= 1
+        target = self.sweep_target()
+        if (not self.sweep_divider and self.sweep_enabled and self.shift
+                and self.timer >= 8 and target <= 0x7FF):
+            self.timer = max(target, 0)
+        if not self.sweep_divider or self.sweep_reload:
+            self.sweep_divider = self.sweep_period
+            self.sweep_reload = 0
+        else:
+            self.sweep_divider -= 1
+
+    def run(self, cycles: int, out: np.ndarray | None) -> None:
+        """Advances the channel, writing its output level for each cycle to out"""
+        period = (self.timer + 1) * 2
+        if out is not None:
+            level = self.envelope_level()
+            if not self.length or self.timer < 8 or self.sweep_target() > 0x7FF or not level:
+                out[:cycles] = 0
+            else:
+                steps = clock_array(cycles, self.countdown, period)
+                steps += self.step
+                steps &= 7
+                np.take(DUTY[self.duty] * level, steps, out=out[:cycles])
+        self.step = (self.step + clocks_in(cycles, self.countdown, period)) & 7
+        self.countdown = next_countdown(cycles, self.countdown, period)
+
+
+class Triangle(object):
+    """
+    The triangle channel ($4008-$400B): a 32-step sequence clocked every timer + 1 CPU
+    cycles while both the length and linear counters are non-zero. Periods below 2
+    are ultrasonic and hold the output where it is.
+    """
+    FIELDS = ("enabled", "control", "reload_value", "linear", "linear_reload", "timer", "length", "step",
+              "countdown")
+
+    def __init__(self):
+        self.enabled = 0
+        self.control = 0        # Length halt and linear counter control
+        self.reload_value = 0
+        self.linear = 0
+        self.linear_reload = 0
+        self.timer = 0
+        self.length = 0
+        self.step = 0
+        self.countdown = 1
+
+    def write(self, register: int, value: int) -> None:
+        """Handles a write to $4008, $400A or $400B"""
+        if register == 0:
+            self.control = value >> 7
+            self.reload_value = value & 0x7F
+        elif register == 2:
+            self.timer = (self.timer & 0x700) | value
+        elif register == 3:
+            self.timer = (self.timer & 0xFF) | ((value & 0x07) << 8)
+            if self.enabled:
+                self.length = LENGTHS[value >> 3]
+            self.linear_reload = 1
+
+    def clock_quarter(self) -> None:
+        """Quarter frame: linear counter"""
+        if self.linear_reload:
+            self.linear = self.reload_value
+        elif self.linear:
+            self.linear -= 1
+        if not self.control:
+            self.linear_reload = 0
+
+    def clock_half(self) -> None:
+        """Half frame: length counter"""
+        if self.length and not self.control:
+            self.length -= 1
+
+    def run(self, cycles: int, out: np.ndarray | None) -> None:
+        """Advances the channel, writing its output level for each cycle to out"""
+        if not self.length or not self.linear or self.timer < 2:
+            if out is not None:
+                out[:cycles] = TRIANGLE[self.step]
+            return
+        period = self.timer + 1
+        if out is not None:
+            steps = clock_array(cycles, self.countdown, period)
+            steps += self.step
+            steps &= 31
+            np.take(TRIANGLE, steps, out=out[:cycles])
+        self.step = (self.step + clocks_in(cycles, self.countdown, period)) & 31
+        self.countdown = next_countdown(cycles, self.countdown, period)
+
+
+class Noise(Envelope):
+    """
+    The noise channel ($400C-$400F): a 15-bit LFSR clocked at one of 16 periods, with
+    envelope and length counter. The LFSR is stepped through precomputed tables of its
+    cycles rather than one shift at a time.
+    """
+    FIELDS = Envelope.FIELDS + ("enabled", "mode", "period", "length", "lfsr", "countdown")
+
+    def __init__(self):
+        super().__init__()
+        self.enabled = 0
+        self.mode = 0
+        self.period = NOISE_PERIODS[0]
+        self.length = 0
+        self.lfsr = 1
+        self.countdown = NOISE_PERIODS[0]
+
+    def write(self, register: int, value: int) -> None:
+        """Handles a write to $400C, $400E or $400F"""
+        if register == 0:
+            self.write_control(value)
+        elif register == 2:
+            self.mode = value >> 7
+            self.period = NOISE_PERIODS[value & 0x0F]
+        elif register == 3:
+            if self.enabled:
+                self.length = LENGTHS[value >> 3]
+            self.start = 1
+
+    def clock_half(self) -> None:
+        """Half frame: length counter"""
+        if self.length and not self.halt:
+            self.length -= 1
+
+    def run(self, cycles: int, out: np.ndarray | None) -> None:
+        """Advances the channel, writing its output level for each cycle to out"""
+        order, position, start, length = build_noise_tables()[self.mode]
+        lfsr = self.lfsr
+        first, size = start[lfsr], length[lfsr]
+        offset = position[lfsr] - first
+        if out is not None:
+            level = self.envelope_level() if self.length else 0
+            if not level:
+                out[:cycles] = 0
+            else:
+                steps = clock_array(cycles, self.countdown, self.period)
+                steps += offset
+                steps %= size
+                steps += first
+                states = order[steps]
+                states &= 1
+                np.subtract(level, states * level, out=out[:cycles], casting="unsafe")
+        clocks = clocks_in(cycles, self.countdown, self.period)
+        self.lfsr = int(order[first + (offset + clocks) % size])
+        self.countdown = next_countdown(cycles, self.countdown, self.period)
+
+
+class DMC(object):
+    """
+    The delta modulation channel ($4010-$4013): 1-bit deltas from sample bytes read
+    over the CPU bus move a 7-bit level up or down by 2. Deltas are applied one bit
+    clock at a time (at most a few hundred per frame) and then spread over the cycles.
+    Sample bytes are read when the batch is synthesized, so a bank switch part way
+    through a frame is seen at the end of that frame.
+    """
+    FIELDS = ("irq_enabled", "loop", "rate", "level", "sample_address", "sample_length", "address",
+              "remaining", "shift", "bits", "buffer", "silence", "countdown", "irq")
+
+    def __init__(self, read):
+        self.read = read
+        self.irq_enabled = 0
+        self.loop = 0
+        self.rate = DMC_RATES[0]
+        self.level = 0
+        self.sample_address = 0xC000
+        self.sample_length = 1
+        self.address = 0xC000
+        self.remaining = 0
+        self.shift = 0
+        self.bits = 8
+        self.buffer = -1        # Sample buffer, -1 when empty
+        self.silence = 1
+        self.countdown = DMC_RATES[0]
+        self.irq = 0
+
+    def write(self, register: int, value: int) -> None:
+        """Handles a write to $4010-$4013"""
+        if register == 0:
+            self.irq_enabled = value >> 7
+            self.loop = (value >> 6) & 1
+            self.rate = DMC_RATES[value & 0x0F]
+            if not self.irq_enabled:
+                self.irq = 0
+        elif register == 1:
+            self.level = value & 0x7F
+        elif register == 2:
+            self.sample_address = 0xC000 | (value << 6)
+        else:
+            self.sample_length = (value << 4) + 1
+
+    def restart(self) -> None:
+        """Starts the sample from its beginning"""
+        self.address = self.sample_address
+        self.remaining = self.sample_length
+
+    def fetch(self) -> None:
+        """Fills the sample buffer from memory, if there are bytes left to read"""
+        if self.buffer < 0 and self.remaining:
+            self.buffer = self.read(self.address)
+            self.address = 0x8000 if self.address == 0xFFFF else self.address + 1
+            self.remaining -= 1
+            if not self.remaining:
+                if self.loop:
+                    self.restart()
+                elif self.irq_enabled:
+                    self.irq = 1
+
+    def irq_cycles(self) -> int | None:
+        """Cycles from now until the last byte of the sample is read (raising the IRQ),
+            or None if the sample won't end with an IRQ"""
+        if not self.irq_enabled or self.loop or not self.remaining:
+            return None
+        return self.countdown + (self.bits - 1 + 8 * (self.remaining - 1)) * self.rate
+
+    def run(self, cycles: int, out: np.ndarray | None) -> None:
+        """Advances the channel, writing its output level for each cycle to out"""
+        clocks = clocks_in(cycles, self.countdown, self.rate)
+        if self.silence and self.buffer < 0 and not self.remaining:
+            # Idle: the output unit only counts bits
+            self.bits = (self.bits - clocks - 1) % 8 + 1
+        elif clocks:
+            levels = [self.level]
+            level, shift, bits, silence = self.level, self.shift, self.bits, self.silence
+            for _ in range(clocks):
+                if not silence:
+                    if shift & 1:
+                        if level <= 125:
+                            level += 2
+                    elif level >= 2:
+                        level -= 2
+                shift >>= 1
+                bits -= 1
+                if not bits:
+                    bits = 8
+                    if self.buffer < 0:
+                        silence = 1
+                    else:
+                        shift, silence = self.buffer, 0
+                        self.buffer = -1
+                        self.fetch()
+                levels.append(level)
+            self.level, self.shift, self.bits, self.silence = level, shift, bits, silence
+            if out is not None:
+                np.take(np.array(levels, dtype=np.uint8), clock_array(cycles, self.countdown, self.rate),
+                        out=out[:cycles])
+                out = None
+        if out is not None:
+            out[:cycles] = self.level
+        self.countdown = next_countdown(cycles, self.countdown, self.rate)
+
+
+class Resampler(object):
+    """
+    Band-limited conversion from the CPU clock to an audio rate. Levels are first
+    averaged over blocks of `decimation` cycles (a box filter), then each output sample
+    is interpolated with a Blackman-windowed sinc low-pass at about 20 kHz, read from a
+    table of `phases` fractional offsets. Finally the NES's own high-pass filters are
+    applied, vectorized over blocks of samples.
+    """
+    def __init__(self, rate: int, clock: int = CPU_RATE, decimation: int = 16, zeros: int = 8,
+                 phases: int = 256, high_pass: tuple = (90.0, 440.0)):
+        self.rate = rate
+        self.decimation = decimation
+        middle = clock / decimation
+        self.step = middle / rate           # Intermediate samples per output sample
+        cutoff = min(20000.0, 0.45 * rate) / middle
+        self.half = int(np.ceil(zeros / (2 * cutoff)))
+        self.taps = np.arange(-self.half + 1, self.half + 1)
+        self.phases = phases
+        distance = self.taps[None, :] - (np.arange(phases) / phases)[:, None]
+        window = (0.42 + 0.5 * np.cos(np.pi * distance / self.half)
+                  + 0.08 * np.cos(2 * np.pi * distance / self.half))
+        kernel = np.sinc(2 * cutoff * distance) * window
+        self.kernel = kernel / kernel.sum(axis=1, keepdims=True)
+
+        self.carry = np.zeros(0, dtype=np.float32)      # Cycles short of a whole block
+        self.history = np.zeros(self.half, dtype=np.float64)
+        self.position = float(self.half - 1)            # Next output sample, in history
+        # Per filter: coefficient, last input, last output
+        self.filters = [[float(np.exp(-2 * np.pi * frequency / rate)), 0.0, 0.0] for frequency in high_pass]
+
+    def process(self, levels: np.ndarray) -> np.ndarray:
+        """Returns the output samples (as floats) for levels at the CPU clock"""
+        data = np.concatenate((self.carry, levels)) if self.carry.size else levels
+        blocks = data.size // self.decimation
+        self.carry = data[blocks * self.decimation:].copy()
+        middle = data[:blocks * self.decimation].reshape(blocks, self.decimation).mean(axis=1)
+        buffer = np.concatenate((self.history, middle))
+
+        count = max(0, int(np.ceil((buffer.size - self.half - self.position) / self.step)))
+        positions = self.position + np.arange(count) * self.step
+        base = positions.astype(np.intp)
+        phase = ((positions - base) * self.phases).astype(np.intp)
+        samples = np.einsum("ij,ij->i", buffer[base[:, None] + self.taps], self.kernel[phase])
+
+        self.position += count * self.step
+        drop = min(max(int(self.position) - self.half + 1, 0), buffer.size)
+        self.history = buffer[drop:]
+        self.position -= drop
+        for state in self.filters:
+            samples = self.high_pass(samples, state)
+        return samples
+
+    @staticmethod
+    def high_pass(samples: np.ndarray, state: list, block: int = 512) -> np.ndarray:
+        """First-order high-pass, y[n] = a * (y[n-1] + x[n] - x[n-1]). Unrolled, y[n] is
+            a^n * (y[0] + the sum of a^(1-k) * (x[k] - x[k-1])), a cumulative sum, so
+            it is computed over blocks short enough for a^-n to stay representable."""
+        a, last_input, last_output = state
+        result = np.empty_like(samples)
+        for start in range(0, samples.size, block):
+            chunk = samples[start:start + block]
+            powers = a ** np.arange(1, chunk.size + 1)
+            deltas = np.diff(chunk, prepend=last_input)
+            output = powers * (last_output + np.cumsum(deltas * (a / powers)))
+            result[start:start + chunk.size] = output
+            last_input, last_output = chunk[-1], output[-1]
+        state[1], state[2] = last_input, last_output
+        return result
+
+
+class APU(Component):
+    """
+    Represents the Audio Processing Unit, as a scheduler Component.
+
+    Writes to the channel registers aren't synced: they are logged with the cycle they
+    happened on, and the APU is only brought up to date when $4015 is read, an IRQ
+    event needs it or the frame ends. Catching up walks the log and the frame
+    sequencer's steps in order; between any two of them every channel's parameters
+    are fixed, so each channel is generated for the whole span as NumPy arrays. $4015,
+    $4010 and $4017 writes catch up first and take effect straight away, as they decide
+    when IRQs are due.
+
+    end_frame() mixes what has been generated through the nonlinear mixer tables,
+    resamples it and calls output_listeners with the APU and the int16 samples.
+    Nothing is generated (only channel state advanced) while output is disabled or
+    nobody is listening.
+    """
+    def __init__(self, scheduler, memory, rate: int = 44100):
+        super().__init__()
+        self.scheduler = scheduler
+        self.cpu = scheduler.cpu
+        self.pulse_1 = Pulse(1)
+        self.pulse_2 = Pulse(0)
+        self.triangle = Triangle()
+        self.noise = Noise()
+        self.dmc = DMC(memory.read_mem)
+        self.channels = (self.pulse_1, self.pulse_2, self.triangle, self.noise, self.dmc)
+        self.writes = []        # (cycle, address, value) not yet applied
+
+        # Frame sequencer
+        self.mode = 0
+        self.inhibit = 0
+        self.frame_irq = 0
+        self.origin = 0         # Cycle the current sequence started on
+        self.sequencer_step = 0
+        self.next_step = SEQUENCER_STEPS[0][0]
+
+        # Output: each channel's level for every cycle since the last mix
+        self.levels = np.zeros((5, BUFFER_CYCLES), dtype=np.uint8)
+        self.filled = 0
+        self.resampler = Resampler(rate)
+        self.rate = rate
+        self.output_listeners = []
+        self.output_enabled = True
+
+        self.frame_irq_event = None
+        self.dmc_irq_event = None
+        # At power-on the sequencer runs in 4-step mode with the frame IRQ enabled
+        self.schedule_frame_irq()
+
+    # ----- Savestates
+
+    def save_state(self) -> bytes:
+        """Returns every channel's state and the frame sequencer's as a fixed-size block"""
+        self.catch_up(self.scheduler.now)
+        values = [getattr(channel, name) for channel in self.channels for name in channel.FIELDS]
+        values += [self.mode, self.inhibit, self.frame_irq, self.origin, self.sequencer_step, self.next_step]
+        return struct.pack(STATE_FORMAT.format(len(values)), *values)
+
+    def load_state(self, data) -> None:
+        """Restores a block from save_state(). Audio not yet mixed is dropped and the IRQ
+            events are scheduled again, so the scheduler's queue must have been cleared."""
+        count = len(data) // 8
+        values = list(struct.unpack(STATE_FORMAT.format(count), data))
+        for channel in self.channels:
+            for name in channel.FIELDS:
+                setattr(channel, name, values.pop(0))
+        self.mode, self.inhibit, self.frame_irq, self.origin, self.sequencer_step, self.next_step = values
+        self.writes.clear()
+        self.filled = 0
+        self.update_irq()
+        self.schedule_frame_irq()
+        self.schedule_dmc_irq()
+
+    # ----- Registers ($4000-$4013, $4015, $4017)
+
+    def write_register(self, address: int, value: int) -> None:
+        """Handles a CPU write to an APU register"""
+        if address in (0x4010, 0x4015, 0x4017):
+            self.catch_up(self.scheduler.now)
+            self.apply(address, value)
+            self.update_irq()
+            if address == 0x4017:
+                self.schedule_frame_irq()
+            self.schedule_dmc_irq()
+        else:
+            self.writes.append((self.scheduler.now, address, value))
+
+    def read_status(self, address: int) -> int:
+        """$4015: length counters running, DMC active and the IRQ flags. Reading clears
+            the frame IRQ flag, acknowledging its IRQ."""
+        value = ((self.pulse_1.length > 0) | (self.pulse_2.length > 0) << 1 | (self.triangle.length > 0) << 2
+                 | (self.noise.length > 0) << 3 | (self.dmc.remaining > 0) << 4
+                 | self.frame_irq << 6 | self.dmc.irq << 7)
+        self.frame_irq = 0
+        self.cpu.set_irq(IRQ_FRAME, False)
+        return value
+
+    def apply(self, address: int, value: int) -> None:
+        """Carries out a register write at the APU's current cycle"""
+        if address < 0x4008:
+            (self.pulse_1 if address < 0x4004 else self.pulse_2).write(address & 0x03, value)
+        elif address < 0x400C:
+            self.triangle.write(address & 0x03, value)
+        elif address < 0x4010:
+            self.noise.write(address & 0x03, value)
+        elif address < 0x4014:
+            self.dmc.write(address & 0x03, value)
+        elif address == 0x4015:
+            for bit, channel in enumerate(self.channels[:4]):
+                channel.enabled = (value >> bit) & 1
+                if not channel.enabled:
+                    channel.length = 0
+            dmc = self.dmc
+            dmc.irq = 0
+            if not value & 0x10:
+                dmc.remaining = 0
+            elif not dmc.remaining:
+                dmc.restart()
+                dmc.fetch()
+        elif address == 0x4017:
+            self.mode = value >> 7
+            self.inhibit = 1 if value & FRAME_IRQ_INHIBIT else 0
+            if self.inhibit:
+                self.frame_irq = 0
+            self.origin = self.cycle
+            self.sequencer_step = 0
+            self.next_step = self.origin + SEQUENCER_STEPS[self.mode][0]
+            if self.mode:
+                self.clock_quarter()
+                self.clock_half()
+
+    # ----- Frame sequencer and IRQs
+
+    def clock_quarter(self) -> None:
+        """Quarter frame: envelopes and the triangle's linear counter"""
+        self.pulse_1.clock_envelope()
+        self.pulse_2.clock_envelope()
+        self.triangle.clock_quarter()
+        self.noise.clock_envelope()
+
+    def clock_half(self) -> None:
+        """Half frame: length counters and sweeps"""
+        self.pulse_1.clock_half()
+        self.pulse_2.clock_half()
+        self.triangle.clock_half()
+        self.noise.clock_half()
+
+    def sequence(self) -> None:
+        """Carries out the frame sequencer step that is due"""
+        step = self.sequencer_step
+        self.clock_quarter()
+        if step & 1:
+            self.clock_half()
+        if step == 3:
+            if not self.mode and not self.inhibit:
+                self.frame_irq = 1
+            self.origin += SEQUENCER_PERIODS[self.mode]
+        self.sequencer_step = (step + 1) & 3
+        self.next_step = self.origin + SEQUENCER_STEPS[self.mode][self.sequencer_step]
+
+    def schedule_frame_irq(self) -> None:
+        """Schedules the next frame IRQ, in 4-step mode with IRQs not inhibited"""
+        if self.frame_irq_event is not None:
+            self.scheduler.cancel(self.frame_irq_event)
+            self.frame_irq_event = None
+        if not self.mode and not self.inhibit:
+            cycle = self.origin + SEQUENCER_STEPS[0][3]
+            if cycle < self.cycle:
+                cycle += SEQUENCER_PERIODS[0]
+            self.frame_irq_event = self.scheduler.schedule(cycle, self.raise_frame_irq, "frame irq")
+
+    def update_irq(self) -> None:
+        """Holds the CPU's IRQ line for each of the frame and DMC IRQ flags that is set,
+            and releases it for each that isn't"""
+        cpu = self.cpu
+        cpu.set_irq(IRQ_FRAME, self.frame_irq)
+        cpu.set_irq(IRQ_DMC, self.dmc.irq)
+
+    def raise_frame_irq(self, cycle: int) -> None:
+        """Frame IRQ event: holds the IRQ line once the flag is set, until $4015 is read
+            or $4017 inhibits it"""
+        self.catch_up(cycle)
+        self.update_irq()
+        self.frame_irq_event = None
+        self.schedule_frame_irq()
+
+    def schedule_dmc_irq(self) -> None:
+        """Schedules an event for when the playing sample raises its IRQ, if it will"""
+        if self.dmc_irq_event is not None:
+            self.scheduler.cancel(self.dmc_irq_event)
+            self.dmc_irq_event = None
+        cycles = self.dmc.irq_cycles()
+        if cycles is not None:
+            self.dmc_irq_event = self.scheduler.schedule(self.cycle + cycles, self.raise_dmc_irq, "dmc irq")
+
+    def raise_dmc_irq(self, cycle: int) -> None:
+        """DMC IRQ event: holds the IRQ line if the sample has ended, until a $4015
+            write or disabling the IRQ in $4010 acknowledges it"""
+        self.catch_up(cycle)
+        self.dmc_irq_event = None
+        self.update_irq()
+        if not self.dmc.irq:
+            self.schedule_dmc_irq()
+
+    # ----- Synthesis
+
+    def run_until(self, cycle: int) -> None:
+        """Generates every channel from self.cycle to the given cycle, applying logged
+            writes and frame sequencer steps where they fall"""
+        writes = self.writes
+        index = 0
+        now = self.cycle
+        while True:
+            boundary = min(cycle, self.next_step)
+            if index < len(writes) and writes[index][0] < boundary:
+                boundary = writes[index][0]
+            if boundary > now:
+                self.generate(boundary - now)
+                now = boundary
+            self.cycle = now
+            if index < len(writes) and writes[index][0] <= now:
+                _, address, value = writes[index]
+                self.apply(address, value)
+                index += 1
+            elif self.next_step <= now:
+                self.sequence()
+            elif now >= cycle:
+                break
+        del writes[:index]
+
+    def generate(self, cycles: int) -> None:
+        """Runs every channel for the given number of cycles, keeping their output if
+            anyone is listening"""
+        if not (self.output_enabled and self.output_listeners):
+            for channel in self.channels:
+                channel.run(cycles, None)
+            return
+        while cycles:
+            if self.filled == BUFFER_CYCLES:
+                self.mix()
+            span = min(cycles, BUFFER_CYCLES - self.filled)
+            for channel, levels in zip(self.channels, self.levels):
+                channel.run(span, levels[self.filled:])
+            self.filled += span
+            cycles -= span
+
+    def mix(self) -> np.ndarray:
+        """Mixes and resamples the buffered channel output, returning int16 samples"""
+        count = self.filled
+        self.filled = 0
+        pulse_1, pulse_2, triangle, noise, dmc = (levels[:count] for levels in self.levels)
+        pulse = PULSE_MIX[pulse_1 + pulse_2]
+        tnd = triangle * 3
+        tnd += noise * 2
+        tnd += dmc
+        mixed = pulse + TND_MIX[tnd]
+        samples = self.resampler.process(mixed)
+        samples *= 30000.0
+        np.clip(samples, -32768, 32767, out=samples)
+        samples = samples.astype(np.int16)
+        for listener in self.output_listeners:
+            listener(self, samples)
+        return samples
+
+    def end_frame(self) -> None:
+        """Brings the APU up to the current cycle and outputs the frame's audio"""
+        self.catch_up(self.scheduler.now)
+        if self.filled:
+            self.mix()
@@ -0,0 +1,512 @@
+# Author: Chase Smith
+# GitHub username: ChaseSmith67
+# Description: A two-pass 6502 assembler for writing test programs. Supports labels,
+#               constants, expressions, every addressing mode and the .org, .byte,
+#               .word and .include directives. Parsed files are cached by content
+#               hash, so re-assembling generated programs only re-parses what changed.
+
+import hashlib
+import os
+import re
+from collections import OrderedDict
+
+from .instructions import instructions, OPCODES, IMP, ACC, IMM, ZP, ZPX, ZPY, ABS, ABX, ABY, IND, IZX, IZY, REL
+
+# Zero page and absolute forms of each addressing mode family
+PLAIN = (ZP, ABS)
+X_INDEXED = (ZPX, ABX)
+Y_INDEXED = (ZPY, ABY)
+
+LENGTHS = {mode: length for _, mode, length, _, _ in OPCODES.values()}
+
+TOKEN = re.compile(r"\s*(?:(\$[0-9A-Fa-f]+)|(%[01]+)|(\d+)|'(.)'|([A-Za-z_.@][\w.@]*)|(<<|>>|[-+*/&|^~()<>]))")
+LABEL = re.compile(r"\s*([A-Za-z_.@][\w.@]*):")
+CONSTANT = re.compile(r"\s*([A-Za-z_.@][\w.@]*)\s*=\s*(.+)$")
+IZX_OPERAND = re.compile(r"\((.*),\s*[xX]\s*\)$")
+IZY_OPERAND = re.compile(r"\((.*)\)\s*,\s*[yY]$")
+INDEXED_OPERAND = re.compile(r"(.*),\s*([xXyY])$")
+
+# Binary operator precedence, loosest first
+PRECEDENCE = {"|": 1, "^": 2, "&": 3, "<<": 4, ">>": 4, "+": 5, "-": 5, "*": 6, "/": 6}
+
+
+class AssemblyError(ValueError):
+    """An error in the source, reported with its file and line"""
+    def __init__(self, message: str, where: tuple = None):
+        if where is not None:
+            message = f"{where[0]}:{where[1]}: {message}"
+        super().__init__(message)
+
+
+class Unresolved(Exception):
+    """Raised while evaluating an expression that uses a symbol not yet defined"""
+    pass
+
+
+class Program(object):
+    """
+    Assembled output: data is one contiguous image starting at origin (gaps between
+    .org blocks are filled), and symbols maps every label and constant to its value.
+    """
+    def __init__(self, origin: int, data: bytes, symbols: dict):
+        self.origin = origin
+        self.data = data
+        self.symbols = symbols
+
+    def load_into(self, bus) -> None:
+        """Writes the image into a bus at its origin"""
+        bus.load(self.origin, self.data)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+
+# ----- Expressions
+# Parsed to nested tuples: ("num", value), ("sym", name), ("pc",), ("neg"|"not"|"lo"|"hi", a)
+# and (operator, a, b)
+
+def tokenize(text: str, where: tuple) -> list:
+    """Splits an expression into (kind, value) tokens"""
+    tokens = []
+    position = 0
+    text = text.rstrip()
+    while position < len(text):
+        match = TOKEN.match(text, position)
+        if match is None:
+            raise AssemblyError(f"Can't parse expression {text!r}", where)
+        hexadecimal, binary, decimal, char, name, operator = match.groups()
+        if hexadecimal:
+            tokens.append(("num", int(hexadecimal[1:], 16)))
+        elif binary:
+            tokens.append(("num", int(binary[1:], 2)))
+        elif decimal:
+            tokens.append(("num", int(decimal)))
+        elif char is not None:
+            tokens.append(("num", ord(char)))
+        elif name:
+            tokens.append(("sym", name))
+        else:
+            tokens.append(("op", operator))
+        position = match.end()
+    return tokens
+
+
+def parse_expression(text: str, where: tuple) -> tuple:
+    """Parses an expression into a tree"""
+    tokens = tokenize(text, where)
+    if not tokens:
+        raise AssemblyError("Missing expression", where)
+    tree, position = parse_binary(tokens, 0, 0, where)
+    if position != len(tokens):
+        raise AssemblyError(f"Unexpected {tokens[position][1]!r} in {text!r}", where)
+    return tree
+
+
+def parse_binary(tokens: list, position: int, minimum: int, where: tuple) -> tuple:
+    """Precedence-climbing parser for binary operators"""
+    left, position = parse_unary(tokens, position, where)
+    while position < len(tokens):
+        kind, value = tokens[position]
+        precedence = PRECEDENCE.get(value) if kind == "op" else None
+        if precedence is None or precedence <= minimum:
+            break
+        right, position = parse_binary(tokens, position + 1, precedence, where)
+        left = (value, left, right)
+    return left, position
+
+
+def parse_unary(tokens: list, position: int, where: tuple) -> tuple:
+    """Parses a number, symbol, *, parenthesized expression or unary operator"""
+    if position >= len(tokens):
+        raise AssemblyError("Expression ends early", where)
+    kind, value = tokens[position]
+    if kind == "num":
+        return ("num", value), position + 1
+    if kind == "sym":
+        return ("sym", value), position + 1
+    if value == "*":
+        return ("pc",), position + 1
+    if value == "(":
+        tree, position = parse_binary(tokens, position + 1, 0, where)
+        if position >= len(tokens) or tokens[position][1] != ")":
+            raise AssemblyError("Missing )", where)
+        return tree, position + 1
+    unary = {"-": "neg", "~": "not", "<": "lo", ">": "hi"}.get(value)
+    if unary is None:
+        raise AssemblyError(f"Unexpected {value!r}", where)
+    operand, position = parse_unary(tokens, position + 1, where)
+    return (unary, operand), position
+
+
+def evaluate(tree: tuple, symbols: dict, pc: int) -> int:
+    """Evaluates an expression tree. Raises Unresolved for undefined symbols."""
+    kind = tree[0]
+    if kind == "num":
+        return tree[1]
+    if kind == "sym":
+        if tree[1] not in symbols:
+            raise Unresolved(tree[1])
+        return symbols[tree[1]]
+    if kind == "pc":
+        return pc
+    if len(tree) == 2:
+        value = evaluate(tree[1], symbols, pc)
+        if kind == "neg":
+            return -value
+        if kind == "not":
+            return ~value
+        return value & 0xFF if kind == "lo" else (value >> 8) & 0xFF
+    a, b = evaluate(tree[1], symbols, pc), evaluate(tree[2], symbols, pc)
+    if kind == "+":
+        return a + b
+    if kind == "-":
+        return a - b
+    if kind == "*":
+        return a * b
+    if kind == "/":
+        return a // b
+    if kind == "&":
+        return a & b
+    if kind == "|":
+        return a | b
+    if kind == "^":
+        return a ^ b
+    return a << b if kind == "<<" else a >> b
+
+
+# ----- Source parsing
+
+def strip_comment(line: str) -> str:
+    """Removes a ; comment, ignoring semicolons inside quotes"""
+    quote = None
+    for index, char in enumerate(line):
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in "\"'":
+            quote = char
+        elif char == ";":
+            return line[:index]
+    return line
+
+
+def split_arguments(text: str) -> list:
+    """Splits a directive's arguments on commas outside quotes"""
+    arguments, current, quote = [], [], None
+    for char in text:
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in "\"'":
+            quote = char
+        elif char == ",":
+            arguments.append("".join(current).strip())
+            current = []
+            continue
+        current.append(char)
+    arguments.append("".join(current).strip())
+    return [argument for argument in arguments if argument]
+
+
+def parse_operand(mnemonic: str, operand: str, where: tuple) -> tuple:
+    """Returns (mode family, expression tree) for an instruction's operand. The family
+        is a single mode, or a (zero page, absolute) pair chosen between in pass 1."""
+    modes = instructions[mnemonic]
+    if not operand:
+        if IMP in modes:
+            return IMP, None
+        if ACC in modes:
+            return ACC, None
+        raise AssemblyError(f"{mnemonic} needs an operand", where)
+    if operand.upper() == "A" and ACC in modes:
+        return ACC, None
+    if operand.startswith("#"):
+        return IMM, parse_expression(operand[1:], where)
+    match = IZX_OPERAND.match(operand)
+    if match:
+        return IZX, parse_expression(match.group(1), where)
+    match = IZY_OPERAND.match(operand)
+    if match:
+        return IZY, parse_expression(match.group(1), where)
+    match = INDEXED_OPERAND.match(operand)
+    if match:
+        family = X_INDEXED if match.group(2) in "xX" else Y_INDEXED
+        return family, parse_expression(match.group(1), where)
+    if IND in modes and operand.startswith("(") and operand.endswith(")"):
+        return IND, parse_expression(operand[1:-1], where)
+    if REL in modes:
+        return REL, parse_expression(operand, where)
+    return PLAIN, parse_expression(operand, where)
+
+
+def parse_source(text: str, name: str) -> tuple:
+    """Parses source text into a tuple of statements:
+        ("label", where, name)                 a label at the current address
+        ("const", where, name, tree)           name = expression
+        ("org", where, tree)
+        ("byte", where, items)                 items are trees or bytes from strings
+        ("word", where, trees)
+        ("include", where, path)
+        ("op", where, mnemonic, family, tree)"""
+    statements = []
+    for number, line in enumerate(text.splitlines(), 1):
+        where = (name, number)
+        line = strip_comment(line)
+        match = CONSTANT.match(line)
+        if match:
+            statements.append(("const", where, match.group(1), parse_expression(match.group(2), where)))
+            continue
+        match = LABEL.match(line)
+        while match:
+            statements.append(("label", where, match.group(1)))
+            line = line[match.end():]
+            match = LABEL.match(line)
+        line = line.strip()
+        if not line:
+            continue
+        word, *rest = line.split(None, 1)
+        keyword, rest = word.lower(), rest[0].strip() if rest else ""
+        if keyword == ".org":
+            statements.append(("org", where, parse_expression(rest, where)))
+        elif keyword in (".byte", ".db"):
+            items = []
+            for argument in split_arguments(rest):
+                if argument.startswith('"'):
+                    if len(argument) < 2 or not argument.endswith('"'):
+                        raise AssemblyError(f"Unterminated string {argument}", where)
+                    items.append(argument[1:-1].encode("ascii"))
+                else:
+                    items.append(parse_expression(argument, where))
+            statements.append(("byte", where, tuple(items)))
+        elif keyword in (".word", ".dw"):
+            statements.append(("word", where, tuple(parse_expression(argument, where)
+                                                    for argument in split_arguments(rest))))
+        elif keyword == ".include":
+            statements.append(("include", where, rest.strip('"')))
+        else:
+            mnemonic = word.upper()
+            if mnemonic not in instructions:
+                raise AssemblyError(f"Unknown instruction or directive {word!r}", where)
+            family, tree = parse_operand(mnemonic, rest, where)
+            statements.append(("op", where, mnemonic, family, tree))
+    return tuple(statements)
+
+
+class Assembler(object):
+    """
+    Assembles source text into a Program. Parsed statements are cached by the SHA-1 of
+    each file's contents, so the same include pulled into many programs (or a program
+    that didn't change) is only parsed once per Assembler. The cache holds at most
+    max_files files, evicting the least recently used.
+
+    files maps include names to source text, for programs generated in memory; other
+    includes are read from disk relative to the including file, then include_paths.
+    """
+    def __init__(self, include_paths: list = None, files: dict = None, fill: int = 0x00, max_files: int = 256):
+        self.include_paths = list(include_paths or [])
+        self.files = dict(files or {})
+        self.fill = fill
+        self.max_files = max_files
+        self.cache = OrderedDict()
+        self.parses = 0
+
+    def parse(self, text: str, name: str) -> tuple:
+        """Returns the parsed statements of a file, from the cache if its contents were
+            seen before"""
+        key = hashlib.sha1(text.encode()).digest()
+        cache = self.cache
+        statements = cache.get(key)
+        if statements is None:
+            statements = parse_source(text, name)
+            cache[key] = statements
+            self.parses += 1
+            while len(cache) > self.max_files:
+                cache.popitem(last=False)
+            return statements
+        cache.move_to_end(key)
+        if statements and statements[0][1][0] != name:
+            # Same contents under another name: reparse so errors name the right file
+            statements = parse_source(text, name)
+        return statements
+
+    def read_include(self, path: str, parent: str, where: tuple) -> tuple:
+        """Returns (name, text) of an included file"""
+        if path in self.files:
+            return path, self.files[path]
+        directories = [os.path.dirname(parent)] + self.include_paths
+        for directory in directories:
+            candidate = os.path.join(directory, path)
+            if os.path.isfile(candidate):
+                with open(candidate) as file:
+                    return candidate, file.read()
+        raise AssemblyError(f"Can't find include {path!r}", where)
+
+    def expand(self, text: str, name: str, active: tuple = ()) -> list:
+        """Returns the statements of a file with its includes expanded in place"""
+        if name in active:
+            raise AssemblyError(f"{name} includes itself")
+        expanded = []
+        for statement in self.parse(text, name):
+            if statement[0] == "include":
+                include, include_text = self.read_include(statement[2], name, statement[1])
+                expanded.extend(self.expand(include_text, include, active + (name,)))
+            else:
+                expanded.append(statement)
+        return expanded
+
+    def assemble(self, text: str, name: str = "<source>", origin: int = 0) -> Program:
+        """Assembles source text, starting at origin unless it begins with .org"""
+        statements = self.expand(text, name)
+        symbols = {}
+        sizes = self.first_pass(statements, symbols, origin)
+        return self.second_pass(statements, symbols, sizes, origin)
+
+    def first_pass(self, statements: list, symbols: dict, origin: int) -> list:
+        """Assigns addresses to labels and picks each instruction's addressing mode.
+            Returns the chosen mode (or byte count) of every statement."""
+        pc = origin
+        sizes = []
+        deferred = []
+        for statement in statements:
+            kind, where = statement[0], statement[1]
+            size = None
+            if kind == "label":
+                if statement[2] in symbols:
+                    raise AssemblyError(f"{statement[2]} is already defined", where)
+                symbols[statement[2]] = pc
+            elif kind == "const":
+                try:
+                    symbols[statement[2]] = evaluate(statement[3], symbols, pc)
+                except Unresolved:
+                    deferred.append((statement, pc))
+            elif kind == "org":
+                try:
+                    pc = evaluate(statement[2], symbols, pc)
+                except Unresolved as error:
+                    raise AssemblyError(f".org uses undefined symbol {error}", where)
+            elif kind == "byte":
+                size = sum(len(item) if isinstance(item, bytes) else 1 for item in statement[2])
+                pc += size
+            elif kind == "word":
+                size = 2 * len(statement[2])
+                pc += size
+            else:
+                size = self.choose_mode(statement, symbols, pc)
+                pc += LENGTHS[size]
+            sizes.append(size)
+
+        # Constants defined in terms of later labels
+        while deferred:
+            remaining = []
+            for statement, defined_at in deferred:
+                try:
+                    symbols[statement[2]] = evaluate(statement[3], symbols, defined_at)
+                except Unresolved:
+                    remaining.append((statement, defined_at))
+            if len(remaining) == len(deferred):
+                statement = remaining[0][0]
+                raise AssemblyError(f"Can't resolve {statement[2]}", statement[1])
+            deferred = remaining
+        return sizes
+
+    def choose_mode(self, statement: tuple, symbols: dict, pc: int) -> str:
+        """Picks the addressing mode of an instruction. A zero page/absolute pair is
+            resolved to zero page only if the operand is already known to fit."""
+        _, where, mnemonic, family, tree = statement
+        modes = instructions[mnemonic]
+        if isinstance(family, str):
+            if family not in modes:
+                raise AssemblyError(f"{mnemonic} has no {family} addressing mode", where)
+            return family
+        zero_page, absolute = family
+        if zero_page not in modes and absolute not in modes:
+            raise AssemblyError(f"{mnemonic} has no {zero_page}/{absolute} addressing mode", where)
+        if absolute not in modes:
+            return zero_page
+        if zero_page not in modes:
+            return absolute
+        try:
+            value = evaluate(tree, symbols, pc)
+        except Unresolved:
+            return absolute
+        return zero_page if 0 <= value <= 0xFF else absolute
+
+    def second_pass(self, statements: list, symbols: dict, sizes: list, origin: int) -> Program:
+        """Emits the bytes of every statement into one image"""
+        chunks = []         # (address, bytes)
+        pc = origin
+        for statement, size in zip(statements, sizes):
+            kind, where = statement[0], statement[1]
+            if kind == "org":
+                pc = evaluate(statement[2], symbols, pc)
+                continue
+            if kind in ("label", "const"):
+                continue
+            if kind == "byte":
+                data = bytearray()
+                for item in statement[2]:
+                    if isinstance(item, bytes):
+                        data += item
+                    else:
+                        data.append(self.value(item, symbols, pc, where, 0xFF))
+            elif kind == "word":
+                data = bytearray()
+                for tree in statement[2]:
+                    data += self.value(tree, symbols, pc, where, 0xFFFF).to_bytes(2, "little")
+            else:
+                data = self.encode(statement, size, symbols, pc)
+            chunks.append((pc, bytes(data)))
+            pc += len(data)
+
+        if not chunks:
+            return Program(origin, b"", symbols)
+        start = min(address for address, _ in chunks)
+        end = max(address + len(data) for address, data in chunks)
+        image = bytearray([self.fill]) * (end - start)
+        for address, data in chunks:
+            image[address - start:address - start + len(data)] = data
+        return Program(start, bytes(image), symbols)
+
+    def value(self, tree: tuple, symbols: dict, pc: int, where: tuple, limit: int) -> int:
+        """Evaluates an operand in pass 2, checking it fits in a byte or word.
+            Negative values down to -(limit + 1) / 2 wrap."""
+        try:
+            value = evaluate(tree, symbols, pc)
+        except Unresolved as error:
+            raise AssemblyError(f"Undefined symbol {error}", where)
+        if not -((limit + 1) // 2) <= value <= limit:
+            raise AssemblyError(f"Value {value} doesn't fit in {'a byte' if limit == 0xFF else 'a word'}", where)
+        return value & limit
+
+    def encode(self, statement: tuple, mode: str, symbols: dict, pc: int) -> bytes:
+        """Encodes an instruction in the mode chosen in pass 1"""
+        _, where, mnemonic, _, tree = statement
+        opcode = instructions[mnemonic][mode]
+        length = LENGTHS[mode]
+        if length == 1:
+            return bytes([opcode])
+        if mode == REL:
+            target = self.value(tree, symbols, pc, where, 0xFFFF)
+            offset = target - (pc + 2)
+            if not -128 <= offset <= 127:
+                raise AssemblyError(f"Branch to ${target:04X} is out of range ({offset})", where)
+            return bytes([opcode, offset & 0xFF])
+        if length == 2:
+            return bytes([opcode, self.value(tree, symbols, pc, where, 0xFF)])
+        return bytes([opcode]) + self.value(tree, symbols, pc, where, 0xFFFF).to_bytes(2, "little")
+
+
+_assembler = Assembler()
+
+
+def assemble(text: str, origin: int = 0, name: str = "<source>") -> Program:
+    """Assembles source text with a shared, caching Assembler"""
+    return _assembler.assemble(text, name, origin)
+
+
+def assemble_file(path: str, include_paths: list = None) -> Program:
+    """Assembles a source file"""
+    with open(path) as file:
+        text = file.read()
+    assembler = Assembler(include_paths) if include_paths else _assembler
+    return assembler.assemble(text, path)
@@ -0,0 +1,183 @@
+# Author: Chase Smith
+# GitHub username: ChaseSmith67
+# Description: Streams the APU's samples out without holding up emulation. Samples
+#               are copied into a bounded ring buffer and a background thread writes
+#               them to a WAV file, a raw file or a pipe to another program.
+
+import os
+import shlex
+import subprocess
+import threading
+import wave
+
+import numpy as np
+
+from .frame_output import BLOCK, DROP
+
+POLICIES = (BLOCK, DROP)
+
+
+class WavSink(object):
+    """
+    Writes 16-bit mono samples to a WAV file
+    """
+    def __init__(self, path: str, rate: int):
+        self.file = wave.open(path, "wb")
+        self.file.setnchannels(1)
+        self.file.setsampwidth(2)
+        self.file.setframerate(rate)
+
+    def write(self, samples: np.ndarray) -> None:
+        """Writes a block of samples"""
+        self.file.writeframes(samples.astype("<i2", copy=False).tobytes())
+
+    def close(self) -> None:
+        """Finishes the header and closes the file"""
+        self.file.close()
+
+
+class RawSink(object):
+    """
+    Writes 16-bit little-endian mono samples back to back to a file, or to stdout for "-"
+    """
+    def __init__(self, path: str, rate: int):
+        self.file = os.fdopen(os.dup(1), "wb") if path == "-" else open(path, "wb")
+
+    def write(self, samples: np.ndarray) -> None:
+        """Writes a block of samples"""
+        self.file.write(samples.astype("<i2", copy=False).tobytes())
+
+    def close(self) -> None:
+        """Closes the output"""
+        self.file.close()
+
+
+class PipeSink(object):
+    """
+    Pipes raw samples into another program's standard input, e.g. an audio player such
+    as "aplay -q -f S16_LE -c 1 -r {rate}". {rate} in the command is replaced with the
+    sample rate.
+    """
+    def __init__(self, command: str, rate: int):
+        self.process = subprocess.Popen(shlex.split(command.replace("{rate}", str(rate))), stdin=subprocess.PIPE)
+
+    def write(self, samples: np.ndarray) -> None:
+        """Writes a block of samples to the program"""
+        self.process.stdin.write(samples.astype("<i2", copy=False).tobytes())
+
+    def close(self) -> None:
+        """Closes the pipe and waits for the program to finish"""
+        self.process.stdin.close()
+        self.process.wait()
+
+
+SINKS = {"wav": WavSink, "raw": RawSink, "pipe": PipeSink}
+
+
+def create_sink(kind: str, target: str, rate: int):
+    """Returns a sink of the given kind ("wav", "raw" or "pipe") writing to target"""
+    if kind not in SINKS:
+        raise ValueError(f"Unknown audio format {kind!r}, expected one of {', '.join(SINKS)}")
+    return SINKS[kind](target, rate)
+
+
+class AudioOutput(object):
+    """
+    A bounded ring buffer of samples drained by a background writer thread. submit()
+    copies a block of samples in and returns straight away; when the writer has
+    fallen behind and the block doesn't fit, policy decides whether to wait for room
+    (BLOCK) or discard the block (DROP). The ring is allocated once.
+    """
+    def __init__(self, sink, capacity: int = 1 << 15, policy: str = BLOCK):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown backpressure policy {policy!r}, expected one of {', '.join(POLICIES)}")
+        self.sink = sink
+        self.policy = policy
+        self.buffer = np.zeros(capacity, dtype=np.int16)
+        self.capacity = capacity
+        self.head = 0       # Next sample to fill
+        self.tail = 0       # Next sample to write out
+        self.queued = 0
+        self.closed = False
+        self.condition = threading.Condition()
+
+        # Statistics, in samples
+        self.submitted = 0
+        self.written = 0
+        self.dropped = 0
+        self.blocked = 0    # Blocks that had to wait for room
+
+        self.error = None
+        self.thread = threading.Thread(target=self.drain, name="audio-writer", daemon=True)
+        self.thread.start()
+
+    def attach(self, apu) -> None:
+        """Submits every block of samples the APU outputs"""
+        apu.output_listeners.append(lambda apu, samples: self.submit(samples))
+
+    def submit(self, samples: np.ndarray) -> bool:
+        """Queues a copy of the samples. Returns False if they were dropped."""
+        count = samples.size
+        if count > self.capacity:
+            raise ValueError(f"{count} samples don't fit in a buffer of {self.capacity}")
+        with self.condition:
+            if self.error is not None:
+                raise RuntimeError("Audio writer failed") from self.error
+            self.submitted += count
+            if self.capacity - self.queued < count:
+                if self.policy == DROP:
+                    self.dropped += count
+                    return False
+                self.blocked += 1
+                while self.capacity - self.queued < count and self.error is None:
+                    self.condition.wait()
+                if self.error is not None:
+                    raise RuntimeError("Audio writer failed") from self.error
+            head = self.head
+        # The space is free and the writer won't touch it until it is queued
+        first = min(count, self.capacity - head)
+        self.buffer[head:head + first] = samples[:first]
+        self.buffer[:count - first] = samples[first:]
+        with self.condition:
+            self.head = (head + count) % self.capacity
+            self.queued += count
+            self.condition.notify_all()
+        return True
+
+    def drain(self) -> None:
+        """Writer thread: writes queued samples in order until closed and empty"""
+        while True:
+            with self.condition:
+                while not self.queued and not self.closed:
+                    self.condition.wait()
+                if not self.queued:
+                    return
+                tail = self.tail
+                count = min(self.queued, self.capacity - tail)
+            try:
+                self.sink.write(self.buffer[tail:tail + count])
+            except Exception as error:
+                with self.condition:
+                    self.error = error
+                    self.condition.notify_all()
+                return
+            with self.condition:
+                self.tail = (tail + count) % self.capacity
+                self.queued -= count
+                self.written += count
+                self.condition.notify_all()
+
+    def close(self) -> None:
+        """Waits for the queued samples to be written, then closes the sink"""
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        self.thread.join()
+        self.sink.close()
+        if self.error is not None:
+            raise RuntimeError("Audio writer failed") from self.error
+
+    def stats(self) -> dict:
+        """Returns the sample counters"""
+        return {"submitted": self.submitted, "written": self.written, "dropped": self.dropped,
+                "blocked": self.blocked}
@@ -0,0 +1,515 @@
+# Author: Chase Smith
+# GitHub username: ChaseSmith67
+# Description: Many independent 6502 processors stepped together, with registers
+#               and memory stored as NumPy arrays with one lane per processor.
+
+import numpy as np
+
+from . import alu
+from .alu import FLAG_C, FLAG_Z, FLAG_I, FLAG_D, FLAG_B, FLAG_U, FLAG_V, FLAG_N
+from .alu import KEEP_NZ, KEEP_NZC, KEEP_NVZ, KEEP_NVZC
+from .instructions import opcode_table, ACC, IMP
+
+# ALU tables as arrays so a whole group of lanes is updated with one fancy-index
+NZ = np.array(alu.NZ, dtype=np.uint8)
+COMPARE = np.array(alu.COMPARE, dtype=np.uint8)
+ASL_RESULT, ASL_FLAGS = (np.array(column, dtype=np.uint8) for column in zip(*alu.ASL))
+LSR_RESULT, LSR_FLAGS = (np.array(column, dtype=np.uint8) for column in zip(*alu.LSR))
+ROL_RESULT, ROL_FLAGS = (np.array(column, dtype=np.uint8) for column in zip(*alu.ROL))
+ROR_RESULT, ROR_FLAGS = (np.array(column, dtype=np.uint8) for column in zip(*alu.ROR))
+
+# Flag tested by each branch and whether it must be set for the branch to be taken
+BRANCHES = {
+    "BCC": (FLAG_C, False), "BCS": (FLAG_C, True),
+    "BNE": (FLAG_Z, False), "BEQ": (FLAG_Z, True),
+    "BPL": (FLAG_N, False), "BMI": (FLAG_N, True),
+    "BVC": (FLAG_V, False), "BVS": (FLAG_V, True),
+}
+
+
+class BatchCPU(object):
+    """
+    Represents N independent 6502 processors in struct-of-arrays form. Registers are
+    (N,) arrays, the packed status flags are an (N,) uint8 array laid out like
+    cpu6502.Registers.P, and each lane has its own flat 64KB of memory in an
+    (N, 65536) array. There are no devices or mirrors; every lane sees plain memory.
+
+    step() fetches every active lane's opcode, groups lanes by opcode and runs each
+    handler once as a masked NumPy operation over its group. A lane that hits an
+    illegal opcode halts instead of raising, and its halted_at records where.
+    """
+    def __init__(self, count: int):
+        self.count = count
+
+        # Registers, one lane per processor
+        self.A = np.zeros(count, dtype=np.uint8)
+        self.X = np.zeros(count, dtype=np.uint8)
+        self.Y = np.zeros(count, dtype=np.uint8)
+        self.SP = np.full(count, 0xFF, dtype=np.uint8)
+        self.PC = np.zeros(count, dtype=np.uint16)
+        self.P = np.zeros(count, dtype=np.uint8)
+
+        self.cycles = np.zeros(count, dtype=np.int64)
+        self.halted = np.zeros(count, dtype=np.bool_)
+        self.halted_at = np.zeros(count, dtype=np.int32)
+
+        self.memory = np.zeros((count, 0x10000), dtype=np.uint8)
+
+        # 256-entry decode table: (Handler, Addressing Mode, Length, Base Cycles)
+        self.dispatch = self.build_dispatch()
+
+    def build_dispatch(self) -> list:
+        """Resolves the opcode table into bound vectorized handlers and addressing modes"""
+        modes = {
+            "IMM": self.addr_imm, "ZP": self.addr_zp, "ZPX": self.addr_zpx,
+            "ZPY": self.addr_zpy, "ABS": self.addr_abs, "ABX": self.addr_abx,
+            "ABY": self.addr_aby, "IND": self.addr_ind, "IZX": self.addr_izx,
+            "IZY": self.addr_izy, "REL": self.addr_rel,
+        }
+        dispatch = []
+        for entry in opcode_table:
+            if entry is None:
+                dispatch.append((self.illegal, None, 1, 0, False))
+                continue
+            handler, mode, length, cycles, penalty = entry
+            if handler in BRANCHES:
+                flag, taken_when_set = BRANCHES[handler]
+                bound = self.branch_on(flag, taken_when_set)
+            else:
+                bound = getattr(self, handler)
+            mode_fn = None if mode in (IMP, ACC) else modes[mode]
+            dispatch.append((bound, mode_fn, length, cycles, penalty))
+        return dispatch
+
+    # ----- Loading and inspecting state
+
+    def load(self, address: int, data: bytes, lanes=slice(None)) -> None:
+        """Copies a block of bytes into memory at the given address for the given lanes"""
+        data = np.frombuffer(bytes(data), dtype=np.uint8)
+        self.memory[lanes, address:address + len(data)] = data
+
+    def lane_state(self, lane: int) -> dict:
+        """Returns the registers, flags, cycle count and halt status of a single lane"""
+        return {"A": int(self.A[lane]), "X": int(self.X[lane]), "Y": int(self.Y[lane]),
+                "SP": int(self.SP[lane]), "PC": int(self.PC[lane]), "P": int(self.P[lane]),
+                "cycles": int(self.cycles[lane]), "halted": bool(self.halted[lane])}
+
+    def state(self) -> dict:
+        """Returns copies of every lane's registers, flags, cycle counts and halt status"""
+        return {"A": self.A.copy(), "X": self.X.copy(), "Y": self.Y.copy(),
+                "SP": self.SP.copy(), "PC": self.PC.copy(), "P": self.P.copy(),
+                "cycles": self.cycles.copy(), "halted": self.halted.copy()}
+
+    # ----- Execution
+
+    def step(self, active: np.ndarray = None) -> int:
+        """Executes one instruction on every active lane that isn't halted. active is an
+            optional boolean mask of lanes to step. Returns the number of lanes stepped."""
+        runnable = ~self.halted if active is None else (active & ~self.halted)
+        lanes = np.flatnonzero(runnable)
+        if not lanes.size:
+            return 0
+        opcodes = self.memory[lanes, self.PC[lanes]]
+        order = np.argsort(opcodes, kind="stable")
+        lanes, opcodes = lanes[order], opcodes[order]
+        bounds = np.flatnonzero(np.diff(opcodes)) + 1
+        firsts = np.concatenate(([0], bounds))
+        for opcode, group in zip(opcodes[firsts], np.split(lanes, bounds)):
+            handler, mode, length, base, penalty = self.dispatch[opcode]
+            pc = self.PC[group].astype(np.int32)
+            self.PC[group] = (pc + length) & 0xFFFF
+            self.cycles[group] += base
+            if mode is None:
+                handler(group)
+            else:
+                handler(group, mode(group, pc, penalty))
+        return lanes.size
+
+    def run(self, steps: int) -> None:
+        """Executes the given number of instructions on every lane that isn't halted"""
+        for _ in range(steps):
+            if not self.step():
+                break
+
+    def run_cycles(self, cycles: int) -> None:
+        """Executes instructions on each lane until it has run at least the given number
+            of cycles beyond where it started, or halted"""
+        target = self.cycles + cycles
+        while self.step(self.cycles < target):
+            pass
+
+    # ----- Memory helpers
+
+    def read(self, lanes: np.ndarray, address: np.ndarray) -> np.ndarray:
+        """Returns the byte at each lane's address as int32"""
+        return self.memory[lanes, address].astype(np.int32)
+
+    def read_word(self, lanes: np.ndarray, address: np.ndarray) -> np.ndarray:
+        """Returns the little-endian 16-bit value at each lane's address"""
+        return self.read(lanes, address) | (self.read(lanes, (address + 1) & 0xFFFF) << 8)
+
+    def read_word_zp(self, lanes: np.ndarray, address: np.ndarray) -> np.ndarray:
+        """Returns the 16-bit value at each lane's Zero Page address, wrapping in the Zero Page"""
+        return self.read(lanes, address) | (self.read(lanes, (address + 1) & 0xFF) << 8)
+
+    def push(self, lanes: np.ndarray, values) -> None:
+        """Pushes a byte per lane to the Stack"""
+        self.memory[lanes, 0x100 + self.SP[lanes].astype(np.int32)] = values
+        self.SP[lanes] -= 1
+
+    def pull(self, lanes: np.ndarray) -> np.ndarray:
+        """Pulls a byte per lane from the Stack"""
+        self.SP[lanes] += 1
+        return self.read(lanes, 0x100 + self.SP[lanes].astype(np.int32))
+
+    def set_nz(self, lanes: np.ndarray, values: np.ndarray) -> None:
+        """Sets the Zero and Negative flags of each lane from its 8-bit result"""
+        self.P[lanes] = (self.P[lanes] & KEEP_NZ) | NZ[values]
+
+    # ----- Addressing Modes: each returns the effective address per lane
+
+    def addr_imm(self, lanes, pc, penalty):
+        """Immediate: the operand is the byte following the opcode"""
+        return (pc + 1) & 0xFFFF
+
+    def addr_zp(self, lanes, pc, penalty):
+        """Zero Page: 8-bit address in the first page of memory"""
+        return self.read(lanes, (pc + 1) & 0xFFFF)
+
+    def addr_zpx(self, lanes, pc, penalty):
+        """Zero Page, X: Zero Page address plus Index X, wrapping within the Zero Page"""
+        return (self.read(lanes, (pc + 1) & 0xFFFF) + self.X[lanes]) & 0xFF
+
+    def addr_zpy(self, lanes, pc, penalty):
+        """Zero Page, Y: Zero Page address plus Index Y, wrapping within the Zero Page"""
+        return (self.read(lanes, (pc + 1) & 0xFFFF) + self.Y[lanes]) & 0xFF
+
+    def addr_abs(self, lanes, pc, penalty):
+        """Absolute: full 16-bit address"""
+        return self.read_word(lanes, (pc + 1) & 0xFFFF)
+
+    def indexed(self, lanes, base, index, penalty):
+        """Adds an index to a base address, charging a cycle for page crossings if the
+            instruction has a page penalty"""
+        address = (base + index) & 0xFFFF
+        if penalty:
+            self.cycles[lanes] += ((base ^ address) & 0xFF00) != 0
+        return address
+
+    def addr_abx(self, lanes, pc, penalty):
+        """Absolute, X: 16-bit address plus Index X"""
+        return self.indexed(lanes, self.read_word(lanes, (pc + 1) & 0xFFFF), self.X[lanes], penalty)
+
+    def addr_aby(self, lanes, pc, penalty):
+        """Absolute, Y: 16-bit address plus Index Y"""
+        return self.indexed(lanes, self.read_word(lanes, (pc + 1) & 0xFFFF), self.Y[lanes], penalty)
+
+    def addr_ind(self, lanes, pc, penalty):
+        """Indirect: the operand is the address of the target address"""
+        pointer = self.read_word(lanes, (pc + 1) & 0xFFFF)
+        high = (pointer & 0xFF00) | ((pointer + 1) & 0x00FF)
+        return self.read(lanes, pointer) | (self.read(lanes, high) << 8)
+
+    def addr_izx(self, lanes, pc, penalty):
+        """(Indirect, X): Zero Page pointer plus Index X holds the target address"""
+        pointer = (self.read(lanes, (pc + 1) & 0xFFFF) + self.X[lanes]) & 0xFF
+        return self.read_word_zp(lanes, pointer)
+
+    def addr_izy(self, lanes, pc, penalty):
+        """(Indirect), Y: Zero Page pointer holds a base address that is added to Index Y"""
+        base = self.read_word_zp(lanes, self.read(lanes, (pc + 1) & 0xFFFF))
+        return self.indexed(lanes, base, self.Y[lanes], penalty)
+
+    def addr_rel(self, lanes, pc, penalty):
+        """Relative: signed 8-bit offset from the address of the next instruction"""
+        offset = self.read(lanes, (pc + 1) & 0xFFFF)
+        return (pc + 2 + offset - ((offset & 0x80) << 1)) & 0xFFFF
+
+    # ----- Instructions, each applied to a group of lanes that share an opcode
+
+    def illegal(self, lanes):
+        """Halts the lanes that fetched an illegal opcode"""
+        self.PC[lanes] -= 1
+        self.halted[lanes] = True
+        self.halted_at[lanes] = self.PC[lanes]
+
+    def add(self, lanes, mem_val):
+        """Adds a value and the Carry to the Accumulator of each lane, as ADC and SBC do"""
+        a_val = self.A[lanes].astype(np.int32)
+        total = a_val + mem_val + (self.P[lanes] & FLAG_C)
+        result = total & 0xFF
+        self.A[lanes] = result
+        self.P[lanes] = ((self.P[lanes] & KEEP_NVZC) | NZ[result] | (total >> 8)
+                         | (((a_val ^ result) & (mem_val ^ result) & 0x80) >> 1))
+
+    def ADC(self, lanes, address):
+        """Add Memory to Accumulator with Carry"""
+        self.add(lanes, self.read(lanes, address))
+
+    def SBC(self, lanes, address):
+        """Subtract Memory from Accumulator with Borrow"""
+        self.add(lanes, self.read(lanes, address) ^ 0xFF)
+
+    def AND(self, lanes, address):
+        """Bitwise Memory AND Accumulator, Result stored in Accumulator"""
+        self.A[lanes] &= self.memory[lanes, address]
+        self.set_nz(lanes, self.A[lanes])
+
+    def ORA(self, lanes, address):
+        """Bitwise OR Memory with Accumulator"""
+        self.A[lanes] |= self.memory[lanes, address]
+        self.set_nz(lanes, self.A[lanes])
+
+    def EOR(self, lanes, address):
+        """Bitwise Exclusive OR Memory with Accumulator"""
+        self.A[lanes] ^= self.memory[lanes, address]
+        self.set_nz(lanes, self.A[lanes])
+
+    def LDA(self, lanes, address):
+        """Load Accumulator from specified Memory address"""
+        self.A[lanes] = self.memory[lanes, address]
+        self.set_nz(lanes, self.A[lanes])
+
+    def LDX(self, lanes, address):
+        """Load Index X from specified Memory address"""
+        self.X[lanes] = self.memory[lanes, address]
+        self.set_nz(lanes, self.X[lanes])
+
+    def LDY(self, lanes, address):
+        """Load Index Y from specified Memory address"""
+        self.Y[lanes] = self.memory[lanes, address]
+        self.set_nz(lanes, self.Y[lanes])
+
+    def STA(self, lanes, address):
+        """Store Accumulator in specified Memory address"""
+        self.memory[lanes, address] = self.A[lanes]
+
+    def STX(self, lanes, address):
+        """Store Index X in specified Memory address"""
+        self.memory[lanes, address] = self.X[lanes]
+
+    def STY(self, lanes, address):
+        """Store Index Y in specified Memory address"""
+        self.memory[lanes, address] = self.Y[lanes]
+
+    def compare(self, lanes, reg_val, address):
+        """Compares a register with Memory for each lane, as CMP, CPX and CPY do"""
+        index = (reg_val.astype(np.int32) << 8) | self.read(lanes, address)
+        self.P[lanes] = (self.P[lanes] & KEEP_NZC) | COMPARE[index]
+
+    def CMP(self, lanes, address):
+        """Compare Accumulator with Memory"""
+        self.compare(lanes, self.A[lanes], address)
+
+    def CPX(self, lanes, address):
+        """Compare Index X with Memory"""
+        self.compare(lanes, self.X[lanes], address)
+
+    def CPY(self, lanes, address):
+        """Compare Index Y with Memory"""
+        self.compare(lanes, self.Y[lanes], address)
+
+    def BIT(self, lanes, address):
+        """Test Bits in Memory with Accumulator"""
+        mem_val = self.memory[lanes, address]
+        self.P[lanes] = ((self.P[lanes] & KEEP_NVZ) | (mem_val & (FLAG_N | FLAG_V))
+                         | (NZ[mem_val & self.A[lanes]] & FLAG_Z))
+
+    def modify(self, lanes, address, results, flags, carry_in=False):
+        """Read-modify-write through a (result, flags) table pair"""
+        index = self.read(lanes, address)
+        if carry_in:
+            index |= (self.P[lanes] & FLAG_C).astype(np.int32) << 8
+        self.memory[lanes, address] = results[index]
+        self.P[lanes] = (self.P[lanes] & KEEP_NZC) | flags[index]
+
+    def modify_a(self, lanes, results, flags, carry_in=False):
+        """Accumulator form of modify()"""
+        index = self.A[lanes].astype(np.int32)
+        if carry_in:
+            index |= (self.P[lanes] & FLAG_C).astype(np.int32) << 8
+        self.A[lanes] = results[index]
+        self.P[lanes] = (self.P[lanes] & KEEP_NZC) | flags[index]
+
+    def ASL(self, lanes, address):
+        """Arithmetic Shift Left by One Bit"""
+        self.modify(lanes, address, ASL_RESULT, ASL_FLAGS)
+
+    def LSR(self, lanes, address):
+        """Logical Shift Right by One Bit"""
+        self.modify(lanes, address, LSR_RESULT, LSR_FLAGS)
+
+    def ROL(self, lanes, address):
+        """Rotate Left"""
+        self.modify(lanes, address, ROL_RESULT, ROL_FLAGS, carry_in=True)
+
+    def ROR(self, lanes, address):
+        """Rotate Right"""
+        self.modify(lanes, address, ROR_RESULT, ROR_FLAGS, carry_in=True)
+
+    def ASL_A(self, lanes):
+        """Arithmetic Shift Left by One Bit on the Accumulator"""
+        self.modify_a(lanes, ASL_RESULT, ASL_FLAGS)
+
+    def LSR_A(self, lanes):
+        """Logical Shift Right by One Bit on the Accumulator"""
+        self.modify_a(lanes, LSR_RESULT, LSR_FLAGS)
+
+    def ROL_A(self, lanes):
+        """Rotate Left on the Accumulator"""
+        self.modify_a(lanes, ROL_RESULT, ROL_FLAGS, carry_in=True)
+
+    def ROR_A(self, lanes):
+        """Rotate Right on the Accumulator"""
+        self.modify_a(lanes, ROR_RESULT, ROR_FLAGS, carry_in=True)
+
+    def INC(self, lanes, address):
+        """Increment Memory"""
+        value = self.memory[lanes, address] + np.uint8(1)
+        self.memory[lanes, address] = value
+        self.set_nz(lanes, value)
+
+    def DEC(self, lanes, address):
+        """Decrement Memory"""
+        value = self.memory[lanes, address] - np.uint8(1)
+        self.memory[lanes, address] = value
+        self.set_nz(lanes, value)
+
+    def INX(self, lanes):
+        """Increment Index X"""
+        self.X[lanes] += 1
+        self.set_nz(lanes, self.X[lanes])
+
+    def INY(self, lanes):
+        """Increment Index Y"""
+        self.Y[lanes] += 1
+        self.set_nz(lanes, self.Y[lanes])
+
+    def DEX(self, lanes):
+        """Decrement Index X"""
+        self.X[lanes] -= 1
+        self.set_nz(lanes, self.X[lanes])
+
+    def DEY(self, lanes):
+        """Decrement Index Y"""
+        self.Y[lanes] -= 1
+        self.set_nz(lanes, self.Y[lanes])
+
+    def TAX(self, lanes):
+        """Transfer Accumulator to Index X"""
+        self.X[lanes] = self.A[lanes]
+        self.set_nz(lanes, self.X[lanes])
+
+    def TAY(self, lanes):
+        """Transfer Accumulator to Index Y"""
+        self.Y[lanes] = self.A[lanes]
+        self.set_nz(lanes, self.Y[lanes])
+
+    def TSX(self, lanes):
+        """Transfer Stack Pointer to Index X"""
+        self.X[lanes] = self.SP[lanes]
+        self.set_nz(lanes, self.X[lanes])
+
+    def TXA(self, lanes):
+        """Transfer Index X to Accumulator"""
+        self.A[lanes] = self.X[lanes]
+        self.set_nz(lanes, self.A[lanes])
+
+    def TYA(self, lanes):
+        """Transfer Index Y to Accumulator"""
+        self.A[lanes] = self.Y[lanes]
+        self.set_nz(lanes, self.A[lanes])
+
+    def TXS(self, lanes):
+        """Transfer Index X to Stack Pointer"""
+        self.SP[lanes] = self.X[lanes]
+
+    def CLC(self, lanes):
+        """Clear Carry Flag"""
+        self.P[lanes] &= ~FLAG_C & 0xFF
+
+    def CLD(self, lanes):
+        """Clear Decimal Mode Flag"""
+        self.P[lanes] &= ~FLAG_D & 0xFF
+
+    def CLI(self, lanes):
+        """Clear Interrupt Disable Flag"""
+        self.P[lanes] &= ~FLAG_I & 0xFF
+
+    def CLV(self, lanes):
+        """Clear Overflow Flag"""
+        self.P[lanes] &= ~FLAG_V & 0xFF
+
+    def SEC(self, lanes):
+        """Set Carry Flag"""
+        self.P[lanes] |= FLAG_C
+
+    def SED(self, lanes):
+        """Set Decimal Mode Flag"""
+        self.P[lanes] |= FLAG_D
+
+    def SEI(self, lanes):
+        """Set Interrupt Disable Flag"""
+        self.P[lanes] |= FLAG_I
+
+    def NOP(self, lanes):
+        """No Operation"""
+        pass
+
+    def PHA(self, lanes):
+        """Push Accumulator to Stack"""
+        self.push(lanes, self.A[lanes])
+
+    def PHP(self, lanes):
+        """Push Processor Status to Stack"""
+        self.push(lanes, self.P[lanes] | FLAG_B | FLAG_U)
+
+    def PLA(self, lanes):
+        """Pull Accumulator from Stack"""
+        self.A[lanes] = self.pull(lanes)
+        self.set_nz(lanes, self.A[lanes])
+
+    def PLP(self, lanes):
+        """Pull Processor Status from Stack"""
+        self.P[lanes] = self.pull(lanes) & ~(FLAG_B | FLAG_U) & 0xFF
+
+    def branch_on(self, flag: int, taken_when_set: bool):
+        """Returns a branch handler that moves the lanes whose flag matches to the target,
+            charging one cycle plus one more for a page crossing"""
+        def branch(lanes, address):
+            taken = ((self.P[lanes] & flag) != 0) == taken_when_set
+            lanes, address = lanes[taken], address[taken]
+            self.cycles[lanes] += 1 + (((self.PC[lanes] ^ address) & 0xFF00) != 0)
+            self.PC[lanes] = address
+        return branch
+
+    def JMP(self, lanes, address):
+        """Jump to the specified address"""
+        self.PC[lanes] = address
+
+    def JSR(self, lanes, address):
+        """Jump to Subroutine"""
+        ret = (self.PC[lanes].astype(np.int32) - 1) & 0xFFFF
+        self.push(lanes, ret >> 8)
+        self.push(lanes, ret & 0xFF)
+        self.PC[lanes] = address
+
+    def RTS(self, lanes):
+        """Return from Subroutine"""
+        low = self.pull(lanes)
+        self.PC[lanes] = ((low | (self.pull(lanes) << 8)) + 1) & 0xFFFF
+
+    def RTI(self, lanes):
+        """Return from Interrupt"""
+        self.PLP(lanes)
+        low = self.pull(lanes)
+        self.PC[lanes] = low | (self.pull(lanes) << 8)
+
+    def BRK(self, lanes):
+        """Force Break"""
+        pc = (self.PC[lanes].astype(np.int32) + 1) & 0xFFFF
+        self.push(lanes, pc >> 8)
+        self.push(lanes, pc & 0xFF)
+        self.push(lanes, self.P[lanes] | FLAG_B | FLAG_U)
+        self.P[lanes] |= FLAG_I
+        self.PC[lanes] = self.read_word(lanes, np.full(lanes.size, 0xFFFE, dtype=np.int32))
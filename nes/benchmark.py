@@ -0,0 +1,252 @@
+# Author: Chase Smith
+# GitHub username: ChaseSmith67
+# Description: Benchmarks for the hot paths: every opcode and addressing mode, bus
+#               reads and writes, instruction throughput on synthetic programs and
+#               whole-system frames per second and process startup. Results are written
+#               as JSON and can be compared against a stored baseline to catch
+#               regressions.
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+from .cache import ENVIRONMENT
+
+from .cpu6502 import CPU, Memory
+from .instructions import opcode_table
+
+# Result units, and whether a bigger number is an improvement
+UNITS = {"ns": False, "ips": True, "fps": True}
+
+# Synthetic workloads, assembled at $0600. Each runs forever.
+WORKLOADS = {
+    # LDX #$00 / loop: DEX / BNE loop / JMP $0600
+    "tight_loop": bytes([0xA2, 0x00, 0xCA, 0xD0, 0xFD, 0x4C, 0x00, 0x06]),
+    # LDX #$00 / loop: LDA $0200,X / STA $0300,X / INX / BNE loop / JMP $0600
+    "memory_copy": bytes([0xA2, 0x00, 0xBD, 0x00, 0x02, 0x9D, 0x00, 0x03, 0xE8, 0xD0, 0xF7,
+                          0x4C, 0x00, 0x06]),
+    # loop: JSR sub / JSR sub / JMP loop / sub: PHA / TXA / PHA / PLA / TAX / PLA / RTS
+    "stack_calls": bytes([0x20, 0x09, 0x06, 0x20, 0x09, 0x06, 0x4C, 0x00, 0x06,
+                          0x48, 0x8A, 0x48, 0x68, 0xAA, 0x68, 0x60]),
+}
+PROGRAM_START = 0x0600
+
+
+def timed(function, iterations: int, repeats: int) -> float:
+    """Returns the best of `repeats` timings of calling function() `iterations` times, in
+        nanoseconds per call"""
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter_ns()
+        for _ in range(iterations):
+            function()
+        elapsed = time.perf_counter_ns() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best / iterations
+
+
+def fresh_cpu() -> CPU:
+    """Returns a CPU on flat memory with operands and pointers set up so every
+        addressing mode resolves to ordinary RAM"""
+    memory = Memory()
+    cpu = CPU(memory)
+    for address in range(0x0000, 0x0100):
+        memory.write_mem(address, 0x03)     # Zero page pointers -> $0303
+    memory.load(0x0300, bytes([0x10, 0x03]))
+    return cpu
+
+
+def bench_opcodes(iterations: int, repeats: int) -> dict:
+    """Time to execute each opcode through its dispatch entry, operand decoding included"""
+    results = {}
+    cpu = fresh_cpu()
+    pc = 0x0300
+    for opcode, entry in enumerate(opcode_table):
+        if entry is None:
+            continue
+        name, mode_name, _, _, _ = entry
+        handler, mode, _, _ = cpu.dispatch[opcode]
+        if mode is None:
+            function = handler
+        else:
+            def function(handler=handler, mode=mode):
+                handler(mode(pc))
+        cpu.regs.SP = 0xFF
+        results[f"opcode/{opcode:02X}_{name}_{mode_name}"] = (timed(function, iterations, repeats), "ns")
+    return results
+
+
+def bench_modes(iterations: int, repeats: int) -> dict:
+    """Time to resolve each addressing mode"""
+    cpu = fresh_cpu()
+    pc = 0x0300
+    results = {}
+    for name in sorted(dir(cpu)):
+        if name.startswith("addr_"):
+            mode = getattr(cpu, name)
+            results[f"mode/{name[5:]}"] = (timed(lambda: mode(pc), iterations, repeats), "ns")
+    return results
+
+
+def bench_bus(iterations: int, repeats: int) -> dict:
+    """Cost of bus reads and writes to RAM, flat memory and a device handler"""
+    memory = Memory()
+    memory.map_device(0x4000, 0x40FF, read=lambda address: 0, write=lambda address, value: None)
+    read, write = memory.read_mem, memory.write_mem
+    results = {}
+    for label, address in (("ram", 0x0123), ("flat", 0x8123), ("device", 0x4016)):
+        results[f"bus/read_{label}"] = (timed(lambda: read(address), iterations, repeats), "ns")
+        results[f"bus/write_{label}"] = (timed(lambda: write(address, 0x5A), iterations, repeats), "ns")
+    return results
+
+
+def bench_workloads(cycles: int, repeats: int) -> dict:
+    """Instructions per second on the synthetic workloads, interpreted and translated"""
+    results = {}
+    for name, program in WORKLOADS.items():
+        for translated in (False, True):
+            cpu = fresh_cpu()
+            cpu.memory.load(PROGRAM_START, program)
+            cpu.set_pc(PROGRAM_START)
+            # Average cycles per instruction, from stepping the program
+            steps = 2000
+            stepped = sum(cpu.step() for _ in range(steps))
+            if translated:
+                cpu.enable_translation()
+            best = None
+            for _ in range(repeats):
+                start = time.perf_counter()
+                ran = cpu.run(cycles)
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            ips = ran * steps / stepped / best
+            results[f"ips/{name}_{'translated' if translated else 'interpreted'}"] = (ips, "ips")
+    return results
+
+
+def bench_frames(rom: str, frames: int, repeats: int) -> dict:
+    """Frames per second for a whole system running the given ROM"""
+    from .cartridge import load_rom
+    from .main import System
+
+    best = None
+    for _ in range(repeats):
+        system = System()
+        system.insert_cartridge(load_rom(rom))
+        system.run_frame()
+        start = time.perf_counter()
+        for _ in range(frames):
+            system.run_frame()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return {"system/fps": (frames / best, "fps")}
+
+
+def launch(rom: str | None, environment: dict) -> int:
+    """Starts "python -m nes" and returns the nanoseconds until it has executed its first
+        instruction, as printed by --first-instruction"""
+    command = [sys.executable, "-m", __package__, "--first-instruction"]
+    if rom:
+        command += ["--path", os.path.abspath(rom)]
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    start = time.time_ns()
+    output = subprocess.run(command, cwd=root, env=environment, capture_output=True, text=True, check=True)
+    return int(output.stdout.split()[-1]) - start
+
+
+def bench_startup(rom: str | None, launches: int) -> dict:
+    """Time from launching a new process to its first executed instruction, building the
+        tables at startup and with them in the table cache"""
+    environment = {key: value for key, value in os.environ.items() if key != ENVIRONMENT}
+    results = {"startup/first_instruction": (min(launch(rom, environment) for _ in range(launches)), "ns")}
+    with tempfile.TemporaryDirectory() as directory:
+        environment[ENVIRONMENT] = directory
+        launch(rom, environment)    # Fills the cache
+        results["startup/first_instruction_cached"] = (min(launch(rom, environment) for _ in range(launches)),
+                                                       "ns")
+    return results
+
+
+def run_benchmarks(quick: bool = False, rom: str = None, only: list = None) -> dict:
+    """Runs the selected benchmark groups and returns a JSON-ready report"""
+    scale = 1 if quick else 10
+    repeats = 3 if quick else 5
+    groups = {
+        "opcodes": lambda: bench_opcodes(200 * scale, repeats),
+        "modes": lambda: bench_modes(1000 * scale, repeats),
+        "bus": lambda: bench_bus(2000 * scale, repeats),
+        "workloads": lambda: bench_workloads(20000 * scale, repeats),
+        "startup": lambda: bench_startup(rom, 2 * scale),
+    }
+    if rom:
+        groups["frames"] = lambda: bench_frames(rom, 6 * scale, repeats)
+    results = {}
+    for name, group in groups.items():
+        if only and name not in only:
+            continue
+        for key, (value, unit) in group().items():
+            results[key] = {"value": value, "unit": unit}
+    return {
+        "meta": {"python": sys.version.split()[0], "implementation": platform.python_implementation(),
+                 "machine": platform.machine(), "time": time.strftime("%Y-%m-%dT%H:%M:%S"), "quick": quick},
+        "results": results,
+    }
+
+
+def compare(report: dict, baseline: dict, threshold: float) -> list:
+    """Returns (name, baseline value, new value, change) for every result that got worse
+        than the baseline by more than threshold (a fraction)"""
+    regressions = []
+    for name, result in report["results"].items():
+        old = baseline.get("results", {}).get(name)
+        if old is None or not old["value"]:
+            continue
+        change = (result["value"] - old["value"]) / old["value"]
+        worse = -change if UNITS[result["unit"]] else change
+        if worse > threshold:
+            regressions.append((name, old["value"], result["value"], change))
+    return regressions
+
+
+def parse_args() -> object:
+    parser = argparse.ArgumentParser(description="Benchmark the emulator's hot paths")
+    parser.add_argument("--quick", action="store_true", help="Fewer iterations, for a fast check")
+    parser.add_argument("--rom", type=str, help="ROM to measure whole-system frames per second and startup with")
+    parser.add_argument("--only", type=str, help="Comma-separated groups: opcodes, modes, bus, workloads, startup, frames")
+    parser.add_argument("--output", "-o", type=str, help="Write the JSON report to this file")
+    parser.add_argument("--baseline", "-b", type=str, help="Compare against a stored JSON report")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Fractional slowdown that counts as a regression (default 0.10)")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    only = args.only.split(",") if args.only else None
+    report = run_benchmarks(args.quick, args.rom, only)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(text)
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        regressions = compare(report, baseline, args.threshold)
+        for name, old, new, change in regressions:
+            print(f"REGRESSION {name}: {old:.1f} -> {new:.1f} ({change:+.1%})", file=sys.stderr)
+        if regressions:
+            return 1
+        print(f"No regressions over {args.threshold:.0%}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
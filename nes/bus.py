@@ -0,0 +1,136 @@
+# Author: Chase Smith
+# GitHub username: ChaseSmith67
+# Description: The 16-bit address space seen by the CPU, dispatched through a
+#               page table to backing memory or memory-mapped devices.
+
+PAGE_SIZE = 256
+PAGE_COUNT = 256
+
+
+class Bus(object):
+    """
+    Represents the CPU's 64KB address space as a table of 256 pages of 256 bytes.
+    Each page is either a memoryview straight into some backing buffer (RAM, ROM,
+    or the bus's own flat 64KB array) or a pair of device handlers. Reading mapped
+    memory is two list indexes; only device pages pay for a function call.
+
+    By default every page is backed by a flat 64KB bytearray, so a bare Bus can be
+    used as plain memory for running test programs.
+    """
+    def __init__(self):
+        self.data = bytearray(PAGE_SIZE * PAGE_COUNT)
+        view = memoryview(self.data)
+
+        # Page tables: a memoryview of the page, or None when a handler owns it
+        self.read_pages = [view[page * PAGE_SIZE:(page + 1) * PAGE_SIZE] for page in range(PAGE_COUNT)]
+        self.write_pages = list(self.read_pages)
+
+        # Device handlers, only consulted when the page table entry is None
+        self.readers = [self.open_bus_read] * PAGE_COUNT
+        self.writers = [self.open_bus_write] * PAGE_COUNT
+
+        # Per-address handlers for pages shared by several registers (e.g. $4000-$401F)
+        self.ports = {}
+
+        # Called with the range of pages whenever part of the map changes
+        self.map_listeners = []
+
+    def read_mem(self, address: int) -> int:
+        """Returns the byte at the specified address"""
+        page = self.read_pages[address >> 8]
+        if page is not None:
+            return page[address & 0xFF]
+        return self.readers[address >> 8](address)
+
+    def write_mem(self, address: int, value: int) -> None:
+        """Stores the byte at the specified address"""
+        page = self.write_pages[address >> 8]
+        if page is not None:
+            page[address & 0xFF] = value & 0xFF
+        else:
+            self.writers[address >> 8](address, value & 0xFF)
+
+    def open_bus_read(self, address: int) -> int:
+        """Reads of unmapped addresses return the last byte on the bus, which for an
+            absolute read is the high byte of the address."""
+        return address >> 8
+
+    def open_bus_write(self, address: int, value: int) -> None:
+        """Writes to unmapped addresses are ignored"""
+        pass
+
+    def add_map_listener(self, listener) -> None:
+        """Registers listener(pages) to be called after pages are remapped"""
+        self.map_listeners.append(listener)
+
+    def remapped(self, pages: range) -> None:
+        """Notifies the map listeners that the given pages changed"""
+        for listener in self.map_listeners:
+            listener(pages)
+
+    def pages(self, start: int, end: int) -> range:
+        """Returns the range of page numbers covering the inclusive address range"""
+        if start & 0xFF or (end & 0xFF) != 0xFF:
+            raise ValueError(f"${start:04X}-${end:04X} is not aligned to {PAGE_SIZE}-byte pages")
+        return range(start >> 8, (end >> 8) + 1)
+
+    def map_memory(self, start: int, end: int, buffer, writable: bool = True) -> None:
+        """Maps the inclusive address range onto a buffer without copying. If the buffer is
+            smaller than the range it is mirrored to fill it. Writes to a read-only mapping
+            are left to whatever write handler is installed for those pages."""
+        view = memoryview(buffer).cast("B")
+        size = len(view)
+        if size % PAGE_SIZE:
+            raise ValueError(f"Buffer of {size} bytes is not a whole number of pages")
+        for index, page in enumerate(self.pages(start, end)):
+            offset = (index * PAGE_SIZE) % size
+            self.read_pages[page] = view[offset:offset + PAGE_SIZE]
+            self.write_pages[page] = self.read_pages[page] if writable else None
+        self.remapped(self.pages(start, end))
+
+    def map_device(self, start: int, end: int, read=None, write=None) -> None:
+        """Routes reads and/or writes of the inclusive address range to device handlers.
+            read(address) returns a byte and write(address, value) stores one. A direction
+            with no handler given keeps its current mapping."""
+        for page in self.pages(start, end):
+            if read is not None:
+                self.read_pages[page] = None
+                self.readers[page] = read
+            if write is not None:
+                self.write_pages[page] = None
+                self.writers[page] = write
+        self.remapped(self.pages(start, end))
+
+    def map_port(self, address: int, read=None, write=None) -> None:
+        """Routes a single address to device handlers. The rest of its page stays open bus
+            unless other ports are mapped alongside it."""
+        page = address >> 8
+        if page not in self.ports:
+            self.ports[page] = ([self.open_bus_read] * PAGE_SIZE, [self.open_bus_write] * PAGE_SIZE)
+            port_readers, port_writers = self.ports[page]
+            self.map_device(page << 8, (page << 8) | 0xFF,
+                            read=lambda addr: port_readers[addr & 0xFF](addr),
+                            write=lambda addr, value: port_writers[addr & 0xFF](addr, value))
+        port_readers, port_writers = self.ports[page]
+        if read is not None:
+            port_readers[address & 0xFF] = read
+        if write is not None:
+            port_writers[address & 0xFF] = write
+
+    def read_page(self, page: int):
+        """Returns the 256 bytes of a page, as a view when the page is backed by memory"""
+        view = self.read_pages[page]
+        if view is not None:
+            return view
+        base = page << 8
+        return bytes(self.readers[page](base | offset) for offset in range(PAGE_SIZE))
+
+    def dma(self, page: int, destination) -> None:
+        """Copies a whole page into the destination buffer in one slice assignment, as
+            the OAM DMA register does"""
+        destination[0:PAGE_SIZE] = self.read_page(page)
+
+    def load(self, address: int, data: bytes) -> None:
+        """Writes a block of bytes starting at the given address"""
+        for offset, value in enumerate(data):
+            self.write_mem((address + offset) & 0xFFFF, value)
@@ -0,0 +1,59 @@
+# Author: Chase Smith
+# GitHub username: ChaseSmith67
+# Description: Optional on-disk cache for the lookup tables that take a noticeable part
+#               of startup to build. Set NES_TABLE_CACHE to a directory to turn it on;
+#               each table is stored there with marshal and rebuilt whenever the source
+#               file that builds it changes.
+
+import marshal
+import os
+import sys
+import zlib
+
+ENVIRONMENT = "NES_TABLE_CACHE"
+
+
+def cache_dir() -> str | None:
+    """Returns the cache directory, or None when caching is off"""
+    return os.environ.get(ENVIRONMENT) or None
+
+
+def cache_path(directory: str, name: str, source: str) -> str:
+    """Returns where the table is stored: its name plus a checksum of the source file
+        that builds it and the Python version, as marshal's format may change"""
+    with open(source, "rb") as file:
+        checksum = zlib.crc32(file.read())
+    version = f"{sys.version_info[0]}{sys.version_info[1]}"
+    return os.path.join(directory, f"{name}-{checksum:08x}-py{version}.marshal")
+
+
+def cached(name: str, source: str, build):
+    """
+    Returns build()'s tables, read from the cache directory when they were stored there
+    by the same version of source. Anything marshal can write is allowed: ints, strings,
+    lists, tuples and dicts. Without a cache directory, or if it can't be used, the
+    tables are simply built.
+    """
+    directory = cache_dir()
+    if directory is None:
+        return build()
+    try:
+        path = cache_path(directory, name, source)
+    except OSError:
+        return build()
+    try:
+        with open(path, "rb") as file:
+            return marshal.loads(file.read())
+    except (OSError, EOFError, ValueError, TypeError):
+        pass
+    tables = build()
+    try:
+        os.makedirs(directory, exist_ok=True)
+        # Written under a unique name and renamed, as many processes may start at once
+        temporary = f"{path}.{os.getpid()}"
+        with open(temporary, "wb") as file:
+            file.write(marshal.dumps(tables))
+        os.replace(temporary, path)
+    except (OSError, ValueError):
+        pass
+    return tables
@@ -0,0 +1,110 @@
+# Author: Chase Smith
+# GitHub username: ChaseSmith67
+# Description: Loads iNES and NES 2.0 ROM files. The file is memory-mapped and the
+#               PRG and CHR banks are exposed as memoryview slices of it.
+
+import mmap
+import zlib
+
+from .mappers import create_mapper, HORIZONTAL, VERTICAL, FOUR_SCREEN
+
+HEADER_SIZE = 16
+TRAINER_SIZE = 512
+PRG_UNIT = 0x4000   # PRG-ROM size is given in 16KB units
+CHR_UNIT = 0x2000   # CHR-ROM size is given in 8KB units
+
+
+class Cartridge(object):
+    """
+    Represents a game cartridge loaded from an iNES or NES 2.0 file. The file is
+    memory-mapped read-only, so PRG-ROM and CHR-ROM are views of the mapping rather
+    than copies. A cartridge with no CHR-ROM gets 8KB of CHR-RAM instead.
+    """
+    def __init__(self, data, path: str = None):
+        """
+        Parses the header of the ROM image. data is any buffer holding the whole file,
+        normally an mmap from load_rom().
+        """
+        self.path = path
+        self.data = data
+        view = memoryview(data)
+
+        header = bytes(view[:HEADER_SIZE])
+        if header[:4] != b"NES\x1a":
+            raise ValueError(f"{path or 'ROM'} is not an iNES file")
+        flags6, flags7 = header[6], header[7]
+
+        # NES 2.0 is flagged by bits 2-3 of byte 7 being 10
+        self.nes2 = (flags7 & 0x0C) == 0x08
+
+        self.mapper_number = (flags6 >> 4) | (flags7 & 0xF0)
+        self.submapper = 0
+        prg_units, chr_units = header[4], header[5]
+        if self.nes2:
+            self.mapper_number |= (header[8] & 0x0F) << 8
+            self.submapper = header[8] >> 4
+            prg_units |= (header[9] & 0x0F) << 8
+            chr_units |= (header[9] & 0xF0) << 4
+            shift = header[10] & 0x0F
+            self.prg_ram_size = (64 << shift) if shift else 0
+        else:
+            self.prg_ram_size = (header[8] or 1) * 0x2000
+
+        if flags6 & 0x08:
+            self.mirroring = FOUR_SCREEN
+        elif flags6 & 0x01:
+            self.mirroring = VERTICAL
+        else:
+            self.mirroring = HORIZONTAL
+        self.battery = bool(flags6 & 0x02)
+
+        offset = HEADER_SIZE + (TRAINER_SIZE if flags6 & 0x04 else 0)
+        prg_size = prg_units * PRG_UNIT
+        chr_size = chr_units * CHR_UNIT
+        if len(view) < offset + prg_size + chr_size:
+            raise ValueError(f"{path or 'ROM'} is shorter than its header says")
+
+        # Zero-copy views of the banks
+        self.prg_rom = view[offset:offset + prg_size]
+        if chr_size:
+            self.chr_rom = view[offset + prg_size:offset + prg_size + chr_size]
+            self.chr_ram = None
+        else:
+            self.chr_rom = None
+            self.chr_ram = bytearray(CHR_UNIT)
+
+        # Identifies the game in savestates
+        self.prg_crc = zlib.crc32(self.prg_rom)
+
+        self.mapper = create_mapper(self)
+
+    @property
+    def chr(self):
+        """CHR-ROM if the cartridge has it, otherwise CHR-RAM"""
+        return self.chr_rom if self.chr_rom is not None else self.chr_ram
+
+    def attach(self, bus) -> None:
+        """Maps the cartridge's PRG-RAM, PRG-ROM and mapper registers into the CPU bus"""
+        self.mapper.attach(bus)
+
+    def close(self) -> None:
+        """Closes the memory mapping of the file. Any bus or PPU the cartridge was attached
+            to still holds views of it, so the mapping is only closed once they are gone;
+            until then it is left for the garbage collector."""
+        if isinstance(self.data, mmap.mmap):
+            try:
+                self.data.close()
+            except BufferError:
+                pass
+
+    def __repr__(self) -> str:
+        return (f"Cartridge({self.path!r}, mapper={self.mapper_number}, "
+                f"prg={len(self.prg_rom) // 1024}KB, chr={len(self.chr) // 1024}KB, "
+                f"mirroring={self.mirroring})")
+
+
+def load_rom(path: str) -> Cartridge:
+    """Memory-maps the ROM file at the given path and returns its Cartridge"""
+    with open(path, "rb") as file:
+        data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    return Cartridge(data, path)
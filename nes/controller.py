@@ -0,0 +1,62 @@
+# Author: Chase Smith
+# GitHub username: ChaseSmith67
+# Description: The standard NES controller, read serially through $4016 and $4017.
+
+import struct
+
+# Buttons, in the order the controller shifts them out
+BUTTON_A = 0x01
+BUTTON_B = 0x02
+BUTTON_SELECT = 0x04
+BUTTON_START = 0x08
+BUTTON_UP = 0x10
+BUTTON_DOWN = 0x20
+BUTTON_LEFT = 0x40
+BUTTON_RIGHT = 0x80
+
+BUTTONS = {"A": BUTTON_A, "B": BUTTON_B, "SELECT": BUTTON_SELECT, "START": BUTTON_START,
+           "UP": BUTTON_UP, "DOWN": BUTTON_DOWN, "LEFT": BUTTON_LEFT, "RIGHT": BUTTON_RIGHT}
+
+# Savestate block: buttons held, strobe and shift register
+STATE = struct.Struct("<BBB")
+
+
+class Controller(object):
+    """
+    Represents a standard controller. buttons is the byte of currently held buttons;
+    while the strobe bit is set the shift register is reloaded from it, and each read
+    returns the next button. After all eight, reads return 1.
+    """
+    def __init__(self):
+        self.buttons = 0
+        self.strobe = False
+        self.shift = 0
+
+    def save_state(self) -> bytes:
+        """Returns the held buttons, strobe and shift register as a fixed-size block"""
+        return STATE.pack(self.buttons, self.strobe, self.shift)
+
+    def load_state(self, data) -> None:
+        """Restores a block from save_state()"""
+        self.buttons, strobe, self.shift = STATE.unpack(data)
+        self.strobe = bool(strobe)
+
+    def set_buttons(self, buttons: int) -> None:
+        """Sets which buttons are held"""
+        self.buttons = buttons & 0xFF
+        if self.strobe:
+            self.shift = self.buttons
+
+    def write(self, address: int, value: int) -> None:
+        """Handles a write to $4016: bit 0 is the strobe"""
+        self.strobe = bool(value & 1)
+        if self.strobe:
+            self.shift = self.buttons
+
+    def read(self, address: int) -> int:
+        """Returns the next button in bit 0, with open bus in the upper bits"""
+        if self.strobe:
+            return 0x40 | (self.buttons & 1)
+        value = self.shift & 1
+        self.shift = (self.shift >> 1) | 0x80
+        return 0x40 | value
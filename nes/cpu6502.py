@@ -0,0 +1,852 @@
+# Author: Chase Smith
+# GitHub username: ChaseSmith67
+# Date: 3/26/23
+# Description: Emulation of the 6502 microprocessor and its instruction set.
+
+import numpy as np
+
+from . import alu
+from .alu import FLAG_C, FLAG_Z, FLAG_I, FLAG_D, FLAG_B, FLAG_U, FLAG_V, FLAG_N
+from .alu import KEEP_NZ, KEEP_NZC, KEEP_NVZ, KEEP_NVZC, NZ
+from .bus import Bus
+from .instructions import opcode_table, ACC, IMP
+from .ram import RAM
+
+# Devices that can hold the IRQ line, a bit each in CPU.irq_line
+IRQ_FRAME = 0x01    # APU frame sequencer
+IRQ_DMC = 0x02      # APU DMC sample end
+IRQ_MAPPER = 0x04   # Cartridge mapper, e.g. the MMC3 scanline counter
+
+class Registers(object):
+    """
+    The 6502 register file. Every register is a plain int: A, X, Y and SP wrap at
+    8 bits, PC wraps at 16 bits and the seven flags are packed into the P byte, in
+    the same layout the processor pushes to the Stack.
+    """
+    __slots__ = ("A", "X", "Y", "SP", "PC", "P")
+
+    def __init__(self):
+        self.A = 0          # Accumulator Register
+        self.X = 0          # Index Register X
+        self.Y = 0          # Index Register Y
+        self.SP = 0xFF      # 8-Bit Stack Pointer
+        self.PC = 0         # 16-Bit Program Counter
+        self.P = 0          # Packed Status Flags
+
+
+class CPU(object):
+    """
+    Represents the 6502 processor. Registers and flags are held in a Registers
+    object as plain ints, and a Memory Object is used to emulate the 2KB of memory
+    for storing data, including the stack.
+
+    The register and flag attributes (reg_A, SP, flag_C, ...) are handles that can
+    be passed to read_reg/write_reg and read_flag/change_flag.
+    """
+    # Register handles, named after their slot in Registers
+    reg_A = "A"     # Accumulator Register
+    reg_X = "X"     # Index Register X
+    reg_Y = "Y"     # Index Register Y
+    SP = "SP"       # Stack Pointer
+    PC = "PC"       # Program Counter
+
+    # Flag handles, the bit of the flag within P
+    flag_N = FLAG_N     # Negative Flag
+    flag_V = FLAG_V     # Overflow
+    flag_B = FLAG_B     # Break Command
+    flag_D = FLAG_D     # Decimal Mode Flag
+    flag_I = FLAG_I     # Interrupt Disable
+    flag_Z = FLAG_Z     # Zero Flag
+    flag_C = FLAG_C     # Carry Flag
+
+    def __init__(self, memory):
+        """
+        Initializes the CPU object and sets all registers and flags to 0.
+        Creates Memory necessary for operation.
+        """
+
+        # Create Memory
+        self.memory = memory
+
+        # Registers and packed Status Flags
+        self.regs = Registers()
+
+        # Total number of cycles executed
+        self.cycles = 0
+
+        # Bound 256-entry decode table: (Handler, Addressing Mode, Length, Base Cycles)
+        self.dispatch = self.build_dispatch()
+
+        # Basic-block translator, when translated execution is enabled
+        self.translator = None
+
+        # Monitors called before every instruction (tracing, profiling, debugging), and
+        # whether one of them has stopped execution
+        self.monitors = []
+        self.stopped = False
+
+        # Idle-loop detector, when enabled, and the cycle the current run() stops at
+        self.idle = None
+        self.run_target = 0
+
+        # IRQ line: a bit per device holding it (IRQ_FRAME, ...), taken by poll_irq()
+        self.irq_line = 0
+
+    def build_dispatch(self) -> list:
+        """Resolves the opcode table into a list of 256 bound (handler, mode, length, cycles)
+            entries so that executing an instruction is a single indexed lookup. Implied and
+            Accumulator instructions have no addressing mode and are called without an address."""
+        modes = {
+            "IMM": self.addr_imm, "ZP": self.addr_zp, "ZPX": self.addr_zpx,
+            "ZPY": self.addr_zpy, "ABS": self.addr_abs, "ABX": self.addr_abx,
+            "ABY": self.addr_aby, "IND": self.addr_ind, "IZX": self.addr_izx,
+            "IZY": self.addr_izy, "REL": self.addr_rel,
+        }
+        penalty_modes = {"ABX": self.addr_abx_penalty, "ABY": self.addr_aby_penalty,
+                         "IZY": self.addr_izy_penalty}
+        dispatch = []
+        for entry in opcode_table:
+            if entry is None:
+                dispatch.append((self.illegal, None, 1, 2))
+                continue
+            handler, mode, length, cycles, penalty = entry
+            if mode in (IMP, ACC):
+                mode_fn = None
+            elif penalty:
+                mode_fn = penalty_modes[mode]
+            else:
+                mode_fn = modes[mode]
+            dispatch.append((getattr(self, handler), mode_fn, length, cycles))
+        return dispatch
+
+    def reset(self) -> None:
+        """Performs the power-up/reset sequence: the Stack Pointer is moved down three
+            bytes, Interrupts are disabled and the Program Counter is loaded from the
+            reset vector at $FFFC."""
+        regs = self.regs
+        regs.SP = (regs.SP - 3) & 0xFF
+        regs.P |= FLAG_I
+        regs.PC = self.read_word(0xFFFC)
+        self.cycles += 7
+
+    def interrupt(self, vector: int) -> None:
+        """Pushes the Program Counter and the Processor Status (with the Break flag clear),
+            disables Interrupts and jumps through the given vector. Takes 7 cycles."""
+        regs = self.regs
+        self.push(regs.PC >> 8)
+        self.push(regs.PC & 0xFF)
+        self.push(regs.P | FLAG_U)
+        regs.P |= FLAG_I
+        regs.PC = self.read_word(vector)
+        self.cycles += 7
+
+    def nmi(self) -> None:
+        """Non-Maskable Interrupt through the vector at $FFFA"""
+        self.interrupt(0xFFFA)
+
+    def irq(self) -> bool:
+        """Interrupt Request through the vector at $FFFE. Ignored while the Interrupt
+            Disable flag is set; returns whether the interrupt was taken."""
+        if self.regs.P & FLAG_I:
+            return False
+        self.interrupt(0xFFFE)
+        return True
+
+    def set_irq(self, source: int, asserted: bool) -> None:
+        """Asserts or releases a device's hold on the IRQ line. The line is level
+            triggered: it stays asserted until the device is acknowledged, and the
+            interrupt is taken at an instruction boundary where Interrupt Disable is clear."""
+        if asserted:
+            self.irq_line |= source
+        else:
+            self.irq_line &= ~source
+
+    def poll_irq(self) -> bool:
+        """Takes the IRQ if the line is asserted and Interrupts are enabled. Called at
+            instruction boundaries; returns whether the interrupt was taken."""
+        if self.irq_line and not self.regs.P & FLAG_I:
+            self.interrupt(0xFFFE)
+            return True
+        return False
+
+    def unmasked(self) -> None:
+        """Called when an instruction clears Interrupt Disable. With the IRQ line
+            asserted, run() stops after the instruction so the interrupt can be polled."""
+        if self.irq_line:
+            self.run_target = self.cycles
+
+    def get_pc(self) -> int:
+        """Returns the 16-bit value of the Program Counter"""
+        return self.regs.PC
+
+    def set_pc(self, address: int | np.uint16) -> None:
+        """Sets the Program Counter to the given 16-bit address"""
+        self.regs.PC = int(address) & 0xFFFF
+
+    def step(self) -> int:
+        """Fetches, decodes and executes the instruction at the Program Counter.
+            Returns the number of cycles it took. If a monitor stops execution the
+            instruction isn't executed, stopped is set and 0 is returned."""
+        start = self.cycles
+        regs = self.regs
+        pc = regs.PC
+        opcode = self.memory.read_mem(pc)
+        if self.monitors:
+            stop = False
+            for monitor in self.monitors:
+                if monitor.instruction(pc, opcode):
+                    stop = True
+            if stop:
+                self.stopped = True
+                return 0
+        handler, mode, length, cycles = self.dispatch[opcode]
+        regs.PC = (pc + length) & 0xFFFF
+        if mode is None:
+            handler()
+        else:
+            handler(mode(pc))
+        self.cycles += cycles
+        return self.cycles - start
+
+    def enable_translation(self, max_blocks: int = 1024) -> None:
+        """Switches run() to executing cached translations of basic blocks"""
+        if self.translator is None:
+            from .translator import Translator     # Only loaded once translation is used
+            self.translator = Translator(self, max_blocks)
+
+    def disable_translation(self) -> None:
+        """Switches run() back to interpreting one instruction at a time"""
+        if self.translator is not None:
+            self.translator.flush()
+            self.memory.map_listeners.remove(self.translator.remapped)
+            self.translator = None
+
+    def add_monitor(self, monitor) -> None:
+        """Adds a monitor: monitor.instruction(pc, opcode) is called before every
+            instruction. If it returns True, run() stops before the instruction and sets
+            stopped, which stays set (and stops the scheduler) until cleared."""
+        if monitor not in self.monitors:
+            self.monitors.append(monitor)
+
+    def remove_monitor(self, monitor) -> None:
+        """Removes a monitor. With none left run() goes back to the plain loop."""
+        if monitor in self.monitors:
+            self.monitors.remove(monitor)
+
+    def run(self, cycles: int) -> int:
+        """Executes instructions until at least the given number of cycles have elapsed,
+            or until an instruction unmasks an asserted IRQ. Returns the number of cycles
+            actually executed."""
+        if self.monitors:
+            return self.run_monitored(cycles)
+        if self.translator is not None:
+            return self.translator.run(cycles)
+        start = self.cycles
+        self.run_target = start + cycles
+        regs = self.regs
+        read_mem = self.memory.read_mem
+        dispatch = self.dispatch
+        while self.cycles < self.run_target:
+            pc = regs.PC
+            handler, mode, length, base = dispatch[read_mem(pc)]
+            regs.PC = (pc + length) & 0xFFFF
+            if mode is None:
+                handler()
+            else:
+                handler(mode(pc))
+            self.cycles += base
+        self.run_target = 0
+        return self.cycles - start
+
+    def run_monitored(self, cycles: int) -> int:
+        """run() with every monitor called before each instruction. Translation is
+            bypassed, as monitors need to see every instruction."""
+        start = self.cycles
+        self.run_target = start + cycles
+        regs = self.regs
+        read_mem = self.memory.read_mem
+        dispatch = self.dispatch
+        monitors = self.monitors
+        while self.cycles < self.run_target:
+            pc = regs.PC
+            opcode = read_mem(pc)
+            stop = False
+            for monitor in monitors:
+                if monitor.instruction(pc, opcode):
+                    stop = True
+            if stop:
+                self.stopped = True
+                break
+            handler, mode, length, base = dispatch[opcode]
+            regs.PC = (pc + length) & 0xFFFF
+            if mode is None:
+                handler()
+            else:
+                handler(mode(pc))
+            self.cycles += base
+        self.run_target = 0
+        return self.cycles - start
+
+    # ----- Compatibility accessors. Instructions use self.regs directly.
+
+    def read_reg(self, register: str) -> int:
+        """Returns the value stored in the specified register."""
+        return getattr(self.regs, register)
+
+    def write_reg(self, register: str, value: int | np.uint8) -> None:
+        """Takes an integer value and stores it in the specified register."""
+        setattr(self.regs, register, int(value) & (0xFFFF if register == "PC" else 0xFF))
+
+    def load_reg_from_mem(self, register: str, address: int) -> None:
+        """Takes the 8-bit value from the specified memory address and stores it
+            in the specified register."""
+        self.write_reg(register, self.memory.read_mem(address))
+
+    def store_reg_in_mem(self, register: str, address: int | np.uint) -> None:
+        """Loads the value stored in the specified register into the given memory address"""
+        self.memory.write_mem(address, self.read_reg(register))
+
+    def increment(self, register: str, amount: int | np.uint8 = 1) -> None:
+        """Increment the value stored in the specified register. Optional amount can be
+            specified, default is 1."""
+        self.write_reg(register, self.read_reg(register) + int(amount))
+
+    def decrement(self, register: str, amount: int | np.uint8 = 1) -> None:
+        """Decrement the value stored in the specified register. Optional amount can be
+            specified, default is 1."""
+        self.write_reg(register, self.read_reg(register) - int(amount))
+
+    def read_flag(self, flag: int) -> bool:
+        """Returns the Boolean value of the specified flag"""
+        return (self.regs.P & flag) != 0
+
+    def change_flag(self, flag: int, value=None) -> None:
+        """Changes the Boolean value of the specified flag to the specified value. If no
+            value is given, the flag's state will be changed."""
+        if value is None:
+            self.regs.P ^= flag
+        elif value:
+            self.regs.P |= flag
+        else:
+            self.regs.P &= ~flag & 0xFF
+
+    def get_processor_status(self) -> int:
+        """Returns the current status of the flags as an 8-bit value. The Break Flag and
+            bit 5 are both set to 1"""
+        return self.regs.P | FLAG_B | FLAG_U
+
+    def set_processor_status(self, status: int | np.uint8) -> None:
+        """Sets all flags from an 8-bit value. The Break Flag and bit 5 don't exist in the
+            processor and are ignored."""
+        self.regs.P = int(status) & ~(FLAG_B | FLAG_U) & 0xFF
+
+    def set_nz(self, value: int) -> None:
+        """Sets the Zero and Negative flags from an 8-bit result"""
+        self.regs.P = (self.regs.P & KEEP_NZ) | NZ[value]
+
+    # ----- Addressing Modes: each takes the address of the opcode and returns the
+    # ----- effective address of the operand. Indexed modes with a page penalty add
+    # ----- the extra cycle themselves when the index crosses a page boundary.
+
+    def read_word(self, address: int) -> int:
+        """Returns the little-endian 16-bit value stored at the given address"""
+        return self.memory.read_mem(address) | (self.memory.read_mem((address + 1) & 0xFFFF) << 8)
+
+    def read_word_zp(self, address: int) -> int:
+        """Returns the 16-bit value stored at the given Zero Page address, wrapping
+            within the Zero Page as the 6502 does"""
+        return self.memory.read_mem(address) | (self.memory.read_mem((address + 1) & 0xFF) << 8)
+
+    def addr_imm(self, pc: int) -> int:
+        """Immediate: the operand is the byte following the opcode"""
+        return (pc + 1) & 0xFFFF
+
+    def addr_zp(self, pc: int) -> int:
+        """Zero Page: 8-bit address in the first page of memory"""
+        return self.memory.read_mem((pc + 1) & 0xFFFF)
+
+    def addr_zpx(self, pc: int) -> int:
+        """Zero Page, X: Zero Page address plus Index X, wrapping within the Zero Page"""
+        return (self.memory.read_mem((pc + 1) & 0xFFFF) + self.regs.X) & 0xFF
+
+    def addr_zpy(self, pc: int) -> int:
+        """Zero Page, Y: Zero Page address plus Index Y, wrapping within the Zero Page"""
+        return (self.memory.read_mem((pc + 1) & 0xFFFF) + self.regs.Y) & 0xFF
+
+    def addr_abs(self, pc: int) -> int:
+        """Absolute: full 16-bit address"""
+        return self.read_word((pc + 1) & 0xFFFF)
+
+    def addr_abx(self, pc: int) -> int:
+        """Absolute, X: 16-bit address plus Index X"""
+        return (self.read_word((pc + 1) & 0xFFFF) + self.regs.X) & 0xFFFF
+
+    def addr_aby(self, pc: int) -> int:
+        """Absolute, Y: 16-bit address plus Index Y"""
+        return (self.read_word((pc + 1) & 0xFFFF) + self.regs.Y) & 0xFFFF
+
+    def addr_abx_penalty(self, pc: int) -> int:
+        """Absolute, X with an extra cycle when a page boundary is crossed"""
+        base = self.read_word((pc + 1) & 0xFFFF)
+        address = (base + self.regs.X) & 0xFFFF
+        if (base ^ address) & 0xFF00:
+            self.cycles += 1
+        return address
+
+    def addr_aby_penalty(self, pc: int) -> int:
+        """Absolute, Y with an extra cycle when a page boundary is crossed"""
+        base = self.read_word((pc + 1) & 0xFFFF)
+        address = (base + self.regs.Y) & 0xFFFF
+        if (base ^ address) & 0xFF00:
+            self.cycles += 1
+        return address
+
+    def addr_ind(self, pc: int) -> int:
+        """Indirect: the operand is the address of the target address. Reproduces the 6502
+            bug where the high byte is fetched from the start of the same page."""
+        pointer = self.read_word((pc + 1) & 0xFFFF)
+        high = (pointer & 0xFF00) | ((pointer + 1) & 0x00FF)
+        return self.memory.read_mem(pointer) | (self.memory.read_mem(high) << 8)
+
+    def addr_izx(self, pc: int) -> int:
+        """(Indirect, X): Zero Page pointer plus Index X holds the target address"""
+        pointer = (self.memory.read_mem((pc + 1) & 0xFFFF) + self.regs.X) & 0xFF
+        return self.read_word_zp(pointer)
+
+    def addr_izy(self, pc: int) -> int:
+        """(Indirect), Y: Zero Page pointer holds a base address that is added to Index Y"""
+        base = self.read_word_zp(self.memory.read_mem((pc + 1) & 0xFFFF))
+        return (base + self.regs.Y) & 0xFFFF
+
+    def addr_izy_penalty(self, pc: int) -> int:
+        """(Indirect), Y with an extra cycle when a page boundary is crossed"""
+        base = self.read_word_zp(self.memory.read_mem((pc + 1) & 0xFFFF))
+        address = (base + self.regs.Y) & 0xFFFF
+        if (base ^ address) & 0xFF00:
+            self.cycles += 1
+        return address
+
+    def addr_rel(self, pc: int) -> int:
+        """Relative: signed 8-bit offset from the address of the next instruction"""
+        offset = self.memory.read_mem((pc + 1) & 0xFFFF)
+        if offset >= 0x80:
+            offset -= 0x100
+        return (pc + 2 + offset) & 0xFFFF
+
+    # ----- Stack helpers
+
+    def push(self, value: int | np.uint8) -> None:
+        """Stores the value at the Memory address pointed to by the Stack Pointer.
+            Stack Pointer decremented."""
+        regs = self.regs
+        self.memory.write_mem(0x0100 | regs.SP, value)
+        regs.SP = (regs.SP - 1) & 0xFF
+
+    def pull(self) -> int:
+        """Stack Pointer incremented and the value it points to is returned"""
+        regs = self.regs
+        regs.SP = (regs.SP + 1) & 0xFF
+        return self.memory.read_mem(0x0100 | regs.SP)
+
+    def branch(self, address: int) -> None:
+        """Moves the Program Counter to the branch target. A taken branch costs one extra
+            cycle, and another if the target is on a different page."""
+        regs = self.regs
+        pc = regs.PC
+        self.cycles += 2 if (pc ^ address) & 0xFF00 else 1
+        regs.PC = address
+        if address < pc and self.idle is not None:
+            self.idle.backward_branch((pc - 2) & 0xFFFF, address)
+
+    def illegal(self) -> None:
+        """Placeholder for the opcodes that are not part of the official instruction set"""
+        pc = (self.regs.PC - 1) & 0xFFFF
+        raise ValueError(f"Illegal opcode ${self.memory.read_mem(pc):02X} at ${pc:04X}")
+
+    # ----- Below this line: Instructions - May move these to a separate file later.
+    # ----- Having these individually like this isn't strictly necessary, may refactor.
+
+    def ADC(self, address: int | np.uint) -> None:
+        """Add Memory to Accumulator with Carry. If the result doesn't fit in 8 bits the
+            Carry flag will be set, and if the signed result overflows the Overflow flag will
+            be set. The NES has no decimal mode, so the Decimal flag is ignored."""
+        regs = self.regs
+        regs.A, flags = alu.add(regs.A, self.memory.read_mem(address), regs.P & FLAG_C)
+        regs.P = (regs.P & KEEP_NVZC) | flags
+
+    def AND(self, address: int | np.uint) -> None:
+        """Bitwise Memory AND Accumulator, Result stored in Accumulator. If the result is
+         Zero or Negative, the appropriate flag will be set."""
+        result = self.regs.A & self.memory.read_mem(address)
+        self.regs.A = result
+        self.regs.P = (self.regs.P & KEEP_NZ) | NZ[result]
+
+    def ASL(self, address: int | np.uint) -> None:
+        """Arithmetic Shift Left by One Bit. Most significant bit (Bit 7) is stored in
+            Carry Flag. The value at the specified Memory address is shifted."""
+        result, flags = alu.ASL[self.memory.read_mem(address)]
+        self.memory.write_mem(address, result)
+        self.regs.P = (self.regs.P & KEEP_NZC) | flags
+
+    def ASL_A(self) -> None:
+        """Arithmetic Shift Left by One Bit on the Accumulator"""
+        regs = self.regs
+        regs.A, flags = alu.ASL[regs.A]
+        regs.P = (regs.P & KEEP_NZC) | flags
+
+    def BCC(self, address: int) -> None:
+        """Branch on Carry Clear"""
+        if not self.regs.P & FLAG_C:
+            self.branch(address)
+
+    def BCS(self, address: int) -> None:
+        """Branch on Carry Set"""
+        if self.regs.P & FLAG_C:
+            self.branch(address)
+
+    def BEQ(self, address: int) -> None:
+        """Branch on Result Zero"""
+        if self.regs.P & FLAG_Z:
+            self.branch(address)
+
+    def BIT(self, address: int | np.uint) -> None:
+        """Test Bits in Memory with Accumulator. Bits 7 and 6 of the value at the Memory
+            address are copied to the Negative and Overflow flags, and the Zero flag is set
+            if the value AND the Accumulator is Zero."""
+        regs = self.regs
+        mem_val = self.memory.read_mem(address)
+        regs.P = (regs.P & KEEP_NVZ) | (mem_val & (FLAG_N | FLAG_V)) | (NZ[mem_val & regs.A] & FLAG_Z)
+
+    def BMI(self, address: int) -> None:
+        """Branch on Result Minus"""
+        if self.regs.P & FLAG_N:
+            self.branch(address)
+
+    def BNE(self, address: int) -> None:
+        """Branch on Result not Zero"""
+        if not self.regs.P & FLAG_Z:
+            self.branch(address)
+
+    def BPL(self, address: int) -> None:
+        """Branch on Result Plus"""
+        if not self.regs.P & FLAG_N:
+            self.branch(address)
+
+    def BRK(self) -> None:
+        """Force Break. The address after the padding byte and the Processor Status (with
+            the Break flag set) are pushed to the Stack, Interrupts are disabled and the
+            Program Counter is loaded from the IRQ vector at $FFFE."""
+        regs = self.regs
+        pc = (regs.PC + 1) & 0xFFFF
+        self.push(pc >> 8)
+        self.push(pc & 0xFF)
+        self.push(regs.P | FLAG_B | FLAG_U)
+        regs.P |= FLAG_I
+        regs.PC = self.read_word(0xFFFE)
+
+    def BVC(self, address: int) -> None:
+        """Branch on Overflow Clear"""
+        if not self.regs.P & FLAG_V:
+            self.branch(address)
+
+    def BVS(self, address: int) -> None:
+        """Branch on Overflow Set"""
+        if self.regs.P & FLAG_V:
+            self.branch(address)
+
+    def CLC(self) -> None:
+        """Clear Carry Flag"""
+        self.regs.P &= ~FLAG_C & 0xFF
+
+    def CLD(self) -> None:
+        """Clear Decimal Mode Flag"""
+        self.regs.P &= ~FLAG_D & 0xFF
+
+    def CLI(self) -> None:
+        """Clear Interrupt Disable Flag"""
+        self.regs.P &= ~FLAG_I & 0xFF
+        self.unmasked()
+
+    def CLV(self) -> None:
+        """Clear Overflow Flag"""
+        self.regs.P &= ~FLAG_V & 0xFF
+
+    def compare(self, reg_val: int, address: int | np.uint) -> None:
+        """Compares a register with Memory. Carry is set if the register is greater than or
+            equal to the value at the Memory address, and Zero and Negative are set from the
+            difference."""
+        self.regs.P = (self.regs.P & KEEP_NZC) | alu.COMPARE[(reg_val << 8) | self.memory.read_mem(address)]
+
+    def CMP(self, address: int | np.uint) -> None:
+        """Compare Accumulator with Memory. If the value of the Accumulator is greater
+            than or equal to the value at the given Memory address, the Carry flag will
+            be set."""
+        self.compare(self.regs.A, address)
+
+    def CPX(self, address: int | np.uint) -> None:
+        """Compare Index X with Memory. If the value of Index X is greater than or equal to
+            the value at the given Memory address, the Carry flag will be set."""
+        self.compare(self.regs.X, address)
+
+    def CPY(self, address: int | np.uint) -> None:
+        """Compare Index Y with Memory. If the value of Index Y is greater than or equal to
+            the value at the given Memory address, the Carry flag will be set."""
+        self.compare(self.regs.Y, address)
+
+    def DEC(self, address: int | np.uint) -> None:
+        """Decrement Memory. The value stored at the specified Memory address is decremented
+            by 1. If the result is Zero or Negative, the appropriate flag will be set."""
+        mem_val = (self.memory.read_mem(address) - 1) & 0xFF
+        self.regs.P = (self.regs.P & KEEP_NZ) | NZ[mem_val]
+        self.memory.write_mem(address, mem_val)
+
+    def DEX(self) -> None:
+        """Decrement Index X. The value stored Index Register X is decremented by 1.
+            If the result is Zero or Negative, the appropriate flag will be set."""
+        val = (self.regs.X - 1) & 0xFF
+        self.regs.X = val
+        self.regs.P = (self.regs.P & KEEP_NZ) | NZ[val]
+
+    def DEY(self) -> None:
+        """Decrement Index Y. The value stored Index Register Y is decremented by 1.
+            If the result is Zero or Negative, the appropriate flag will be set."""
+        val = (self.regs.Y - 1) & 0xFF
+        self.regs.Y = val
+        self.regs.P = (self.regs.P & KEEP_NZ) | NZ[val]
+
+    def EOR(self, address: int | np.uint) -> None:
+        """Bitwise Exclusive OR Memory with Accumulator. The value stored at the specified
+            memory address is compared with the value in the Accumulator using Exclusive OR
+            operation and the result is stored in the Accumulator. If the result is Zero or
+            Negative, the appropriate flag will be set."""
+        result = self.regs.A ^ self.memory.read_mem(address)
+        self.regs.A = result
+        self.regs.P = (self.regs.P & KEEP_NZ) | NZ[result]
+
+    def INC(self, address: int | np.uint) -> None:
+        """Increment Memory. The value stored at the specified Memory address is incremented
+            by 1. If the result is Zero or Negative, the appropriate flag will be set."""
+        mem_val = (self.memory.read_mem(address) + 1) & 0xFF
+        self.regs.P = (self.regs.P & KEEP_NZ) | NZ[mem_val]
+        self.memory.write_mem(address, mem_val)
+
+    def INX(self) -> None:
+        """Increment Index X. The value stored Index Register X is incremented by 1.
+            If the result is Zero or Negative, the appropriate flag will be set."""
+        val = (self.regs.X + 1) & 0xFF
+        self.regs.X = val
+        self.regs.P = (self.regs.P & KEEP_NZ) | NZ[val]
+
+    def INY(self) -> None:
+        """Increment Index Y. The value stored Index Register Y is incremented by 1.
+            If the result is Zero or Negative, the appropriate flag will be set."""
+        val = (self.regs.Y + 1) & 0xFF
+        self.regs.Y = val
+        self.regs.P = (self.regs.P & KEEP_NZ) | NZ[val]
+
+    def JMP(self, address: int) -> None:
+        """Jump to the specified address"""
+        regs = self.regs
+        if address < regs.PC and self.idle is not None:
+            self.idle.backward_branch((regs.PC - 3) & 0xFFFF, address)
+        regs.PC = address
+
+    def JSR(self, address: int) -> None:
+        """Jump to Subroutine. The address of the last byte of this instruction is pushed
+            to the Stack, high byte first, and the Program Counter set to the given address."""
+        pc = (self.regs.PC - 1) & 0xFFFF
+        self.push(pc >> 8)
+        self.push(pc & 0xFF)
+        self.regs.PC = address
+
+    def LDA(self, address: int | np.uint) -> None:
+        """Load Accumulator from specified Memory address"""
+        value = self.memory.read_mem(address)
+        self.regs.A = value
+        self.regs.P = (self.regs.P & KEEP_NZ) | NZ[value]
+
+    def LDX(self, address: int | np.uint) -> None:
+        """Load Index X from specified Memory address"""
+        value = self.memory.read_mem(address)
+        self.regs.X = value
+        self.regs.P = (self.regs.P & KEEP_NZ) | NZ[value]
+
+    def LDY(self, address: int | np.uint) -> None:
+        """Load Index Y from specified Memory address"""
+        value = self.memory.read_mem(address)
+        self.regs.Y = value
+        self.regs.P = (self.regs.P & KEEP_NZ) | NZ[value]
+
+    def LSR(self, address: int | np.uint) -> None:
+        """Logical Shift Right by One Bit. Least significant bit stored in Carry Flag.
+            The value at the specified Memory address is shifted."""
+        result, flags = alu.LSR[self.memory.read_mem(address)]
+        self.memory.write_mem(address, result)
+        self.regs.P = (self.regs.P & KEEP_NZC) | flags
+
+    def LSR_A(self) -> None:
+        """Logical Shift Right by One Bit on the Accumulator"""
+        regs = self.regs
+        regs.A, flags = alu.LSR[regs.A]
+        regs.P = (regs.P & KEEP_NZC) | flags
+
+    def NOP(self) -> None:
+        """No Operation. Probably not necessary."""
+        pass
+
+    def ORA(self, address: int | np.uint) -> None:
+        """Bitwise OR Memory with Accumulator. The value stored at the specified memory
+            address is compared with the value in the Accumulator using  OR operation
+            and the result is stored in the Accumulator. If the result is Zero or Negative,
+            the appropriate flag will be set."""
+        result = self.regs.A | self.memory.read_mem(address)
+        self.regs.A = result
+        self.regs.P = (self.regs.P & KEEP_NZ) | NZ[result]
+
+    def PHA(self) -> None:
+        """Push Accumulator to Stack. Takes the value currently stored in the Accumulator
+            Register and stores it in the Memory address currently pointed to by the Stack
+            Pointer. Stack Pointer decremented."""
+        self.push(self.regs.A)
+
+    def PHP(self) -> None:
+        """Push Processor Status to Stack. The packed P byte, with the Break Flag and bit 5
+            set, is stored in the Memory address currently pointed to by the Stack Pointer.
+            Stack Pointer decremented."""
+        self.push(self.regs.P | FLAG_B | FLAG_U)
+
+    def PLA(self) -> None:
+        """Pull Accumulator from Stack. The value in the Memory address pointed to by the
+            Stack Pointer is stored in the Accumulator. Stack Pointer incremented"""
+        value = self.pull()
+        self.regs.A = value
+        self.regs.P = (self.regs.P & KEEP_NZ) | NZ[value]
+
+    def PLP(self) -> None:
+        """Pull Processor Status from Stack. The value in the Memory address pointed to by the
+            Stack Pointer becomes the packed P byte, ignoring the Break Flag and bit 5. Stack
+            Pointer incremented"""
+        self.regs.P = self.pull() & ~(FLAG_B | FLAG_U) & 0xFF
+        if not self.regs.P & FLAG_I:
+            self.unmasked()
+
+    def ROL(self, address: int | np.uint) -> None:
+        """Rotate Left. The value stored at the Memory address has its bits shifted to the
+            left, with the value of the Carry Flag becoming the new bit 0 and the previous
+            value of bit 7 being stored in the Carry Flag."""
+        regs = self.regs
+        result, flags = alu.ROL[((regs.P & FLAG_C) << 8) | self.memory.read_mem(address)]
+        self.memory.write_mem(address, result)
+        regs.P = (regs.P & KEEP_NZC) | flags
+
+    def ROL_A(self) -> None:
+        """Rotate Left on the Accumulator"""
+        regs = self.regs
+        regs.A, flags = alu.ROL[((regs.P & FLAG_C) << 8) | regs.A]
+        regs.P = (regs.P & KEEP_NZC) | flags
+
+    def ROR(self, address: int | np.uint) -> None:
+        """Rotate Right. The value stored at the Memory address has its bits shifted to the
+            right, with the value of the Carry Flag becoming the new bit 7 and the previous
+            value of bit 0 being stored in the Carry Flag."""
+        regs = self.regs
+        result, flags = alu.ROR[((regs.P & FLAG_C) << 8) | self.memory.read_mem(address)]
+        self.memory.write_mem(address, result)
+        regs.P = (regs.P & KEEP_NZC) | flags
+
+    def ROR_A(self) -> None:
+        """Rotate Right on the Accumulator"""
+        regs = self.regs
+        regs.A, flags = alu.ROR[((regs.P & FLAG_C) << 8) | regs.A]
+        regs.P = (regs.P & KEEP_NZC) | flags
+
+    def RTI(self) -> None:
+        """Return from Interrupt. The Processor Status and then the Program Counter are
+            pulled from the Stack."""
+        self.PLP()
+        low = self.pull()
+        self.regs.PC = low | (self.pull() << 8)
+
+    def RTS(self) -> None:
+        """Return from Subroutine. The Program Counter is pulled from the Stack and
+            incremented to point past the JSR that called the subroutine."""
+        low = self.pull()
+        self.regs.PC = ((low | (self.pull() << 8)) + 1) & 0xFFFF
+
+    def SBC(self, address: int | np.uint) -> None:
+        """Subtract Memory from Accumulator with Borrow. The Carry flag is the inverse of
+            the borrow, and Overflow is set if the signed result doesn't fit in 8 bits."""
+        regs = self.regs
+        regs.A, flags = alu.add(regs.A, self.memory.read_mem(address) ^ 0xFF, regs.P & FLAG_C)
+        regs.P = (regs.P & KEEP_NVZC) | flags
+
+    def SEC(self) -> None:
+        """Set Carry Flag"""
+        self.regs.P |= FLAG_C
+
+    def SED(self) -> None:
+        """Set Decimal Mode Flag"""
+        self.regs.P |= FLAG_D
+
+    def SEI(self) -> None:
+        """Set Interrupt Disable Flag"""
+        self.regs.P |= FLAG_I
+
+    def STA(self, address: int | np.uint) -> None:
+        """Store Accumulator in specified Memory address"""
+        self.memory.write_mem(address, self.regs.A)
+
+    def STX(self, address: int | np.uint) -> None:
+        """Store Index X in specified Memory address"""
+        self.memory.write_mem(address, self.regs.X)
+
+    def STY(self, address: int | np.uint) -> None:
+        """Store Index Y in specified Memory address"""
+        self.memory.write_mem(address, self.regs.Y)
+
+    def TAX(self) -> None:
+        """Transfer Accumulator to Index X"""
+        self.regs.X = self.regs.A
+        self.regs.P = (self.regs.P & KEEP_NZ) | NZ[self.regs.X]
+
+    def TAY(self) -> None:
+        """Transfer Accumulator to Index Y"""
+        self.regs.Y = self.regs.A
+        self.regs.P = (self.regs.P & KEEP_NZ) | NZ[self.regs.Y]
+
+    def TSX(self) -> None:
+        """Transfer Stack Pointer to Index X"""
+        self.regs.X = self.regs.SP
+        self.regs.P = (self.regs.P & KEEP_NZ) | NZ[self.regs.X]
+
+    def TXA(self) -> None:
+        """Transfer Index X to Accumulator"""
+        self.regs.A = self.regs.X
+        self.regs.P = (self.regs.P & KEEP_NZ) | NZ[self.regs.A]
+
+    def TXS(self) -> None:
+        """Transfer Index X to Stack Pointer. No flags are affected."""
+        self.regs.SP = self.regs.X
+
+    def TYA(self) -> None:
+        """Transfer Index Y to Accumulator"""
+        self.regs.A = self.regs.Y
+        self.regs.P = (self.regs.P & KEEP_NZ) | NZ[self.regs.A]
+
+
+class Memory(Bus):
+    """
+    Represents the memory to be utilized by the CPU: the full 64KB address space, with
+    the system's 2KB of RAM mapped at $0000-$07FF and mirrored up to $1FFF. The rest of
+    the address space is flat memory until the cartridge and devices are mapped in.
+    ** NOTE: Little Endian **
+    """
+    def __init__(self, ram: RAM = None):
+        super().__init__()
+        self.ram = ram if ram is not None else RAM()
+        self.memory = self.ram.get_memory()
+        self.map_memory(0x0000, 0x1FFF, self.memory)
+
+    def get_memory(self) -> np.array:
+        """Returns the RAM array"""
+        return self.memory
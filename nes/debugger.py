@@ -0,0 +1,252 @@
+# Author: Chase Smith
+# GitHub username: ChaseSmith67
+# Description: Debugger with execution breakpoints and memory watchpoints. Every check
+#               is a single index into a 64K bitmap, and nothing is hooked at all
+#               while no breakpoints or watchpoints are set.
+
+READ = 1
+WRITE = 2
+
+
+class Hit(object):
+    """
+    Why the debugger stopped: kind is "break", "read" or "write"; address is the
+    breakpoint or the memory address accessed; value is the byte read or written; pc is
+    the instruction that was about to run or made the access.
+    """
+    __slots__ = ("kind", "address", "value", "pc")
+
+    def __init__(self, kind: str, address: int, value: int | None, pc: int):
+        self.kind = kind
+        self.address = address
+        self.value = value
+        self.pc = pc
+
+    def __repr__(self) -> str:
+        value = "" if self.value is None else f" value=${self.value:02X}"
+        return f"Hit({self.kind} ${self.address:04X}{value} at ${self.pc:04X})"
+
+
+class Debugger(object):
+    """
+    Breakpoints and watchpoints over a CPU and its bus.
+
+    Execution breakpoints are marked in a 64K bytearray checked with one index before
+    each instruction; a breakpoint can have a condition, called with the CPU, that is
+    only evaluated when its bit is set. Watchpoints are marked in a second bytearray
+    (READ and WRITE bits) and only the bus pages that contain one are routed through
+    the checking handlers, the way the translator hooks code pages. A watchpoint can be
+    limited to one value and have a condition called with (cpu, address, value).
+
+    The debugger is only a CPU monitor while something is set, so with no breakpoints
+    or watchpoints the CPU runs its plain loop and the bus its plain pages.
+
+    When something triggers, the CPU stops before the next instruction (cpu.stopped is
+    set, which also stops the scheduler) and hit says why. resume() carries on.
+    """
+    def __init__(self, cpu):
+        self.cpu = cpu
+        self.bus = cpu.memory
+        self.breakpoints = bytearray(0x10000)
+        self.break_conditions = {}
+        self.watchpoints = bytearray(0x10000)
+        self.watch_filters = {}         # Address -> (value or None, condition or None)
+        self.hooked = {}                # Page -> (read view, reader, write view, writer)
+        self.page_watches = {}          # Page -> number of watched addresses in it
+        self.break_count = 0
+        self.hit = None
+        self.pending = None             # A watchpoint hit, stopped on before the next instruction
+        self.skip = None                # PC to run past once after resuming
+        self.pc = 0                     # Instruction being executed
+        self.listeners = []             # Called with each Hit
+        self.bus.add_map_listener(self.remapped)
+
+    # ----- Breakpoints
+
+    def add_breakpoint(self, address: int, condition=None) -> None:
+        """Stops before the instruction at address runs, if condition(cpu) is true"""
+        self.flush_translator()
+        address &= 0xFFFF
+        if not self.breakpoints[address]:
+            self.breakpoints[address] = 1
+            self.break_count += 1
+        if condition is not None:
+            self.break_conditions[address] = condition
+        else:
+            self.break_conditions.pop(address, None)
+        self.update_monitor()
+
+    def remove_breakpoint(self, address: int) -> None:
+        """Removes a breakpoint"""
+        address &= 0xFFFF
+        if self.breakpoints[address]:
+            self.breakpoints[address] = 0
+            self.break_count -= 1
+            self.break_conditions.pop(address, None)
+        self.update_monitor()
+
+    # ----- Watchpoints
+
+    def add_watchpoint(self, start: int, end: int = None, read: bool = False, write: bool = True,
+                       value: int = None, condition=None) -> None:
+        """Stops after an instruction reads and/or writes any address in [start, end].
+            With value, only accesses of that byte count; condition(cpu, address, value)
+            can filter further."""
+        self.flush_translator()
+        end = start if end is None else end
+        kinds = (READ if read else 0) | (WRITE if write else 0)
+        for address in range(start & 0xFFFF, (end & 0xFFFF) + 1):
+            if not self.watchpoints[address]:
+                page = address >> 8
+                self.page_watches[page] = self.page_watches.get(page, 0) + 1
+                self.hook(page)
+            self.watchpoints[address] = kinds
+            if value is not None or condition is not None:
+                self.watch_filters[address] = (value, condition)
+            else:
+                self.watch_filters.pop(address, None)
+        self.update_monitor()
+
+    def remove_watchpoint(self, start: int, end: int = None) -> None:
+        """Removes the watchpoints in [start, end]"""
+        end = start if end is None else end
+        for address in range(start & 0xFFFF, (end & 0xFFFF) + 1):
+            if self.watchpoints[address]:
+                self.watchpoints[address] = 0
+                self.watch_filters.pop(address, None)
+                page = address >> 8
+                self.page_watches[page] -= 1
+                if not self.page_watches[page]:
+                    del self.page_watches[page]
+                    self.unhook(page)
+        self.update_monitor()
+
+    def clear(self) -> None:
+        """Removes every breakpoint and watchpoint"""
+        for page in list(self.page_watches):
+            self.remove_watchpoint(page << 8, (page << 8) | 0xFF)
+        for address in [address for address, marked in enumerate(self.breakpoints) if marked]:
+            self.remove_breakpoint(address)
+
+    def hook(self, page: int) -> None:
+        """Routes reads and writes of a page through the watchpoint checks"""
+        if page in self.hooked:
+            return
+        bus = self.bus
+        read_view, reader = bus.read_pages[page], bus.readers[page]
+        write_view, writer = bus.write_pages[page], bus.writers[page]
+        self.hooked[page] = (read_view, reader, write_view, writer)
+        watchpoints = self.watchpoints
+
+        def read(address: int) -> int:
+            value = read_view[address & 0xFF] if read_view is not None else reader(address)
+            if watchpoints[address] & READ:
+                self.accessed("read", address, value)
+            return value
+
+        def write(address: int, value: int) -> None:
+            if watchpoints[address] & WRITE:
+                self.accessed("write", address, value & 0xFF)
+            if write_view is not None:
+                write_view[address & 0xFF] = value & 0xFF
+            else:
+                writer(address, value)
+
+        bus.read_pages[page] = None
+        bus.readers[page] = read
+        bus.write_pages[page] = None
+        bus.writers[page] = write
+
+    def unhook(self, page: int) -> None:
+        """Restores a page's original mapping"""
+        read_view, reader, write_view, writer = self.hooked.pop(page)
+        bus = self.bus
+        bus.read_pages[page], bus.readers[page] = read_view, reader
+        bus.write_pages[page], bus.writers[page] = write_view, writer
+
+    def remapped(self, pages: range) -> None:
+        """Called by the bus after pages are remapped: watched pages are hooked again
+            around the new mapping"""
+        for page in pages:
+            if page in self.hooked:
+                del self.hooked[page]
+                self.hook(page)
+
+    def accessed(self, kind: str, address: int, value: int) -> None:
+        """A watched address was accessed: checks its filter and queues a stop"""
+        watch = self.watch_filters.get(address)
+        if watch is not None:
+            expected, condition = watch
+            if expected is not None and value != expected:
+                return
+            if condition is not None and not condition(self.cpu, address, value):
+                return
+        if self.pending is None:
+            self.pending = Hit(kind, address, value, self.pc)
+
+    # ----- Execution control
+
+    def flush_translator(self) -> None:
+        """Discards translated blocks before the debugger first attaches, as they can't be
+            watched. Called before any page is hooked, since flushing restores the mappings
+            the translator wrapped."""
+        if self not in self.cpu.monitors and self.cpu.translator is not None:
+            self.cpu.translator.flush()
+
+    def update_monitor(self) -> None:
+        """Attaches the debugger to the CPU while anything is set, and detaches it when
+            nothing is, so the plain loop runs again"""
+        if self.break_count or self.page_watches:
+            self.cpu.add_monitor(self)
+        else:
+            self.cpu.remove_monitor(self)
+
+    def instruction(self, pc: int, opcode: int) -> bool:
+        """Monitor callback: decides whether to stop before the instruction at pc"""
+        self.pc = pc
+        if self.pending is not None:
+            return self.stop(self.pending)
+        if self.breakpoints[pc]:
+            if self.skip == pc:
+                self.skip = None
+                return False
+            condition = self.break_conditions.get(pc)
+            if condition is None or condition(self.cpu):
+                return self.stop(Hit("break", pc, None, pc))
+        self.skip = None
+        return False
+
+    def stop(self, hit: Hit) -> bool:
+        """Records a hit and tells the CPU to stop"""
+        self.hit = hit
+        self.pending = None
+        for listener in self.listeners:
+            listener(hit)
+        return True
+
+    @property
+    def stopped(self) -> bool:
+        """Whether execution is stopped by the debugger"""
+        return self.cpu.stopped and self.hit is not None
+
+    def resume(self) -> None:
+        """Lets execution continue, running past a breakpoint at the current PC once"""
+        if self.hit is not None and self.hit.kind == "break":
+            self.skip = self.cpu.regs.PC
+        self.hit = None
+        self.cpu.stopped = False
+
+    def step(self) -> int:
+        """Executes one instruction from a stop, ignoring a breakpoint at the PC. Returns
+            its cycles."""
+        self.resume()
+        monitors = self.cpu.monitors
+        self.cpu.monitors = [monitor for monitor in monitors if monitor is not self]
+        try:
+            cycles = self.cpu.step()
+        finally:
+            self.cpu.monitors = monitors
+        if self.pending is not None:
+            self.stop(self.pending)
+            self.cpu.stopped = True
+        return cycles
@@ -0,0 +1,212 @@
+# Author: Chase Smith
+# GitHub username: ChaseSmith67
+# Description: Writes finished frames out without holding up emulation. Frames are
+#               copied into a preallocated ring of buffers and a background thread
+#               encodes them as raw RGB, a PNG sequence or a pipe to another program.
+
+import os
+import shlex
+import struct
+import subprocess
+import threading
+import zlib
+
+import numpy as np
+
+from .ppu import WIDTH, HEIGHT
+
+# What to do with a new frame when every slot in the ring is waiting to be encoded
+BLOCK = "block"     # Wait for the encoder to free a slot
+DROP = "drop"       # Discard the new frame
+SKIP = "skip"       # Replace the newest queued frame, so the encoder skips it
+POLICIES = (BLOCK, DROP, SKIP)
+
+
+class RawEncoder(object):
+    """
+    Writes frames back to back as packed 24-bit RGB to a file, or to stdout for "-"
+    """
+    def __init__(self, path: str):
+        self.file = os.fdopen(os.dup(1), "wb") if path == "-" else open(path, "wb")
+
+    def write(self, frame: np.ndarray, number: int) -> None:
+        """Writes one frame"""
+        self.file.write(memoryview(frame).cast("B"))
+
+    def close(self) -> None:
+        """Closes the output"""
+        self.file.close()
+
+
+class PNGEncoder(object):
+    """
+    Writes each frame as its own PNG file. pattern is formatted with the frame number,
+    e.g. "frames/{:06d}.png". PNG is written directly with zlib, so no imaging library
+    is needed; level trades file size for encoding time.
+    """
+    SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+    def __init__(self, pattern: str, level: int = 1):
+        self.pattern = pattern
+        self.level = level
+        # Scanlines prefixed with their filter type byte (0, none), reused every frame
+        self.rows = np.zeros((HEIGHT, 1 + WIDTH * 3), dtype=np.uint8)
+        self.header = struct.pack(">IIBBBBB", WIDTH, HEIGHT, 8, 2, 0, 0, 0)
+        directory = os.path.dirname(pattern.format(0))
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        """Returns a PNG chunk: length, type, data and CRC"""
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    def write(self, frame: np.ndarray, number: int) -> None:
+        """Writes one frame to its own file"""
+        self.rows[:, 1:] = frame.reshape(HEIGHT, WIDTH * 3)
+        data = zlib.compress(self.rows, self.level)
+        with open(self.pattern.format(number), "wb") as file:
+            file.write(self.SIGNATURE + self.chunk(b"IHDR", self.header)
+                       + self.chunk(b"IDAT", data) + self.chunk(b"IEND", b""))
+
+    def close(self) -> None:
+        pass
+
+
+class PipeEncoder(object):
+    """
+    Pipes raw RGB frames into another program's standard input, e.g.
+    "ffmpeg -f rawvideo -pix_fmt rgb24 -s 256x240 -r 60 -i - out.mp4"
+    """
+    def __init__(self, command: str):
+        self.process = subprocess.Popen(shlex.split(command), stdin=subprocess.PIPE)
+
+    def write(self, frame: np.ndarray, number: int) -> None:
+        """Writes one frame to the program"""
+        self.process.stdin.write(memoryview(frame).cast("B"))
+
+    def close(self) -> None:
+        """Closes the pipe and waits for the program to finish"""
+        self.process.stdin.close()
+        self.process.wait()
+
+
+ENCODERS = {"raw": RawEncoder, "png": PNGEncoder, "pipe": PipeEncoder}
+
+
+def create_encoder(kind: str, target: str):
+    """Returns an encoder of the given kind ("raw", "png" or "pipe") writing to target"""
+    if kind not in ENCODERS:
+        raise ValueError(f"Unknown frame format {kind!r}, expected one of {', '.join(ENCODERS)}")
+    return ENCODERS[kind](target)
+
+
+class FrameOutput(object):
+    """
+    A ring of preallocated frame buffers drained by a background encoder thread.
+    submit() copies a frame into a free slot and returns straight away; policy decides
+    what happens when the encoder has fallen behind and no slot is free (see BLOCK,
+    DROP and SKIP). Nothing is allocated per frame on the emulation side.
+
+    Encoding mostly runs in zlib and file writes, which release the GIL, so it overlaps
+    with emulation in a thread without needing a separate process.
+    """
+    def __init__(self, encoder, slots: int = 8, policy: str = BLOCK):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown backpressure policy {policy!r}, expected one of {', '.join(POLICIES)}")
+        if slots < 2:
+            raise ValueError("A frame ring needs at least 2 slots")
+        self.encoder = encoder
+        self.policy = policy
+        self.buffers = np.zeros((slots, HEIGHT, WIDTH, 3), dtype=np.uint8)
+        self.numbers = np.zeros(slots, dtype=np.int64)
+        self.slots = slots
+        self.head = 0       # Next slot to fill
+        self.tail = 0       # Next slot to encode
+        self.queued = 0
+        self.closed = False
+        self.condition = threading.Condition()
+
+        # Statistics
+        self.submitted = 0
+        self.encoded = 0
+        self.dropped = 0
+        self.skipped = 0
+        self.blocked = 0
+
+        self.error = None
+        self.thread = threading.Thread(target=self.drain, name="frame-encoder", daemon=True)
+        self.thread.start()
+
+    def attach(self, ppu) -> None:
+        """Submits every frame the PPU finishes"""
+        ppu.output_listeners.append(lambda ppu: self.submit(ppu.frame, ppu.frame_count))
+
+    def submit(self, frame: np.ndarray, number: int) -> bool:
+        """Queues a copy of the frame for encoding. Returns False if it was dropped."""
+        with self.condition:
+            if self.error is not None:
+                raise RuntimeError("Frame encoder failed") from self.error
+            self.submitted += 1
+            if self.queued == self.slots:
+                if self.policy == DROP:
+                    self.dropped += 1
+                    return False
+                if self.policy == SKIP:
+                    # The newest queued frame is never the one being encoded
+                    slot = (self.head - 1) % self.slots
+                    np.copyto(self.buffers[slot], frame)
+                    self.numbers[slot] = number
+                    self.skipped += 1
+                    return True
+                self.blocked += 1
+                while self.queued == self.slots and self.error is None:
+                    self.condition.wait()
+                if self.error is not None:
+                    raise RuntimeError("Frame encoder failed") from self.error
+            slot = self.head
+        # The slot is free and the encoder won't touch it until it is queued
+        np.copyto(self.buffers[slot], frame)
+        self.numbers[slot] = number
+        with self.condition:
+            self.head = (slot + 1) % self.slots
+            self.queued += 1
+            self.condition.notify_all()
+        return True
+
+    def drain(self) -> None:
+        """Encoder thread: encodes queued frames in order until closed and empty"""
+        while True:
+            with self.condition:
+                while not self.queued and not self.closed:
+                    self.condition.wait()
+                if not self.queued:
+                    return
+                slot = self.tail
+            try:
+                self.encoder.write(self.buffers[slot], int(self.numbers[slot]))
+            except Exception as error:
+                with self.condition:
+                    self.error = error
+                    self.condition.notify_all()
+                return
+            with self.condition:
+                self.tail = (slot + 1) % self.slots
+                self.queued -= 1
+                self.encoded += 1
+                self.condition.notify_all()
+
+    def close(self) -> None:
+        """Waits for the queued frames to be encoded, then closes the encoder"""
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        self.thread.join()
+        self.encoder.close()
+        if self.error is not None:
+            raise RuntimeError("Frame encoder failed") from self.error
+
+    def stats(self) -> dict:
+        """Returns the frame counters"""
+        return {"submitted": self.submitted, "encoded": self.encoded, "dropped": self.dropped,
+                "skipped": self.skipped, "blocked": self.blocked}
@@ -0,0 +1,187 @@
+# Author: Chase Smith
+# GitHub username: ChaseSmith67
+# Description: Idle-loop detection. Recognises the short polling loops games spin in
+#               while they wait for VBlank or for the NMI handler to set a flag, and
+#               moves the cycle counter straight to the next event instead of
+#               interpreting every pass through the loop.
+
+from .instructions import opcode_table, IMP, ACC, IMM, ZP, ABS, REL
+
+JMP_ABSOLUTE = 0x4C
+MAX_LENGTH = 32     # Longest loop body, in bytes, that is considered
+
+# Instructions that read memory without side effects
+READS = {"ADC", "AND", "BIT", "CMP", "CPX", "CPY", "EOR", "LDA", "LDX", "LDY", "ORA", "SBC"}
+
+# Implied and accumulator instructions that only change registers
+REGISTER_ONLY = {"ASL_A", "LSR_A", "ROL_A", "ROR_A", "CLC", "CLD", "CLV", "SEC", "SED", "NOP",
+                 "DEX", "DEY", "INX", "INY", "TAX", "TAY", "TSX", "TXA", "TXS", "TYA"}
+
+
+class Loop(object):
+    """
+    What is known about the loop closed by a backward branch or jump: whether it can be
+    skipped at all, the cycles one pass takes, the addresses it reads, its code (to
+    notice when it's overwritten or banked out) and the state at the last pass.
+    """
+    __slots__ = ("start", "idle", "period", "closing", "instructions", "reads", "code", "cycles", "state")
+
+    def __init__(self, start: int, idle: bool, period: int = 0, closing: int = 0, instructions: int = 0,
+                 reads: tuple = (), code: bytes = b""):
+        self.start = start
+        self.idle = idle
+        self.period = period
+        self.closing = closing          # Base cycles of the closing instruction
+        self.instructions = instructions
+        self.reads = reads
+        self.code = code
+        self.cycles = None
+        self.state = None
+
+
+class IdleDetector(object):
+    """
+    Finds idle loops and fast-forwards through them. The CPU calls backward_branch()
+    for every taken backward branch or jump while a detector is attached.
+
+    A loop qualifies when its body is straight-line code of register-only instructions
+    and immediate, zero page or absolute reads: no stores, stack operations, jumps or
+    other branches. Such a loop is idle once two passes in a row end with the same
+    registers, exactly one pass apart in cycles (so no interrupt or DMA ran in
+    between): every further pass reads the same memory and does the same thing, until
+    something else changes that memory.
+
+    Plain memory pages can only change through the CPU, and so only once the next event
+    has fired. Device registers are only safe with a limit function, called with the
+    cycle the last pass started after, that returns the first cycle after it at which
+    reading them could give something new (e.g. PPUSTATUS at the next VBlank); anything
+    else stops the loop from being skipped. The CPU is moved forward
+    by whole passes, up to the earliest of those limits and the end of the current run,
+    and then carries on as normal.
+
+    hits counts the loops skipped; skipped_cycles and skipped_instructions measure how
+    much work that saved. Nothing is skipped while CPU monitors (tracer, profiler,
+    debugger) are attached, as they need to see every instruction. The translator
+    inlines its branches, so translated code is not covered.
+    """
+    def __init__(self, cpu):
+        self.cpu = cpu
+        self.bus = cpu.memory
+        self.loops = {}         # Address of the closing instruction -> Loop
+        self.limits = {}        # Device register address -> function returning a cycle limit
+        self.hits = 0
+        self.skipped_cycles = 0
+        self.skipped_instructions = 0
+        self.bus.add_map_listener(self.remapped)
+
+    def attach(self) -> None:
+        """Starts detecting idle loops"""
+        self.cpu.idle = self
+
+    def detach(self) -> None:
+        """Stops detecting idle loops"""
+        if self.cpu.idle is self:
+            self.cpu.idle = None
+
+    def reset(self) -> None:
+        """Forgets every loop, e.g. after the machine state is replaced"""
+        self.loops.clear()
+
+    def remapped(self, pages: range) -> None:
+        """Called by the bus after pages are remapped: the code there may have changed"""
+        self.loops.clear()
+
+    def stats(self) -> dict:
+        """Returns the counters"""
+        return {"hits": self.hits, "skipped_cycles": self.skipped_cycles,
+                "skipped_instructions": self.skipped_instructions}
+
+    def backward_branch(self, pc: int, target: int) -> None:
+        """Called by the CPU when the branch or jump at pc goes back to target, with its
+            base cycles not yet added"""
+        cpu = self.cpu
+        if cpu.monitors:
+            return
+        loop = self.loops.get(pc)
+        if loop is None or loop.start != target:
+            loop = self.loops[pc] = self.analyse(pc, target)
+        if not loop.idle:
+            return
+        regs = cpu.regs
+        state = (regs.A, regs.X, regs.Y, regs.P, regs.SP)
+        if state == loop.state and cpu.cycles - loop.cycles == loop.period:
+            self.skip(pc, loop)
+        loop.state = state
+        loop.cycles = cpu.cycles
+
+    def analyse(self, pc: int, target: int) -> Loop:
+        """Decides whether the loop from target to the instruction at pc can be idle"""
+        read = self.bus.read_mem
+        if pc - target > MAX_LENGTH:
+            return Loop(target, False)
+        address = target
+        period = 0
+        instructions = 1
+        reads = []
+        while address < pc:
+            entry = opcode_table[read(address)]
+            if entry is None:
+                return Loop(target, False)
+            name, mode, length, cycles, _ = entry
+            if mode == ZP or mode == ABS:
+                if name not in READS:
+                    return Loop(target, False)
+                operand = read((address + 1) & 0xFFFF)
+                if mode == ABS:
+                    operand |= read((address + 2) & 0xFFFF) << 8
+                reads.append(operand)
+            elif mode == IMM:
+                if name not in READS:
+                    return Loop(target, False)
+            elif mode != IMP and mode != ACC or name not in REGISTER_ONLY:
+                return Loop(target, False)
+            period += cycles
+            instructions += 1
+            address += length
+        if address != pc:
+            return Loop(target, False)
+
+        opcode = read(pc)
+        entry = opcode_table[opcode]
+        if opcode == JMP_ABSOLUTE:
+            closing, length = 3, 3
+            period += closing
+        elif entry is not None and entry[1] == REL:
+            closing, length = entry[3], entry[2]
+            period += closing + (2 if ((pc + 2) ^ target) & 0xFF00 else 1)
+        else:
+            return Loop(target, False)
+        code = bytes(read(address) for address in range(target, pc + length))
+        return Loop(target, True, period, closing, instructions, tuple(reads), code)
+
+    def skip(self, pc: int, loop: Loop) -> None:
+        """Moves the CPU forward by as many whole passes of the loop as it can"""
+        cpu = self.cpu
+        limit = cpu.run_target
+        if not limit:
+            return
+        read_pages = self.bus.read_pages
+        for address in loop.reads:
+            if read_pages[address >> 8] is None:
+                limiter = self.limits.get(address)
+                if limiter is None:
+                    return
+                limit = min(limit, limiter(loop.cycles))
+        # The pass in progress ends once the closing instruction's base cycles are added
+        passes = (limit - cpu.cycles - loop.closing) // loop.period
+        if passes <= 0:
+            return
+        read = self.bus.read_mem
+        if bytes(read(address) for address in range(loop.start, loop.start + len(loop.code))) != loop.code:
+            del self.loops[pc]
+            return
+        cycles = passes * loop.period
+        cpu.cycles += cycles
+        self.hits += 1
+        self.skipped_cycles += cycles
+        self.skipped_instructions += passes * loop.instructions
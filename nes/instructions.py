@@ -0,0 +1,149 @@
+# Author: Chase Smith
+# GitHub: ChaseSmith67
+
+# The opcode table used to decode and dispatch instructions. Every official
+# 6502 opcode is listed once, keyed by its byte value, with the name of the
+# CPU method that carries it out, its addressing mode, its length in bytes,
+# its base cycle count and whether crossing a page adds a cycle.
+
+# Addressing Modes
+IMP = "IMP"     # Implied
+ACC = "ACC"     # Accumulator
+IMM = "IMM"     # Immediate
+ZP = "ZP"       # Zero Page
+ZPX = "ZPX"     # Zero Page, X
+ZPY = "ZPY"     # Zero Page, Y
+ABS = "ABS"     # Absolute
+ABX = "ABX"     # Absolute, X
+ABY = "ABY"     # Absolute, Y
+IND = "IND"     # Indirect (JMP only)
+IZX = "IZX"     # (Indirect, X)
+IZY = "IZY"     # (Indirect), Y
+REL = "REL"     # Relative (branches only)
+
+# Opcode: (Handler, Addressing Mode, Length, Base Cycles, Page Penalty)
+OPCODES = {
+    0x69: ("ADC", IMM, 2, 2, False), 0x65: ("ADC", ZP, 2, 3, False),
+    0x75: ("ADC", ZPX, 2, 4, False), 0x6D: ("ADC", ABS, 3, 4, False),
+    0x7D: ("ADC", ABX, 3, 4, True), 0x79: ("ADC", ABY, 3, 4, True),
+    0x61: ("ADC", IZX, 2, 6, False), 0x71: ("ADC", IZY, 2, 5, True),
+
+    0x29: ("AND", IMM, 2, 2, False), 0x25: ("AND", ZP, 2, 3, False),
+    0x35: ("AND", ZPX, 2, 4, False), 0x2D: ("AND", ABS, 3, 4, False),
+    0x3D: ("AND", ABX, 3, 4, True), 0x39: ("AND", ABY, 3, 4, True),
+    0x21: ("AND", IZX, 2, 6, False), 0x31: ("AND", IZY, 2, 5, True),
+
+    0x0A: ("ASL_A", ACC, 1, 2, False), 0x06: ("ASL", ZP, 2, 5, False),
+    0x16: ("ASL", ZPX, 2, 6, False), 0x0E: ("ASL", ABS, 3, 6, False),
+    0x1E: ("ASL", ABX, 3, 7, False),
+
+    0x90: ("BCC", REL, 2, 2, False), 0xB0: ("BCS", REL, 2, 2, False),
+    0xF0: ("BEQ", REL, 2, 2, False), 0x30: ("BMI", REL, 2, 2, False),
+    0xD0: ("BNE", REL, 2, 2, False), 0x10: ("BPL", REL, 2, 2, False),
+    0x50: ("BVC", REL, 2, 2, False), 0x70: ("BVS", REL, 2, 2, False),
+
+    0x24: ("BIT", ZP, 2, 3, False), 0x2C: ("BIT", ABS, 3, 4, False),
+
+    0x00: ("BRK", IMP, 1, 7, False),
+
+    0x18: ("CLC", IMP, 1, 2, False), 0xD8: ("CLD", IMP, 1, 2, False),
+    0x58: ("CLI", IMP, 1, 2, False), 0xB8: ("CLV", IMP, 1, 2, False),
+
+    0xC9: ("CMP", IMM, 2, 2, False), 0xC5: ("CMP", ZP, 2, 3, False),
+    0xD5: ("CMP", ZPX, 2, 4, False), 0xCD: ("CMP", ABS, 3, 4, False),
+    0xDD: ("CMP", ABX, 3, 4, True), 0xD9: ("CMP", ABY, 3, 4, True),
+    0xC1: ("CMP", IZX, 2, 6, False), 0xD1: ("CMP", IZY, 2, 5, True),
+
+    0xE0: ("CPX", IMM, 2, 2, False), 0xE4: ("CPX", ZP, 2, 3, False),
+    0xEC: ("CPX", ABS, 3, 4, False),
+
+    0xC0: ("CPY", IMM, 2, 2, False), 0xC4: ("CPY", ZP, 2, 3, False),
+    0xCC: ("CPY", ABS, 3, 4, False),
+
+    0xC6: ("DEC", ZP, 2, 5, False), 0xD6: ("DEC", ZPX, 2, 6, False),
+    0xCE: ("DEC", ABS, 3, 6, False), 0xDE: ("DEC", ABX, 3, 7, False),
+
+    0xCA: ("DEX", IMP, 1, 2, False), 0x88: ("DEY", IMP, 1, 2, False),
+
+    0x49: ("EOR", IMM, 2, 2, False), 0x45: ("EOR", ZP, 2, 3, False),
+    0x55: ("EOR", ZPX, 2, 4, False), 0x4D: ("EOR", ABS, 3, 4, False),
+    0x5D: ("EOR", ABX, 3, 4, True), 0x59: ("EOR", ABY, 3, 4, True),
+    0x41: ("EOR", IZX, 2, 6, False), 0x51: ("EOR", IZY, 2, 5, True),
+
+    0xE6: ("INC", ZP, 2, 5, False), 0xF6: ("INC", ZPX, 2, 6, False),
+    0xEE: ("INC", ABS, 3, 6, False), 0xFE: ("INC", ABX, 3, 7, False),
+
+    0xE8: ("INX", IMP, 1, 2, False), 0xC8: ("INY", IMP, 1, 2, False),
+
+    0x4C: ("JMP", ABS, 3, 3, False), 0x6C: ("JMP", IND, 3, 5, False),
+
+    0x20: ("JSR", ABS, 3, 6, False),
+
+    0xA9: ("LDA", IMM, 2, 2, False), 0xA5: ("LDA", ZP, 2, 3, False),
+    0xB5: ("LDA", ZPX, 2, 4, False), 0xAD: ("LDA", ABS, 3, 4, False),
+    0xBD: ("LDA", ABX, 3, 4, True), 0xB9: ("LDA", ABY, 3, 4, True),
+    0xA1: ("LDA", IZX, 2, 6, False), 0xB1: ("LDA", IZY, 2, 5, True),
+
+    0xA2: ("LDX", IMM, 2, 2, False), 0xA6: ("LDX", ZP, 2, 3, False),
+    0xB6: ("LDX", ZPY, 2, 4, False), 0xAE: ("LDX", ABS, 3, 4, False),
+    0xBE: ("LDX", ABY, 3, 4, True),
+
+    0xA0: ("LDY", IMM, 2, 2, False), 0xA4: ("LDY", ZP, 2, 3, False),
+    0xB4: ("LDY", ZPX, 2, 4, False), 0xAC: ("LDY", ABS, 3, 4, False),
+    0xBC: ("LDY", ABX, 3, 4, True),
+
+    0x4A: ("LSR_A", ACC, 1, 2, False), 0x46: ("LSR", ZP, 2, 5, False),
+    0x56: ("LSR", ZPX, 2, 6, False), 0x4E: ("LSR", ABS, 3, 6, False),
+    0x5E: ("LSR", ABX, 3, 7, False),
+
+    0xEA: ("NOP", IMP, 1, 2, False),
+
+    0x09: ("ORA", IMM, 2, 2, False), 0x05: ("ORA", ZP, 2, 3, False),
+    0x15: ("ORA", ZPX, 2, 4, False), 0x0D: ("ORA", ABS, 3, 4, False),
+    0x1D: ("ORA", ABX, 3, 4, True), 0x19: ("ORA", ABY, 3, 4, True),
+    0x01: ("ORA", IZX, 2, 6, False), 0x11: ("ORA", IZY, 2, 5, True),
+
+    0x48: ("PHA", IMP, 1, 3, False), 0x08: ("PHP", IMP, 1, 3, False),
+    0x68: ("PLA", IMP, 1, 4, False), 0x28: ("PLP", IMP, 1, 4, False),
+
+    0x2A: ("ROL_A", ACC, 1, 2, False), 0x26: ("ROL", ZP, 2, 5, False),
+    0x36: ("ROL", ZPX, 2, 6, False), 0x2E: ("ROL", ABS, 3, 6, False),
+    0x3E: ("ROL", ABX, 3, 7, False),
+
+    0x6A: ("ROR_A", ACC, 1, 2, False), 0x66: ("ROR", ZP, 2, 5, False),
+    0x76: ("ROR", ZPX, 2, 6, False), 0x6E: ("ROR", ABS, 3, 6, False),
+    0x7E: ("ROR", ABX, 3, 7, False),
+
+    0x40: ("RTI", IMP, 1, 6, False), 0x60: ("RTS", IMP, 1, 6, False),
+
+    0xE9: ("SBC", IMM, 2, 2, False), 0xE5: ("SBC", ZP, 2, 3, False),
+    0xF5: ("SBC", ZPX, 2, 4, False), 0xED: ("SBC", ABS, 3, 4, False),
+    0xFD: ("SBC", ABX, 3, 4, True), 0xF9: ("SBC", ABY, 3, 4, True),
+    0xE1: ("SBC", IZX, 2, 6, False), 0xF1: ("SBC", IZY, 2, 5, True),
+
+    0x38: ("SEC", IMP, 1, 2, False), 0xF8: ("SED", IMP, 1, 2, False),
+    0x78: ("SEI", IMP, 1, 2, False),
+
+    0x85: ("STA", ZP, 2, 3, False), 0x95: ("STA", ZPX, 2, 4, False),
+    0x8D: ("STA", ABS, 3, 4, False), 0x9D: ("STA", ABX, 3, 5, False),
+    0x99: ("STA", ABY, 3, 5, False), 0x81: ("STA", IZX, 2, 6, False),
+    0x91: ("STA", IZY, 2, 6, False),
+
+    0x86: ("STX", ZP, 2, 3, False), 0x96: ("STX", ZPY, 2, 4, False),
+    0x8E: ("STX", ABS, 3, 4, False),
+
+    0x84: ("STY", ZP, 2, 3, False), 0x94: ("STY", ZPX, 2, 4, False),
+    0x8C: ("STY", ABS, 3, 4, False),
+
+    0xAA: ("TAX", IMP, 1, 2, False), 0xA8: ("TAY", IMP, 1, 2, False),
+    0xBA: ("TSX", IMP, 1, 2, False), 0x8A: ("TXA", IMP, 1, 2, False),
+    0x9A: ("TXS", IMP, 1, 2, False), 0x98: ("TYA", IMP, 1, 2, False),
+}
+
+# 256-entry table indexed directly by opcode byte, None for illegal opcodes
+opcode_table = [OPCODES.get(opcode) for opcode in range(256)]
+
+# Mnemonic: {Addressing Mode: Opcode}, used for assembly
+instructions = {}
+for _opcode, (_handler, _mode, _length, _cycles, _penalty) in sorted(OPCODES.items()):
+    instructions.setdefault(_handler[:3], {})[_mode] = _opcode
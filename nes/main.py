@@ -0,0 +1,315 @@
+# Author: Chase Smith
+# GitHub: ChaseSmith67
+
+
+import argparse
+import sys
+import time
+
+from .cartridge import load_rom, Cartridge
+from .controller import Controller
+from .cpu6502 import CPU, Memory, IRQ_MAPPER
+from .ram import RAM
+from .scheduler import Scheduler
+
+# Kept in step with frame_output and audio_output, which are only imported when
+# frames or audio are recorded
+ENCODERS = ("png", "pipe", "raw")
+SINKS = ("pipe", "raw", "wav")
+BLOCK, DROP, SKIP = "block", "drop", "skip"
+
+# NTSC: 341 PPU dots x 262 scanlines per frame, 3 dots per CPU cycle
+FRAME_CYCLES = 341 * 262 // 3
+
+
+class System(object):
+    """
+    Represents the complete computing system, with all necessary components. The
+    scheduler keeps time: the CPU runs freely between events and the other
+    components are caught up when they're accessed or an event needs them.
+
+    The PPU is created when a cartridge is inserted, as it renders from the
+    cartridge's CHR. From then on a frame ends at each VBlank, which is also when the
+    APU outputs the frame's audio.
+
+    With shared set, RAM, the registers and the frame buffer are exported through a
+    shared memory segment (see shared.SharedState) named shared_name, or given a name
+    if that's None.
+    """
+    def __init__(self, audio_rate: int = 44100, shared: bool = False, shared_name: str = None):
+        from .apu import APU
+        from .idle import IdleDetector
+
+        self.shared = None
+        if shared:
+            from .shared import SharedState
+
+            self.shared = SharedState(shared_name)
+        self.ram = RAM(self.shared.ram if self.shared is not None else None)
+        self.memory = Memory(self.ram)
+        self.cpu = CPU(self.memory)
+        self.scheduler = Scheduler(self.cpu)
+        self.idle = IdleDetector(self.cpu)
+        self.controllers = (Controller(), Controller())
+        self.memory.map_port(0x4016, read=self.controllers[0].read, write=self.strobe)
+        self.apu = APU(self.scheduler, self.memory, audio_rate)
+        self.scheduler.add_component(self.apu)
+        for address in range(0x4000, 0x4014):
+            self.memory.map_port(address, write=self.apu.write_register)
+        self.memory.map_port(0x4015, read=self.scheduler.synced(self.apu, self.apu.read_status),
+                             write=self.apu.write_register)
+        self.memory.map_port(0x4017, read=self.controllers[1].read, write=self.apu.write_register)
+        self.cartridge = None
+        self.ppu = None
+        self.frame = 0
+
+    def insert_cartridge(self, cartridge: Cartridge) -> None:
+        """Maps the cartridge into the CPU bus, connects the PPU to it and resets the CPU"""
+        from .ppu import PPU
+
+        self.cartridge = cartridge
+        cartridge.attach(self.memory)
+
+        self.ppu = PPU(self.scheduler, cartridge.mapper)
+        if self.shared is not None:
+            self.ppu.frame = self.shared.frame
+        self.scheduler.add_component(self.ppu)
+        self.memory.map_device(0x2000, 0x3FFF,
+                               read=self.scheduler.synced(self.ppu, self.ppu.read_register),
+                               write=self.scheduler.synced(self.ppu, self.ppu.write_register))
+        self.memory.map_port(0x4014, write=self.scheduler.synced(self.ppu, self.ppu.write_oam_dma))
+        self.ppu.frame_listeners.append(self.end_frame)
+        cartridge.mapper.irq_listeners.append(self.mapper_irq)
+        self.mapper_irq(cartridge.mapper.irq_pending)
+        for address in range(0x2002, 0x4000, 8):
+            self.idle.limits[address] = self.ppu.next_status_change
+
+        self.cpu.reset()
+
+    def mapper_irq(self, pending: bool) -> None:
+        """Holds the CPU's IRQ line while the cartridge's mapper has an IRQ pending"""
+        self.cpu.set_irq(IRQ_MAPPER, pending)
+
+    def strobe(self, address: int, value: int) -> None:
+        """$4016 writes strobe both controllers"""
+        for controller in self.controllers:
+            controller.write(address, value)
+
+    def set_output(self, video: bool, audio: bool = None) -> None:
+        """Turns video and audio output on or off, e.g. for speculative frames that are
+            thrown away. Audio follows video unless given."""
+        self.apu.output_enabled = video if audio is None else audio
+        if self.ppu is not None:
+            self.ppu.output_enabled = video
+
+    def set_idle_skip(self, enabled: bool) -> None:
+        """Turns fast-forwarding through idle loops on or off"""
+        if enabled:
+            self.idle.attach()
+        else:
+            self.idle.detach()
+
+    def end_frame(self, ppu) -> None:
+        """Called by the PPU as each frame is finished"""
+        self.frame += 1
+        self.apu.end_frame()
+
+    def run_frame(self) -> None:
+        """Emulates until the end of the current frame, or until the debugger stops the CPU"""
+        if self.shared is not None:
+            self.shared.begin()
+            try:
+                self.emulate_frame()
+            finally:
+                self.shared.publish(self)
+        else:
+            self.emulate_frame()
+
+    def emulate_frame(self) -> None:
+        """Runs one frame"""
+        if self.ppu is None:
+            self.scheduler.run(FRAME_CYCLES)
+            self.frame += 1
+            self.apu.end_frame()
+            return
+        frame = self.frame
+        while self.frame == frame and not self.cpu.stopped:
+            self.scheduler.run_until(self.ppu.next_vblank_cycle())
+
+
+def play_movie(system: System, args) -> int:
+    """Plays back the movie given on the command line with no frame pacing, checking
+        its state hashes. Returns 1 if the emulation diverged from them, else 0."""
+    from .movie import Movie, play
+
+    movie = Movie.load(args.movie)
+    start = time.perf_counter()
+    result = play(system, movie, interval=args.hash_interval, frames=args.frames or None)
+    elapsed = time.perf_counter() - start
+    played = result["frames"]
+    print(f"Played {played} frames in {elapsed:.2f}s ({played / max(elapsed, 1e-9):.0f} fps)")
+    if args.movie_hashes:
+        Movie(movie.mapper_number, movie.prg_crc, movie.state, movie.inputs,
+              args.hash_interval or movie.interval, result["hashes"]).save(args.movie_hashes)
+    divergence = result["divergence"]
+    if divergence is not None:
+        print(f"Diverged at frame {divergence['frame']}: expected {divergence['expected']}, "
+              f"got {divergence['actual']}")
+        return 1
+    if result["checked"]:
+        print(f"{result['checked']} of {len(movie.hashes)} recorded hashes checked, all matched")
+    else:
+        print("No recorded hashes checked")
+    return 0
+
+
+def serve(system: System, args, recorder=None) -> int:
+    """Serves the system to clients until interrupted, or for --frames frames if given"""
+    import asyncio
+
+    from .server import FrameServer
+
+    server = FrameServer(system, args.serve_host, args.serve)
+    if recorder is not None:
+        server.frame_listeners.append(lambda server: recorder.record())
+    try:
+        asyncio.run(server.run(args.frames or None,
+                               lambda port: print(f"Serving on {args.serve_host}:{port}", flush=True)))
+    except KeyboardInterrupt:
+        pass
+    print(server.stats())
+    return 0
+
+
+def system_setup(audio_rate: int = 44100, shared: bool = False, shared_name: str = None) -> System:
+    NES = System(audio_rate, shared, shared_name)
+
+    return NES
+
+
+def parse_args() -> object:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--path", "-p", type=str, help="Path to ROM file")
+    # TODO: set up default ROM path, so user only enters ROM title
+    parser.add_argument("--frames", "-f", type=int, default=0, help="Number of frames to run headless")
+    parser.add_argument("--record", "-r", type=str,
+                        help="Where to write frames: a file for raw, a pattern like out/{:06d}.png "
+                             "for png, or a command for pipe")
+    parser.add_argument("--format", choices=ENCODERS, default="raw", help="Frame output format")
+    parser.add_argument("--backpressure", choices=(BLOCK, DROP, SKIP), default=BLOCK,
+                        help="What to do with frames when the encoder falls behind")
+    parser.add_argument("--run-ahead", type=int, default=0, help="Frames of run-ahead")
+    parser.add_argument("--run-ahead-config", type=str, help="JSON file of per-game run-ahead frames")
+    parser.add_argument("--audio", "-a", type=str,
+                        help="Where to write audio: a file for wav or raw, or a command for pipe")
+    parser.add_argument("--audio-format", choices=SINKS, default="wav", help="Audio output format")
+    parser.add_argument("--audio-rate", type=int, choices=(44100, 48000), default=44100, help="Sample rate")
+    parser.add_argument("--idle-skip", action="store_true",
+                        help="Skip over idle loops straight to the next event")
+    parser.add_argument("--movie", "-m", type=str,
+                        help="Play back an input movie as fast as possible, checking its state hashes. "
+                             "--frames limits how much of it is played")
+    parser.add_argument("--movie-hashes", type=str,
+                        help="Write the movie to this file with the hashes from this playback")
+    parser.add_argument("--hash-interval", type=int,
+                        help="Frames between state hashes (default: the movie's, or 1 when recording)")
+    parser.add_argument("--record-movie", type=str,
+                        help="Record the input of this run, from power-on, to a movie file")
+    parser.add_argument("--serve", type=int, metavar="PORT",
+                        help="Serve frames, audio and input to clients on this port (0 picks one)")
+    parser.add_argument("--serve-host", type=str, default="127.0.0.1", help="Address to serve on")
+    parser.add_argument("--shared", action="store_true",
+                        help="Export RAM, registers and the frame buffer through shared memory")
+    parser.add_argument("--shared-name", type=str, help="Name of the shared memory segment")
+    parser.add_argument("--first-instruction", action="store_true",
+                        help="Execute one instruction, print the wall-clock time in ns and exit "
+                             "(used by the startup benchmark)")
+
+    args = parser.parse_args()
+    if (args.movie or args.record_movie) and not args.path:
+        parser.error("--movie and --record-movie need a ROM (--path)")
+    if args.movie and args.record_movie:
+        parser.error("--movie and --record-movie can't be used together")
+
+    return args
+
+
+def main() -> int:
+
+    args = parse_args()
+
+    if args.first_instruction:
+        system = system_setup(args.audio_rate)
+        if args.path:
+            system.insert_cartridge(load_rom(args.path))
+        else:
+            system.cpu.reset()
+        system.cpu.step()
+        print(time.time_ns())
+        return 0
+
+    system = system_setup(args.audio_rate, args.shared or args.shared_name is not None, args.shared_name)
+    if system.shared is not None:
+        print(f"Shared state: {system.shared.name}")
+
+    status = 0
+
+    if args.path:
+        # TODO: validate ROM path
+        cartridge = load_rom(args.path)
+        print(cartridge)
+        system.insert_cartridge(cartridge)
+        print(f"Reset vector: ${system.cpu.get_pc():04X}")
+        system.set_idle_skip(args.idle_skip)
+
+        output = None
+        if args.record:
+            from .frame_output import FrameOutput, create_encoder
+            output = FrameOutput(create_encoder(args.format, args.record), policy=args.backpressure)
+            output.attach(system.ppu)
+        audio = None
+        if args.audio:
+            from .audio_output import AudioOutput, create_sink
+            audio = AudioOutput(create_sink(args.audio_format, args.audio, args.audio_rate),
+                                policy=args.backpressure if args.backpressure in (BLOCK, DROP) else DROP)
+            audio.attach(system.apu)
+        recorder = None
+        if args.record_movie:
+            from .movie import Recorder
+            recorder = Recorder(system, args.hash_interval or 1, power_on=True)
+        if args.serve is not None:
+            status = serve(system, args, recorder)
+        elif args.movie:
+            # Nothing is rendered or mixed unless it is being recorded
+            system.set_output(output is not None or audio is not None)
+            status = play_movie(system, args)
+        else:
+            from .runahead import RunAhead, load_config, frames_for
+            frames = args.run_ahead
+            if args.run_ahead_config:
+                frames = frames_for(cartridge, load_config(args.run_ahead_config), frames)
+            runner = RunAhead(system, frames)
+            for _ in range(args.frames):
+                runner.run_frame()
+                if recorder is not None:
+                    recorder.record()
+            if runner.disabled_reason:
+                print(f"Run-ahead disabled: {runner.disabled_reason}")
+        if recorder is not None:
+            recorder.movie.save(args.record_movie)
+            print(f"Recorded {recorder.movie.frames} frames to {args.record_movie}")
+        if args.idle_skip:
+            print(f"Idle loops: {system.idle.stats()}")
+        if output is not None:
+            output.close()
+            print(output.stats())
+        if audio is not None:
+            audio.close()
+            print(audio.stats())
+    if system.shared is not None:
+        system.shared.close()
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,348 @@
+# Author: Chase Smith
+# GitHub username: ChaseSmith67
+# Description: Cartridge mappers. A bank switch re-points entries of the bus page
+#               table (or the PPU's CHR bank table) at a different slice of the
+#               ROM instead of copying the bank.
+
+# Nametable Mirroring
+HORIZONTAL = "horizontal"
+VERTICAL = "vertical"
+FOUR_SCREEN = "four-screen"
+SINGLE_LOWER = "single-lower"
+SINGLE_UPPER = "single-upper"
+
+MIRRORINGS = (HORIZONTAL, VERTICAL, FOUR_SCREEN, SINGLE_LOWER, SINGLE_UPPER)
+
+CHR_BANK = 0x400    # CHR is mapped to the PPU in 1KB slots
+
+
+class Mapper(object):
+    """
+    Base mapper with a fixed 32KB of PRG-ROM and 8KB of CHR (mapper 0, NROM). PRG-ROM
+    is mapped into the CPU bus at $8000-$FFFF and PRG-RAM at $6000-$7FFF. CHR is
+    exposed as chr_banks, eight 1KB views covering PPU $0000-$1FFF.
+
+    Subclasses handle register writes and call map_prg/map_chr to switch banks.
+    Listeners registered with add_chr_listener are called with the changed slots
+    just before a CHR bank switch, and mirroring_listeners when the mirroring changes.
+    Mappers that count scanlines set scanline_irq so the PPU clocks them; irq_listeners
+    are called with whether the mapper is holding the IRQ line whenever that changes.
+    """
+    number = 0
+    scanline_irq = False
+
+    def __init__(self, cartridge):
+        self.cartridge = cartridge
+        self.prg = cartridge.prg_rom
+        self.chr = memoryview(cartridge.chr)
+        self.chr_writable = cartridge.chr_rom is None
+        self.prg_ram = bytearray(max(cartridge.prg_ram_size, 0x2000))
+        self.mirroring = cartridge.mirroring
+        self.bus = None
+
+        # CPU address of each mapped PRG window: (offset into PRG, size)
+        self.prg_windows = {}
+
+        # PPU pattern table, 1KB per slot
+        self.chr_offsets = [(slot * CHR_BANK) % len(self.chr) for slot in range(8)]
+        self.chr_banks = [self.chr[offset:offset + CHR_BANK] for offset in self.chr_offsets]
+        self.chr_listeners = []
+        self.mirroring_listeners = []
+
+        # IRQ line, for mappers that can raise one
+        self.irq_pending = False
+        self.irq_listeners = []
+
+    def attach(self, bus) -> None:
+        """Maps PRG-RAM, PRG-ROM and the mapper registers into the CPU bus"""
+        self.bus = bus
+        self.prg_windows = {}
+        bus.map_memory(0x6000, 0x7FFF, self.prg_ram)
+        bus.map_device(0x8000, 0xFFFF, write=self.write)
+        self.reset()
+
+    def reset(self) -> None:
+        """Sets up the power-on banks"""
+        self.map_prg(0x8000, 0x8000, 0)
+
+    def write(self, address: int, value: int) -> None:
+        """Handles a CPU write to $8000-$FFFF"""
+        pass
+
+    def bank_count(self, size: int) -> int:
+        """Returns the number of PRG banks of the given size"""
+        return max(len(self.prg) // size, 1)
+
+    def map_prg(self, address: int, size: int, bank: int) -> None:
+        """Maps PRG bank number `bank` of the given size at the CPU address. Negative
+            banks count from the end. PRG smaller than the window is mirrored. A window
+            that already holds the bank is left alone, so the bus doesn't report a remap
+            and translated code in it is kept."""
+        bank %= self.bank_count(size)
+        window = (bank * size, size)
+        if self.prg_windows.get(address) == window:
+            return
+        end = address + size
+        for start in [start for start, (_, length) in self.prg_windows.items()
+                      if start < end and address < start + length]:
+            del self.prg_windows[start]
+        self.prg_windows[address] = window
+        view = self.prg[bank * size:(bank + 1) * size]
+        self.bus.map_memory(address, end - 1, view, writable=False)
+
+    def map_chr(self, slot: int, size: int, bank: int) -> None:
+        """Maps CHR bank number `bank` of the given size (a multiple of 1KB) starting at
+            1KB slot `slot` of the PPU pattern table"""
+        count = max(len(self.chr) // size, 1)
+        base = (bank % count) * size
+        offsets = {target: base + index * CHR_BANK
+                   for index, target in enumerate(range(slot, slot + size // CHR_BANK))}
+        changed = [target for target, offset in offsets.items() if self.chr_offsets[target] != offset]
+        if not changed:
+            return
+        for listener in self.chr_listeners:
+            listener(changed)
+        for target in changed:
+            offset = offsets[target]
+            self.chr_offsets[target] = offset
+            self.chr_banks[target] = self.chr[offset:offset + CHR_BANK]
+
+    def set_mirroring(self, mirroring: str) -> None:
+        """Changes the nametable mirroring and notifies the listeners"""
+        if mirroring != self.mirroring:
+            self.mirroring = mirroring
+            for listener in self.mirroring_listeners:
+                listener(mirroring)
+
+    def set_irq_pending(self, pending: bool) -> None:
+        """Raises or acknowledges the mapper's IRQ and notifies the listeners"""
+        if pending != self.irq_pending:
+            self.irq_pending = pending
+            for listener in self.irq_listeners:
+                listener(pending)
+
+    def add_chr_listener(self, listener) -> None:
+        """Registers listener(slots) to be called just before CHR banks are switched, while
+            the old banks are still mapped"""
+        self.chr_listeners.append(listener)
+
+    def clock_scanline(self) -> None:
+        """Called by the PPU once per rendered scanline"""
+        pass
+
+    def save_state(self) -> bytes:
+        """Returns the mapper's state as bytes: the mirroring, then the values from
+            registers_state()"""
+        return bytes([MIRRORINGS.index(self.mirroring)] + [int(value) for value in self.registers_state()])
+
+    def load_state(self, data: bytes) -> None:
+        """Restores registers saved by save_state() and re-maps the banks from them"""
+        self.set_mirroring(MIRRORINGS[data[0]])
+        self.restore_registers(list(data[1:]))
+
+    def registers_state(self) -> list:
+        """Returns the mapper's registers as a list of byte values"""
+        return []
+
+    def restore_registers(self, values: list) -> None:
+        """Restores the registers from registers_state() and re-maps the banks"""
+        pass
+
+
+class UxROM(Mapper):
+    """
+    Mapper 2. A write anywhere in $8000-$FFFF selects the 16KB bank at $8000; the last
+    bank is fixed at $C000.
+    """
+    number = 2
+
+    def reset(self) -> None:
+        self.bank = 0
+        self.map_prg(0x8000, 0x4000, 0)
+        self.map_prg(0xC000, 0x4000, -1)
+
+    def write(self, address: int, value: int) -> None:
+        self.bank = value
+        self.map_prg(0x8000, 0x4000, value)
+
+    def registers_state(self) -> list:
+        return [self.bank]
+
+    def restore_registers(self, values: list) -> None:
+        self.write(0x8000, values[0])
+
+
+class CNROM(Mapper):
+    """
+    Mapper 3. Fixed PRG-ROM; a write anywhere in $8000-$FFFF selects the 8KB CHR bank.
+    """
+    number = 3
+
+    def reset(self) -> None:
+        self.bank = 0
+        super().reset()
+
+    def write(self, address: int, value: int) -> None:
+        self.bank = value
+        self.map_chr(0, 0x2000, value)
+
+    def registers_state(self) -> list:
+        return [self.bank]
+
+    def restore_registers(self, values: list) -> None:
+        self.write(0x8000, values[0])
+
+
+class MMC1(Mapper):
+    """
+    Mapper 1. Registers are loaded one bit at a time through a 5-bit shift register;
+    the fifth write copies it into the register selected by address bits 13-14.
+    """
+    number = 1
+    MIRRORING = (SINGLE_LOWER, SINGLE_UPPER, VERTICAL, HORIZONTAL)
+
+    def reset(self) -> None:
+        self.shift = 0x10
+        self.control = 0x0C
+        self.chr_bank_0 = 0
+        self.chr_bank_1 = 0
+        self.prg_bank = 0
+        self.update()
+
+    def write(self, address: int, value: int) -> None:
+        if value & 0x80:
+            self.shift = 0x10
+            self.control |= 0x0C
+            self.update()
+            return
+        done = self.shift & 1
+        self.shift = (self.shift >> 1) | ((value & 1) << 4)
+        if not done:
+            return
+        register = (address >> 13) & 0x03
+        if register == 0:
+            self.control = self.shift
+        elif register == 1:
+            self.chr_bank_0 = self.shift
+        elif register == 2:
+            self.chr_bank_1 = self.shift
+        else:
+            self.prg_bank = self.shift & 0x0F
+        self.shift = 0x10
+        self.update()
+
+    def update(self) -> None:
+        """Re-maps PRG and CHR from the current register values"""
+        self.set_mirroring(self.MIRRORING[self.control & 0x03])
+        prg_mode = (self.control >> 2) & 0x03
+        if prg_mode < 2:
+            self.map_prg(0x8000, 0x8000, self.prg_bank >> 1)
+        elif prg_mode == 2:
+            self.map_prg(0x8000, 0x4000, 0)
+            self.map_prg(0xC000, 0x4000, self.prg_bank)
+        else:
+            self.map_prg(0x8000, 0x4000, self.prg_bank)
+            self.map_prg(0xC000, 0x4000, -1)
+        if self.control & 0x10:
+            self.map_chr(0, 0x1000, self.chr_bank_0)
+            self.map_chr(4, 0x1000, self.chr_bank_1)
+        else:
+            self.map_chr(0, 0x2000, self.chr_bank_0 >> 1)
+
+    def registers_state(self) -> list:
+        return [self.shift, self.control, self.chr_bank_0, self.chr_bank_1, self.prg_bank]
+
+    def restore_registers(self, values: list) -> None:
+        self.shift, self.control, self.chr_bank_0, self.chr_bank_1, self.prg_bank = values
+        self.update()
+
+
+class MMC3(Mapper):
+    """
+    Mapper 4. Eight bank registers selected through $8000 and written through $8001,
+    with two switchable 8KB PRG banks, six CHR banks (two 2KB and four 1KB) and a
+    scanline counter that raises an IRQ.
+    """
+    number = 4
+    scanline_irq = True
+
+    def reset(self) -> None:
+        self.bank_select = 0
+        self.registers = [0, 2, 4, 5, 6, 7, 0, 1]
+        self.irq_latch = 0
+        self.irq_counter = 0
+        self.irq_reload = False
+        self.irq_enabled = False
+        self.set_irq_pending(False)
+        self.update()
+
+    def write(self, address: int, value: int) -> None:
+        even = not address & 1
+        if address < 0xA000:
+            if even:
+                self.bank_select = value
+            else:
+                self.registers[self.bank_select & 0x07] = value
+            self.update()
+        elif address < 0xC000:
+            if even and self.cartridge.mirroring != FOUR_SCREEN:
+                self.set_mirroring(HORIZONTAL if value & 1 else VERTICAL)
+        elif address < 0xE000:
+            if even:
+                self.irq_latch = value
+            else:
+                self.irq_counter = 0
+                self.irq_reload = True
+        else:
+            self.irq_enabled = not even
+            if even:
+                self.set_irq_pending(False)
+
+    def update(self) -> None:
+        """Re-maps PRG and CHR from the bank registers"""
+        r = self.registers
+        if self.bank_select & 0x40:
+            self.map_prg(0x8000, 0x2000, -2)
+            self.map_prg(0xC000, 0x2000, r[6])
+        else:
+            self.map_prg(0x8000, 0x2000, r[6])
+            self.map_prg(0xC000, 0x2000, -2)
+        self.map_prg(0xA000, 0x2000, r[7])
+        self.map_prg(0xE000, 0x2000, -1)
+
+        low, high = (4, 0) if self.bank_select & 0x80 else (0, 4)
+        self.map_chr(low, 0x800, r[0] >> 1)
+        self.map_chr(low + 2, 0x800, r[1] >> 1)
+        for index in range(4):
+            self.map_chr(high + index, 0x400, r[2 + index])
+
+    def clock_scanline(self) -> None:
+        if self.irq_counter == 0 or self.irq_reload:
+            self.irq_counter = self.irq_latch
+            self.irq_reload = False
+        else:
+            self.irq_counter -= 1
+        if self.irq_counter == 0 and self.irq_enabled:
+            self.set_irq_pending(True)
+
+    def registers_state(self) -> list:
+        return [self.bank_select, *self.registers, self.irq_latch, self.irq_counter,
+                self.irq_reload, self.irq_enabled, self.irq_pending]
+
+    def restore_registers(self, values: list) -> None:
+        self.bank_select = values[0]
+        self.registers = values[1:9]
+        self.irq_latch, self.irq_counter = values[9], values[10]
+        self.irq_reload, self.irq_enabled, pending = (bool(value) for value in values[11:14])
+        self.set_irq_pending(pending)
+        self.update()
+
+
+MAPPERS = {mapper.number: mapper for mapper in (Mapper, MMC1, UxROM, CNROM, MMC3)}
+
+
+def create_mapper(cartridge) -> Mapper:
+    """Returns a mapper of the cartridge's mapper number"""
+    if cartridge.mapper_number not in MAPPERS:
+        raise ValueError(f"Mapper {cartridge.mapper_number} is not supported")
+    return MAPPERS[cartridge.mapper_number](cartridge)
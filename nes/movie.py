@@ -0,0 +1,182 @@
+# Author: Chase Smith
+# GitHub username: ChaseSmith67
+# Description: Input movies: the buttons held on both controllers for every frame,
+#               recorded from a running System and played back from a savestate or
+#               from power-on. A movie can also carry a
+#               stream of state hashes (RAM, PRG-RAM and CPU registers) so that
+#               playing it back checks the emulator still reaches the same states.
+
+import hashlib
+import struct
+import zlib
+
+from .savestate import load_state, save_state
+
+MAGIC = b"NESM"
+VERSION = 1
+PORTS = 2       # Bytes of input per frame, one per controller
+
+# magic, version, mapper number, PRG-ROM CRC, frames, hash interval, hashes, savestate
+# length. The savestate, inputs and hashes follow, compressed together.
+HEADER = struct.Struct("<4sHHIIIII")
+
+# A, X, Y, SP, PC, P and CPU cycles, hashed ahead of memory
+REGISTERS = struct.Struct("<BBBBHBq")
+
+
+def state_hash(system) -> int:
+    """Returns a 64-bit hash of CPU RAM, PRG-RAM and the CPU registers and cycle count"""
+    cpu = system.cpu
+    regs = cpu.regs
+    digest = hashlib.blake2b(REGISTERS.pack(regs.A, regs.X, regs.Y, regs.SP, regs.PC, regs.P, cpu.cycles),
+                             digest_size=8)
+    digest.update(system.memory.get_memory())
+    if system.cartridge is not None:
+        digest.update(system.cartridge.mapper.prg_ram)
+    return int.from_bytes(digest.digest(), "little")
+
+
+class Movie(object):
+    """
+    A recording of controller input for one game. inputs holds a byte of buttons per
+    controller per frame; state is the savestate playback starts from, or None to start
+    from power-on. hashes, when recorded, are state_hash() after every interval-th
+    frame, so hashes[i] is the state after frame (i + 1) * interval.
+    """
+    def __init__(self, mapper_number: int = 0, prg_crc: int = 0, state: bytes = None, inputs=b"",
+                 interval: int = 1, hashes: list = None):
+        if interval < 1:
+            raise ValueError("The hash interval must be at least 1 frame")
+        self.mapper_number = mapper_number
+        self.prg_crc = prg_crc
+        self.state = state
+        self.inputs = bytearray(inputs)
+        self.interval = interval
+        self.hashes = list(hashes) if hashes is not None else []
+
+    @classmethod
+    def for_cartridge(cls, cartridge, state: bytes = None, interval: int = 1) -> "Movie":
+        """Returns an empty movie for the cartridge's game"""
+        return cls(cartridge.mapper_number, cartridge.prg_crc, state, interval=interval)
+
+    @property
+    def frames(self) -> int:
+        """Number of frames of input"""
+        return len(self.inputs) // PORTS
+
+    def buttons(self, frame: int) -> tuple:
+        """Returns the buttons held on each controller during the frame"""
+        return tuple(self.inputs[frame * PORTS:(frame + 1) * PORTS])
+
+    def append(self, *buttons: int) -> None:
+        """Adds a frame of input: the buttons held on controller 1, then controller 2"""
+        frame = bytearray(PORTS)
+        frame[:len(buttons)] = bytes(value & 0xFF for value in buttons)
+        self.inputs += frame
+
+    def matches(self, cartridge) -> bool:
+        """Whether the movie was recorded with the cartridge's game"""
+        return self.mapper_number == cartridge.mapper_number and self.prg_crc == cartridge.prg_crc
+
+    def to_bytes(self) -> bytes:
+        """Returns the movie in its file format"""
+        state = self.state or b""
+        header = HEADER.pack(MAGIC, VERSION, self.mapper_number, self.prg_crc, self.frames, self.interval,
+                             len(self.hashes), len(state))
+        hashes = struct.pack(f"<{len(self.hashes)}Q", *self.hashes)
+        return header + zlib.compress(b"".join((state, self.inputs[:self.frames * PORTS], hashes)))
+
+    @classmethod
+    def from_bytes(cls, data) -> "Movie":
+        """Reads a movie from its file format. Raises ValueError if it isn't one."""
+        if len(data) < HEADER.size:
+            raise ValueError("Movie is truncated")
+        (magic, version, mapper_number, prg_crc, frames, interval,
+         hash_count, state_size) = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError("Not a movie")
+        if version != VERSION:
+            raise ValueError(f"Movie version {version} is not supported (expected {VERSION})")
+        try:
+            body = zlib.decompress(data[HEADER.size:])
+        except zlib.error as error:
+            raise ValueError(f"Movie is corrupt: {error}") from None
+        inputs_end = state_size + frames * PORTS
+        if len(body) != inputs_end + hash_count * 8:
+            raise ValueError("Movie layout does not match its header")
+        return cls(mapper_number, prg_crc, bytes(body[:state_size]) or None, body[state_size:inputs_end],
+                   interval, struct.unpack_from(f"<{hash_count}Q", body, inputs_end))
+
+    def save(self, path: str) -> None:
+        """Writes the movie to a file"""
+        with open(path, "wb") as file:
+            file.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path: str) -> "Movie":
+        """Reads a movie from a file"""
+        with open(path, "rb") as file:
+            return cls.from_bytes(file.read())
+
+
+class Recorder(object):
+    """
+    Records a movie as a System runs. Create it before the first frame to record, then
+    call record() after every frame: movie holds the buttons each controller held during
+    the frame and, every interval-th frame, the state hash. The movie starts from a
+    savestate of the System as it was when the recorder was created, or from power-on
+    if power_on is set, which is only right before the System has run.
+    """
+    def __init__(self, system, interval: int = 1, power_on: bool = False):
+        self.system = system
+        self.movie = Movie.for_cartridge(system.cartridge, None if power_on else save_state(system), interval)
+
+    def record(self) -> None:
+        """Adds the frame just run"""
+        system = self.system
+        movie = self.movie
+        first, second = system.controllers
+        movie.append(first.buttons, second.buttons)
+        if movie.frames % movie.interval == 0:
+            movie.hashes.append(state_hash(system))
+
+
+def play(system, movie: Movie, verify: bool = True, interval: int = None, frames: int = None) -> dict:
+    """
+    Plays the movie on a System with the movie's game inserted, as fast as it will go.
+    The savestate is loaded first; a movie from power-on needs a System that hasn't run
+    since its cartridge was inserted. Every interval-th frame (the movie's own by
+    default) the state is hashed and, if verify is set, checked against the movie's
+    hashes: playback stops at the first one that differs.
+
+    Returns the frames played, the hashes computed, how many of them were checked, and
+    the divergence as the frame number with the expected and actual hash, or None if
+    every checked hash matched.
+    """
+    if not movie.matches(system.cartridge):
+        raise ValueError("Movie is for a different game")
+    if movie.state is not None:
+        load_state(system, movie.state)
+    interval = interval or movie.interval
+    expected = movie.hashes if verify and interval == movie.interval else ()
+    total = movie.frames if frames is None else min(frames, movie.frames)
+    hashes = []
+    divergence = None
+    first, second = system.controllers
+    inputs = movie.inputs
+    played = 0
+    while played < total:
+        offset = played * PORTS
+        first.set_buttons(inputs[offset])
+        second.set_buttons(inputs[offset + 1])
+        system.run_frame()
+        played += 1
+        if played % interval == 0:
+            value = state_hash(system)
+            index = len(hashes)
+            hashes.append(value)
+            if index < len(expected) and expected[index] != value:
+                divergence = {"frame": played, "expected": f"{expected[index]:016x}", "actual": f"{value:016x}"}
+                break
+    return {"frames": played, "hashes": hashes, "checked": min(len(hashes), len(expected)),
+            "divergence": divergence}
@@ -0,0 +1,699 @@
+# Author: Chase Smith
+# GitHub username: ChaseSmith67
+# Description: The 2C02 Picture Processing Unit. Rendering is done with NumPy a
+#               span of scanlines at a time (a whole frame when nothing changes
+#               mid-frame) from a cache of pre-decoded 8x8 CHR tiles.
+
+import struct
+
+import numpy as np
+
+from .mappers import HORIZONTAL, VERTICAL, FOUR_SCREEN, SINGLE_LOWER, SINGLE_UPPER
+from .scheduler import Component
+
+WIDTH = 256
+HEIGHT = 240
+
+# NTSC timing, in PPU dots (3 per CPU cycle)
+DOTS_PER_LINE = 341
+LINES_PER_FRAME = 262
+FRAME_DOTS = DOTS_PER_LINE * LINES_PER_FRAME
+VBLANK_DOT = 241 * DOTS_PER_LINE + 1        # VBlank flag set, NMI
+PRERENDER_DOT = 261 * DOTS_PER_LINE + 1     # VBlank, sprite 0 and overflow cleared
+IRQ_DOT = 260                               # Where MMC3 sees A12 rise on each line
+
+# Savestate layout: registers, timing and pending-line state, then vram, palette and OAM
+STATE = struct.Struct("<BBBBHHBBBBqqHHH")
+STATE_SIZE = STATE.size + 0x1000 + 32 + 256
+
+# PPUCTRL ($2000)
+CTRL_INCREMENT = 0x04
+CTRL_SPRITE_TABLE = 0x08
+CTRL_BG_TABLE = 0x10
+CTRL_SPRITE_16 = 0x20
+CTRL_NMI = 0x80
+
+# PPUMASK ($2001)
+MASK_BG_LEFT = 0x02
+MASK_SPRITES_LEFT = 0x04
+MASK_BG = 0x08
+MASK_SPRITES = 0x10
+
+# PPUSTATUS ($2002)
+STATUS_OVERFLOW = 0x20
+STATUS_SPRITE_0 = 0x40
+STATUS_VBLANK = 0x80
+
+# Physical nametable used for each of the four logical nametables
+NAMETABLE_MAP = {
+    HORIZONTAL: (0, 0, 1, 1),
+    VERTICAL: (0, 1, 0, 1),
+    SINGLE_LOWER: (0, 0, 0, 0),
+    SINGLE_UPPER: (1, 1, 1, 1),
+    FOUR_SCREEN: (0, 1, 2, 3),
+}
+
+# The 64 colors the NES can output, as RGB
+NES_PALETTE = np.array([
+    (84, 84, 84), (0, 30, 116), (8, 16, 144), (48, 0, 136), (68, 0, 100), (92, 0, 48), (84, 4, 0), (60, 24, 0),
+    (32, 42, 0), (8, 58, 0), (0, 64, 0), (0, 60, 0), (0, 50, 60), (0, 0, 0), (0, 0, 0), (0, 0, 0),
+    (152, 150, 152), (8, 76, 196), (48, 50, 236), (92, 30, 228), (136, 20, 176), (160, 20, 100), (152, 34, 32), (120, 60, 0),
+    (84, 90, 0), (40, 114, 0), (8, 124, 0), (0, 118, 40), (0, 102, 120), (0, 0, 0), (0, 0, 0), (0, 0, 0),
+    (236, 238, 236), (76, 154, 236), (120, 124, 236), (176, 98, 236), (228, 84, 236), (236, 88, 180), (236, 106, 100), (212, 136, 32),
+    (160, 170, 0), (116, 196, 0), (76, 208, 32), (56, 204, 108), (56, 180, 204), (60, 60, 60), (0, 0, 0), (0, 0, 0),
+    (236, 238, 236), (168, 204, 236), (188, 188, 236), (212, 178, 236), (236, 174, 236), (236, 174, 212), (236, 180, 176), (228, 196, 144),
+    (204, 210, 120), (180, 222, 120), (168, 226, 144), (152, 226, 180), (160, 214, 228), (160, 162, 160), (0, 0, 0), (0, 0, 0),
+], dtype=np.uint8)
+
+# Palette RAM addresses $3F10/$3F14/$3F18/$3F1C mirror $3F00/$3F04/$3F08/$3F0C
+PALETTE_MIRROR = np.array([address & 0x0F if address in (0x10, 0x14, 0x18, 0x1C) else address
+                           for address in range(32)], dtype=np.intp)
+
+# Tile row/column of every pixel in a nametable, and the attribute shift for each tile
+TILE_ROWS, TILE_COLS = np.mgrid[0:30, 0:32]
+ATTRIBUTE_INDEX = (TILE_ROWS // 4) * 8 + TILE_COLS // 4
+ATTRIBUTE_SHIFT = ((TILE_ROWS % 4) // 2) * 4 + ((TILE_COLS % 4) // 2) * 2
+
+
+class TileCache(object):
+    """
+    The 512 tiles of the two pattern tables decoded to 8x8 arrays of 2-bit pixel
+    values. A tile is only decoded again after its bytes change through a CHR-RAM
+    write or its 1KB bank is switched.
+    """
+    def __init__(self, mapper):
+        self.mapper = mapper
+        self.tiles = np.zeros((512, 8, 8), dtype=np.uint8)
+        self.valid = np.zeros(512, dtype=np.bool_)
+        self.decodes = 0
+
+    def invalidate_slots(self, slots) -> None:
+        """Marks every tile in the given 1KB CHR slots as stale"""
+        for slot in slots:
+            self.valid[slot * 64:(slot + 1) * 64] = False
+
+    def invalidate_tile(self, tile: int) -> None:
+        """Marks one tile as stale"""
+        self.valid[tile] = False
+
+    def update(self) -> np.ndarray:
+        """Decodes any stale tiles. Returns the numbers of the tiles that were decoded."""
+        stale = np.flatnonzero(~self.valid)
+        if stale.size:
+            pattern = np.concatenate([np.frombuffer(bank, dtype=np.uint8) for bank in self.mapper.chr_banks])
+            planes = pattern.reshape(512, 2, 8)[stale]
+            bits = np.unpackbits(planes, axis=2).reshape(stale.size, 2, 8, 8)
+            self.tiles[stale] = bits[:, 0] | (bits[:, 1] << 1)
+            self.valid[stale] = True
+            self.decodes += stale.size
+        return stale
+
+
+class BackgroundCache(object):
+    """
+    The four physical nametables rendered to 240x256 arrays of palette offsets
+    (palette number * 4 + pixel value, 0 where transparent). Nametable and attribute
+    writes mark the tiles they cover dirty, and only dirty tiles are rendered again.
+
+    Every rendered row is stamped with a counter so the PPU can tell which of its
+    composited lines sample rows that have changed since they were composited.
+    """
+    def __init__(self, vram: np.ndarray):
+        self.vram = vram
+        self.layer = np.zeros((4, HEIGHT, WIDTH), dtype=np.uint8)
+        self.dirty = np.ones((4, 30, 32), dtype=np.bool_)
+        self.row_stamps = np.zeros((4, HEIGHT), dtype=np.int64)
+        self.stamp = 0
+        self.table = 0
+        self.tiles_rendered = 0
+
+    def mark_write(self, offset: int) -> None:
+        """Marks the tiles covered by a write to the given vram offset"""
+        nametable, address = offset >> 10, offset & 0x3FF
+        if address < 960:
+            self.dirty[nametable, address >> 5, address & 0x1F] = True
+        else:
+            row, col = divmod(address - 960, 8)
+            self.dirty[nametable, row * 4:row * 4 + 4, col * 4:col * 4 + 4] = True
+
+    def mark_all(self) -> None:
+        """Marks every tile"""
+        self.dirty[:] = True
+
+    def mark_tiles(self, tiles: np.ndarray) -> None:
+        """Marks the nametable entries that show any of the given pattern tiles"""
+        ids = self.vram[:0x1000].reshape(4, 32, 32)[:, :30, :].astype(np.intp) + self.table
+        self.dirty |= np.isin(ids, tiles)
+
+    def set_table(self, table: int) -> None:
+        """Selects the background pattern table (0 or 256)"""
+        if table != self.table:
+            self.table = table
+            self.mark_all()
+
+    def update(self, tiles: np.ndarray) -> None:
+        """Renders the dirty tiles from the decoded pattern tiles"""
+        nametables, rows, cols = np.nonzero(self.dirty)
+        if not nametables.size:
+            return
+        self.stamp += 1
+        offsets = (nametables << 10) | (rows << 5) | cols
+        ids = self.vram[offsets].astype(np.intp) + self.table
+        attributes = self.vram[(nametables << 10) + 960 + ATTRIBUTE_INDEX[rows, cols]]
+        palettes = (attributes >> ATTRIBUTE_SHIFT[rows, cols]) & 0x03
+        pixels = tiles[ids]
+        values = np.where(pixels != 0, pixels | (palettes[:, None, None] << 2), 0)
+
+        # Scatter the 8x8 blocks back into the layer
+        y = (rows * 8)[:, None, None] + np.arange(8)[None, :, None]
+        x = (cols * 8)[:, None, None] + np.arange(8)[None, None, :]
+        self.layer[nametables[:, None, None], y, x] = values
+        self.row_stamps[nametables[:, None], (rows * 8)[:, None] + np.arange(8)] = self.stamp
+        self.dirty[:] = False
+        self.tiles_rendered += nametables.size
+
+
+class PPU(Component):
+    """
+    Represents the Picture Processing Unit. It is a scheduler Component: its registers
+    are mapped into the CPU bus through Scheduler.synced, so the PPU is only emulated
+    forward when the CPU touches it or one of its events (VBlank/NMI, MMC3 scanline
+    clocks) comes due.
+
+    Scanlines aren't drawn as the PPU passes them. They are left pending and drawn in
+    one batch just before anything that would change how they look (a scroll, control
+    or mask write, a bank switch, ...) and at the end of the frame, so a frame with no
+    mid-frame changes is drawn in a single call.
+
+    Drawing is incremental: only nametable tiles touched since the last frame are
+    rendered again (see BackgroundCache), and a line's background is only composited
+    again when its scroll, the palette or the tiles under it change.
+
+    indices holds the finished frame as NES color numbers and frame holds it as RGB.
+    At each VBlank output_listeners are called if output is enabled, then
+    frame_listeners. While output is disabled (speculative frames) frame isn't updated.
+    """
+    def __init__(self, scheduler, mapper):
+        super().__init__()
+        self.scheduler = scheduler
+        self.cpu = scheduler.cpu
+        self.mapper = mapper
+        self.tile_cache = TileCache(mapper)
+        mapper.add_chr_listener(self.chr_switched)
+        mapper.mirroring_listeners.append(self.mirroring_changed)
+
+        # Registers
+        self.ctrl = 0
+        self.mask = 0
+        self.status = 0
+        self.oam_addr = 0
+        self.v = 0          # Current VRAM address
+        self.t = 0          # Temporary VRAM address
+        self.fine_x = 0
+        self.w = 0          # First/second write toggle
+        self.read_buffer = 0
+        self.open_bus = 0
+
+        # Memory
+        self.vram = np.zeros(0x1000, dtype=np.uint8)    # Nametables, 4KB for four-screen
+        self.palette = np.zeros(32, dtype=np.uint8)
+        self.oam = np.zeros(256, dtype=np.uint8)
+        self.nametables = NAMETABLE_MAP[mapper.mirroring]
+        self.background = BackgroundCache(self.vram)
+
+        # Time, in dots since power-on
+        self.dot = 0
+        self.frame_count = 0
+
+        # Pending lines: [pending_line, current line) still to be drawn, and the line
+        # whose background row is known (origin_line is drawn from origin_row)
+        self.pending_line = 0
+        self.origin_line = 0
+        self.origin_row = 0
+
+        # Composited background of each line, and what it was composited from: scroll
+        # row and column, mask bits, palette and nametable layout versions, row stamp
+        self.background_offsets = np.zeros((HEIGHT, WIDTH), dtype=np.uint8)
+        self.background_colors = np.zeros((HEIGHT, WIDTH), dtype=np.uint8)
+        self.line_keys = np.full((HEIGHT, 5), -1, dtype=np.int64)
+        self.line_stamps = np.zeros(HEIGHT, dtype=np.int64)
+        self.palette_version = 0
+        self.layout_version = 0
+        self.lines_composited = 0
+        self.changed_lines = np.ones(HEIGHT, dtype=np.bool_)
+
+        # Output
+        self.indices = np.zeros((HEIGHT, WIDTH), dtype=np.uint8)
+        self.frame = np.zeros((HEIGHT, WIDTH, 3), dtype=np.uint8)
+        self.frame_listeners = []
+        self.output_listeners = []
+        self.output_enabled = True
+
+        self.vblank_event = None
+        self.irq_event = None
+        self.schedule_vblank()
+        if getattr(mapper, "scanline_irq", False):
+            self.schedule_scanline_irq()
+
+    # ----- Savestates
+
+    def save_state(self) -> bytes:
+        """Returns the PPU's registers, timing and memory as a fixed-size block"""
+        header = STATE.pack(self.ctrl, self.mask, self.status, self.oam_addr, self.v, self.t, self.fine_x,
+                            self.w, self.read_buffer, self.open_bus, self.dot, self.frame_count,
+                            self.pending_line, self.origin_line, self.origin_row)
+        return header + self.vram.tobytes() + self.palette.tobytes() + self.oam.tobytes()
+
+    def load_state(self, data) -> None:
+        """Restores a block from save_state(). Every cache is invalidated and the PPU's
+            events are scheduled again from the restored time, so the scheduler's queue
+            must have been cleared first."""
+        (self.ctrl, self.mask, self.status, self.oam_addr, self.v, self.t, self.fine_x, self.w,
+         self.read_buffer, self.open_bus, self.dot, self.frame_count, self.pending_line,
+         self.origin_line, self.origin_row) = STATE.unpack_from(data)
+        blob = np.frombuffer(data, dtype=np.uint8, offset=STATE.size)
+        self.vram[:] = blob[:0x1000]
+        self.palette[:] = blob[0x1000:0x1020]
+        self.oam[:] = blob[0x1020:0x1120]
+
+        self.nametables = NAMETABLE_MAP[self.mapper.mirroring]
+        self.tile_cache.valid[:] = False
+        self.background.set_table(256 if self.ctrl & CTRL_BG_TABLE else 0)
+        self.background.mark_all()
+        self.line_keys[:] = -1
+        self.changed_lines[:] = True
+        self.schedule_vblank()
+        if getattr(self.mapper, "scanline_irq", False):
+            self.schedule_scanline_irq()
+
+    # ----- Timing
+
+    @property
+    def line(self) -> int:
+        """The scanline the PPU is on"""
+        return (self.dot % FRAME_DOTS) // DOTS_PER_LINE
+
+    def drawn_line(self) -> int:
+        """Returns the first visible line that hasn't been fully drawn yet"""
+        position = self.dot % FRAME_DOTS
+        line, dot = divmod(position, DOTS_PER_LINE)
+        if line >= HEIGHT:
+            return HEIGHT
+        return line + 1 if dot >= WIDTH else line
+
+    def run_until(self, cycle: int) -> None:
+        """Advances the PPU to the given CPU cycle, handling VBlank, the pre-render line
+            and the start of each frame as they are passed"""
+        target = cycle * 3
+        while self.dot < target:
+            base = self.dot - self.dot % FRAME_DOTS
+            position = self.dot - base
+            if position < VBLANK_DOT:
+                milestone, action = base + VBLANK_DOT, self.start_vblank
+            elif position < PRERENDER_DOT:
+                milestone, action = base + PRERENDER_DOT, self.prerender
+            else:
+                milestone, action = base + FRAME_DOTS, self.start_frame
+            if milestone > target:
+                self.dot = target
+                break
+            self.dot = milestone
+            action()
+
+    def start_vblank(self) -> None:
+        """Line 241: finishes drawing the frame and sets the VBlank flag"""
+        self.flush(HEIGHT)
+        self.status |= STATUS_VBLANK
+        self.frame_count += 1
+        if self.output_enabled:
+            changed = np.flatnonzero(self.changed_lines)
+            if changed.size == HEIGHT:
+                np.take(NES_PALETTE, self.indices, axis=0, out=self.frame)
+            elif changed.size:
+                self.frame[changed] = NES_PALETTE[self.indices[changed]]
+            self.changed_lines[:] = False
+            for listener in self.output_listeners:
+                listener(self)
+        for listener in self.frame_listeners:
+            listener(self)
+
+    def prerender(self) -> None:
+        """Line 261: clears the status flags"""
+        self.status &= ~(STATUS_VBLANK | STATUS_SPRITE_0 | STATUS_OVERFLOW) & 0xFF
+
+    def start_frame(self) -> None:
+        """Line 0: the vertical scroll is copied from t, and nothing is pending"""
+        self.pending_line = 0
+        self.origin_line = 0
+        self.origin_row = self.scroll_row(self.t)
+
+    def cycle_at(self, dot: int) -> int:
+        """Returns the first CPU cycle at or after the given dot"""
+        return -(-dot // 3)
+
+    def schedule_vblank(self) -> None:
+        """Schedules the next VBlank event"""
+        base = self.dot - self.dot % FRAME_DOTS
+        dot = base + VBLANK_DOT
+        if dot <= self.dot:
+            dot += FRAME_DOTS
+        self.vblank_event = self.scheduler.schedule(self.cycle_at(dot), self.vblank, "vblank")
+
+    def vblank(self, cycle: int) -> None:
+        """VBlank event: raises an NMI if enabled"""
+        self.catch_up(cycle)
+        if self.ctrl & CTRL_NMI:
+            self.cpu.nmi()
+        self.schedule_vblank()
+
+    def next_vblank_cycle(self) -> int:
+        """Returns the CPU cycle of the next VBlank"""
+        return self.vblank_event.cycle
+
+    def next_status_change(self, cycle: int) -> int:
+        """Returns the first CPU cycle after the given one at which reading PPUSTATUS
+            could give a different value: VBlank starting or ending, or sprite 0 possibly
+            being hit. The status can't change otherwise without a register write, so a
+            loop that only polls $2002 can be skipped up to this cycle."""
+        dot = cycle * 3
+        base = dot - dot % FRAME_DOTS
+        position = dot - base
+        if position < VBLANK_DOT:
+            change = base + VBLANK_DOT
+        elif position < PRERENDER_DOT:
+            change = base + PRERENDER_DOT
+        else:
+            change = base + FRAME_DOTS + VBLANK_DOT
+        top = int(self.oam[0]) + 1
+        if self.rendering() and top < HEIGHT:
+            first, last = top * DOTS_PER_LINE, (top + 16) * DOTS_PER_LINE
+            if position < first:
+                change = min(change, base + first)
+            elif position < last:
+                return cycle
+            else:
+                change = min(change, base + FRAME_DOTS + first)
+        return self.cycle_at(change)
+
+    def schedule_scanline_irq(self) -> None:
+        """Schedules the next MMC3-style scanline clock on a rendered line"""
+        base = self.dot - self.dot % FRAME_DOTS
+        position = self.dot - base
+        line = position // DOTS_PER_LINE
+        if position % DOTS_PER_LINE >= IRQ_DOT:
+            line += 1
+        if HEIGHT <= line < LINES_PER_FRAME - 1:
+            line = LINES_PER_FRAME - 1
+        elif line >= LINES_PER_FRAME:
+            line = 0
+            base += FRAME_DOTS
+        dot = base + line * DOTS_PER_LINE + IRQ_DOT
+        self.irq_event = self.scheduler.schedule(self.cycle_at(dot), self.scanline_irq, "scanline")
+
+    def scanline_irq(self, cycle: int) -> None:
+        """Scanline event: clocks the mapper's counter while rendering. The mapper holds
+            the IRQ line itself once the counter reaches zero."""
+        self.catch_up(cycle)
+        if self.mask & (MASK_BG | MASK_SPRITES):
+            self.mapper.clock_scanline()
+        self.dot = max(self.dot, cycle * 3)
+        self.schedule_scanline_irq()
+
+    # ----- CPU registers ($2000-$2007, mirrored to $3FFF)
+
+    def read_register(self, address: int) -> int:
+        """Handles a CPU read of a PPU register"""
+        register = address & 0x07
+        if register == 2:
+            self.check_sprite_0()
+            value = (self.status & 0xE0) | (self.open_bus & 0x1F)
+            self.status &= ~STATUS_VBLANK & 0xFF
+            self.w = 0
+        elif register == 4:
+            value = int(self.oam[self.oam_addr])
+        elif register == 7:
+            address = self.v & 0x3FFF
+            if address >= 0x3F00:
+                value = self.read_vram(address)
+                self.read_buffer = self.read_vram(address - 0x1000)
+            else:
+                value = self.read_buffer
+                self.read_buffer = self.read_vram(address)
+            self.increment_v()
+        else:
+            value = self.open_bus
+        self.open_bus = value
+        return value
+
+    def write_register(self, address: int, value: int) -> None:
+        """Handles a CPU write to a PPU register"""
+        self.open_bus = value
+        register = address & 0x07
+        if register == 0:
+            self.flush_to_now()
+            was_enabled = self.ctrl & CTRL_NMI
+            self.ctrl = value
+            self.background.set_table(256 if value & CTRL_BG_TABLE else 0)
+            self.t = (self.t & 0xF3FF) | ((value & 0x03) << 10)
+            if not was_enabled and value & CTRL_NMI and self.status & STATUS_VBLANK:
+                self.scheduler.schedule(self.cpu.cycles, lambda cycle: self.cpu.nmi(), "nmi")
+        elif register == 1:
+            self.flush_to_now()
+            self.mask = value
+        elif register == 3:
+            self.oam_addr = value
+        elif register == 4:
+            self.oam[self.oam_addr] = value
+            self.oam_addr = (self.oam_addr + 1) & 0xFF
+        elif register == 5:
+            self.flush_to_now()
+            if self.w == 0:
+                self.t = (self.t & 0xFFE0) | (value >> 3)
+                self.fine_x = value & 0x07
+            else:
+                self.t = (self.t & 0x8C1F) | ((value & 0x07) << 12) | ((value & 0xF8) << 2)
+            self.w ^= 1
+        elif register == 6:
+            self.flush_to_now()
+            if self.w == 0:
+                self.t = (self.t & 0x00FF) | ((value & 0x3F) << 8)
+            else:
+                self.t = (self.t & 0xFF00) | value
+                self.v = self.t
+                # A mid-frame write moves the vertical scroll from the next line on
+                line = self.drawn_line()
+                if line < HEIGHT:
+                    self.origin_line = line
+                    self.origin_row = self.scroll_row(self.v)
+            self.w ^= 1
+        elif register == 7:
+            self.write_vram(self.v & 0x3FFF, value)
+            self.increment_v()
+
+    def write_oam_dma(self, address: int, value: int) -> None:
+        """$4014: copies a page of CPU memory into OAM in one slice copy. The CPU is stalled
+            for 513 cycles, plus one on an odd cycle."""
+        self.cpu.memory.dma(value, self.oam)
+        self.cpu.cycles += 513 + (self.cpu.cycles & 1)
+
+    def increment_v(self) -> None:
+        """Moves v on by 1 or 32 after a PPUDATA access"""
+        self.v = (self.v + (32 if self.ctrl & CTRL_INCREMENT else 1)) & 0x7FFF
+
+    # ----- PPU memory ($0000-$3FFF)
+
+    def nametable_offset(self, address: int) -> int:
+        """Returns the offset in vram of a nametable address, applying the mirroring"""
+        logical = (address >> 10) & 0x03
+        return (self.nametables[logical] << 10) | (address & 0x3FF)
+
+    def read_vram(self, address: int) -> int:
+        """Reads the PPU address space"""
+        address &= 0x3FFF
+        if address < 0x2000:
+            return self.mapper.chr_banks[address >> 10][address & 0x3FF]
+        if address < 0x3F00:
+            return int(self.vram[self.nametable_offset(address)])
+        return int(self.palette[PALETTE_MIRROR[address & 0x1F]])
+
+    def write_vram(self, address: int, value: int) -> None:
+        """Writes the PPU address space. Pattern table writes only land in CHR-RAM."""
+        address &= 0x3FFF
+        if address < 0x2000:
+            if self.mapper.chr_writable:
+                self.flush_to_now()
+                self.mapper.chr_banks[address >> 10][address & 0x3FF] = value
+                self.tile_cache.invalidate_tile(address >> 4)
+        elif address < 0x3F00:
+            offset = self.nametable_offset(address)
+            if self.vram[offset] != value:
+                self.flush_to_now()
+                self.vram[offset] = value
+                self.background.mark_write(offset)
+        else:
+            index = PALETTE_MIRROR[address & 0x1F]
+            if self.palette[index] != value & 0x3F:
+                self.flush_to_now()
+                self.palette[index] = value & 0x3F
+                self.palette_version += 1
+
+    def chr_switched(self, slots) -> None:
+        """Called by the mapper just before CHR banks are switched"""
+        self.scheduler.sync(self)
+        self.flush_to_now()
+        self.tile_cache.invalidate_slots(slots)
+
+    def mirroring_changed(self, mirroring: str) -> None:
+        """Called by the mapper when the nametable mirroring changes"""
+        self.scheduler.sync(self)
+        self.flush_to_now()
+        self.nametables = NAMETABLE_MAP[mirroring]
+        self.layout_version += 1
+
+    # ----- Rendering
+
+    def rendering(self) -> bool:
+        """Whether the background or sprites are enabled"""
+        return bool(self.mask & (MASK_BG | MASK_SPRITES))
+
+    def scroll_row(self, address: int) -> int:
+        """Returns the row of the 480-line background layer a VRAM address scrolls to"""
+        coarse_y = (address >> 5) & 0x1F
+        fine_y = (address >> 12) & 0x07
+        nametable_y = (address >> 11) & 0x01
+        return (nametable_y * HEIGHT + coarse_y * 8 + fine_y) % (2 * HEIGHT)
+
+    def scroll_x(self) -> int:
+        """Returns the column of the 512-pixel background layer the left edge scrolls to"""
+        return ((self.t >> 10) & 0x01) * WIDTH + (self.t & 0x1F) * 8 + self.fine_x
+
+    def flush_to_now(self) -> None:
+        """Draws every pending line the PPU has already passed"""
+        self.flush(self.drawn_line())
+
+    def check_sprite_0(self) -> None:
+        """Before PPUSTATUS is read, draws pending lines if sprite 0 is on one of them"""
+        if self.status & STATUS_SPRITE_0:
+            return
+        end = self.drawn_line()
+        top = int(self.oam[0]) + 1
+        if self.pending_line < end and top < end and top + 16 > self.pending_line:
+            self.flush(end)
+
+    def flush(self, end: int) -> None:
+        """Draws the pending lines up to (not including) end"""
+        start = self.pending_line
+        if end <= start:
+            return
+        self.render_lines(start, end)
+        self.pending_line = end
+
+    def composite_background(self, start: int, end: int) -> None:
+        """Brings background_offsets and background_colors up to date for visible lines
+            [start, end). A line is only composited again if its scroll, the mask, the
+            palette or the nametable layout changed, or a row it samples was re-rendered."""
+        lines = np.arange(start, end)
+        rows = (self.origin_row + lines - self.origin_line) % (2 * HEIGHT)
+        x = self.scroll_x()
+        layout = np.array(self.nametables, dtype=np.intp)
+        left = layout[(rows // HEIGHT) * 2 + x // WIDTH]
+        right = layout[(rows // HEIGHT) * 2 + (x // WIDTH ^ 1)]
+        stamps = np.maximum(self.background.row_stamps[left, rows % HEIGHT],
+                            self.background.row_stamps[right, rows % HEIGHT])
+
+        keys = np.empty((end - start, 5), dtype=np.int64)
+        keys[:, 0] = rows
+        keys[:, 1] = x
+        keys[:, 2] = self.mask & (MASK_BG | MASK_BG_LEFT)
+        keys[:, 3] = self.palette_version
+        keys[:, 4] = self.layout_version
+        stale = (keys != self.line_keys[start:end]).any(axis=1) | (stamps > self.line_stamps[start:end])
+        if not stale.any():
+            return
+
+        redo = lines[stale]
+        if self.mask & MASK_BG:
+            redo_rows = rows[stale]
+            cols = (x + np.arange(WIDTH)) % (2 * WIDTH)
+            nametables = layout[(redo_rows // HEIGHT)[:, None] * 2 + (cols // WIDTH)[None, :]]
+            offsets = self.background.layer[nametables, (redo_rows % HEIGHT)[:, None], (cols % WIDTH)[None, :]]
+            if not self.mask & MASK_BG_LEFT:
+                offsets[:, :8] = 0
+        else:
+            offsets = np.zeros((redo.size, WIDTH), dtype=np.uint8)
+        self.background_offsets[redo] = offsets
+        self.background_colors[redo] = self.palette[PALETTE_MIRROR[offsets]]
+        self.line_keys[redo] = keys[stale]
+        self.line_stamps[redo] = stamps[stale]
+        self.lines_composited += redo.size
+
+    def render_lines(self, start: int, end: int) -> None:
+        """Draws visible lines [start, end) with the current registers"""
+        cache = self.tile_cache
+        decoded = cache.update()
+        if decoded.size:
+            self.background.mark_tiles(decoded)
+        if self.mask & MASK_BG:
+            self.background.update(cache.tiles)
+        self.composite_background(start, end)
+        background = self.background_offsets[start:end]
+
+        if not self.mask & MASK_SPRITES:
+            colors = self.background_colors[start:end]
+        else:
+            sprites, behind, sprite_0 = self.sprite_layer(cache.tiles, start, end)
+            opaque = sprites != 0
+            if not self.mask & MASK_SPRITES_LEFT:
+                opaque[:, :8] = False
+            if sprite_0 is not None and self.mask & MASK_BG and not self.status & STATUS_SPRITE_0:
+                hits = sprite_0 & opaque & (background != 0)
+                hits[:, 255] = False
+                if not self.mask & MASK_BG_LEFT or not self.mask & MASK_SPRITES_LEFT:
+                    hits[:, :8] = False
+                if hits.any():
+                    self.status |= STATUS_SPRITE_0
+            show = opaque & ~(behind & (background != 0))
+            colors = np.where(show, self.palette[PALETTE_MIRROR[sprites | 0x10]], self.background_colors[start:end])
+
+        changed = (self.indices[start:end] != colors).any(axis=1)
+        if changed.any():
+            self.indices[start:end] = colors
+            self.changed_lines[start:end] |= changed
+
+    def sprite_layer(self, tiles: np.ndarray, start: int, end: int) -> tuple:
+        """Returns the sprite pixels (palette offset from $3F10, 0 for transparent), the
+            behind-background mask and sprite 0's coverage for visible lines [start, end).
+            Lower-numbered sprites are drawn last so they win. The eight-per-line limit is
+            not applied."""
+        count = end - start
+        sprites = np.zeros((count, WIDTH + 8), dtype=np.uint8)
+        behind = np.zeros((count, WIDTH + 8), dtype=np.bool_)
+        sprite_0 = None
+        height = 16 if self.ctrl & CTRL_SPRITE_16 else 8
+        table = 256 if self.ctrl & CTRL_SPRITE_TABLE else 0
+        oam = self.oam.reshape(64, 4).astype(np.intp)
+        tops = oam[:, 0] + 1
+        visible = np.flatnonzero((tops < end) & (tops + height > start))
+        for index in visible[::-1]:
+            y, tile, attributes, x = oam[index]
+            if height == 16:
+                pattern = np.concatenate((tiles[(tile & 0xFE) + (tile & 1) * 256],
+                                          tiles[(tile | 1) + (tile & 1) * 256]))
+            else:
+                pattern = tiles[tile + table]
+            if attributes & 0x80:
+                pattern = pattern[::-1]
+            if attributes & 0x40:
+                pattern = pattern[:, ::-1]
+            first = max(y + 1, start)
+            last = min(y + 1 + height, end)
+            rows = pattern[first - (y + 1):last - (y + 1)]
+            opaque = rows != 0
+            target = sprites[first - start:last - start, x:x + 8]
+            target[opaque] = rows[opaque] | ((attributes & 0x03) << 2)
+            behind[first - start:last - start, x:x + 8][opaque] = bool(attributes & 0x20)
+            if index == 0:
+                sprite_0 = np.zeros((count, WIDTH + 8), dtype=np.bool_)
+                sprite_0[first - start:last - start, x:x + 8] = opaque
+                sprite_0 = sprite_0[:, :WIDTH]
+        return sprites[:, :WIDTH], behind[:, :WIDTH], sprite_0
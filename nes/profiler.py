@@ -0,0 +1,167 @@
+# Author: Chase Smith
+# GitHub username: ChaseSmith67
+# Description: Profiler for emulated code. Counts executed opcodes and PC addresses,
+#               totals cycles per JSR target and per call stack, and exports a text
+#               report or folded stacks for flame graph tools.
+
+import collections
+
+import numpy as np
+
+from .instructions import opcode_table
+
+JSR = 0x20
+RTS = 0x60
+CHUNK = 1 << 14     # Instructions buffered between counter updates
+
+
+class Profiler(object):
+    """
+    A CPU monitor that profiles the emulated program while attached (start/stop can be
+    called at any time, and cost nothing while stopped).
+
+    opcode_counts and pc_counts are 256- and 65536-entry counters. PCs and opcodes are
+    buffered and added to the counters in chunks with np.bincount rather than one
+    NumPy increment per instruction.
+
+    Calls are followed through JSR and RTS. A JSR records the Stack Pointer it was made
+    with and the RTS that brings the Stack Pointer back to it ends the call, so code that
+    unwinds the stack itself doesn't leave stale calls behind. Every instruction's cycles
+    are added to the call stack it ran in (for flame graphs), and each call's inclusive
+    cycles to its target.
+    """
+    def __init__(self, cpu, symbols: dict = None):
+        self.cpu = cpu
+        self.opcode_counts = np.zeros(256, dtype=np.int64)
+        self.pc_counts = np.zeros(0x10000, dtype=np.int64)
+        self.pcs = np.zeros(CHUNK, dtype=np.uint16)
+        self.opcodes = np.zeros(CHUNK, dtype=np.uint8)
+        self.buffered = 0
+
+        self.call_cycles = collections.Counter()    # Target -> inclusive cycles
+        self.call_counts = collections.Counter()    # Target -> number of calls
+        self.stack_cycles = collections.Counter()   # Stack of targets -> exclusive cycles
+        self.calls = []                             # (target, Stack Pointer at the JSR, cycles at the JSR)
+        self.stack = ()
+        self.current = ()                           # Stack the previous instruction ran in
+        self.last_cycles = None
+
+        # Address -> name, e.g. Program.symbols inverted, for reports
+        self.names = {value: name for name, value in (symbols or {}).items()}
+        self.running = False
+
+    def start(self) -> None:
+        """Starts (or resumes) profiling"""
+        self.last_cycles = None
+        self.running = True
+        self.cpu.add_monitor(self)
+
+    def stop(self) -> None:
+        """Stops profiling and brings the counters up to date"""
+        self.cpu.remove_monitor(self)
+        self.running = False
+        self.flush()
+
+    def reset(self) -> None:
+        """Clears everything collected so far"""
+        self.opcode_counts[:] = 0
+        self.pc_counts[:] = 0
+        self.buffered = 0
+        self.call_cycles.clear()
+        self.call_counts.clear()
+        self.stack_cycles.clear()
+        self.calls = []
+        self.stack = self.current = ()
+        self.last_cycles = None
+
+    def instruction(self, pc: int, opcode: int) -> bool:
+        """Counts the instruction about to execute and charges the previous one's cycles"""
+        cycles = self.cpu.cycles
+        if self.last_cycles is not None:
+            self.stack_cycles[self.current] += cycles - self.last_cycles
+        self.last_cycles = cycles
+        self.current = self.stack
+
+        index = self.buffered
+        self.pcs[index] = pc
+        self.opcodes[index] = opcode
+        self.buffered = index + 1
+        if self.buffered == CHUNK:
+            self.flush()
+
+        if opcode == JSR:
+            memory = self.cpu.memory
+            target = memory.read_mem((pc + 1) & 0xFFFF) | (memory.read_mem((pc + 2) & 0xFFFF) << 8)
+            self.calls.append((target, self.cpu.regs.SP, cycles))
+            self.stack = self.stack + (target,)
+        elif opcode == RTS and self.calls:
+            # The RTS pulls two bytes, returning to the frame whose JSR had SP + 2
+            sp = (self.cpu.regs.SP + 2) & 0xFF
+            for depth in range(len(self.calls) - 1, -1, -1):
+                if self.calls[depth][1] == sp:
+                    target, _, start = self.calls[depth]
+                    self.call_cycles[target] += cycles + 6 - start
+                    self.call_counts[target] += 1
+                    del self.calls[depth:]
+                    self.stack = self.stack[:depth]
+                    break
+        return False
+
+    def flush(self) -> None:
+        """Adds the buffered instructions to the counters"""
+        count = self.buffered
+        if count:
+            self.pc_counts += np.bincount(self.pcs[:count], minlength=0x10000)
+            self.opcode_counts += np.bincount(self.opcodes[:count], minlength=256)
+            self.buffered = 0
+
+    def name(self, address: int) -> str:
+        """Returns a symbol name for an address, or its hex"""
+        return self.names.get(address, f"${address:04X}")
+
+    def top_opcodes(self, count: int = 20) -> list:
+        """Returns (opcode, name, executions) for the most executed opcodes"""
+        self.flush()
+        order = np.argsort(self.opcode_counts)[::-1][:count]
+        result = []
+        for opcode in order:
+            if not self.opcode_counts[opcode]:
+                break
+            entry = opcode_table[opcode]
+            name = f"{entry[0][:3]} {entry[1]}" if entry else "illegal"
+            result.append((int(opcode), name, int(self.opcode_counts[opcode])))
+        return result
+
+    def top_addresses(self, count: int = 20) -> list:
+        """Returns (address, executions) for the hottest instruction addresses"""
+        self.flush()
+        hot = np.argpartition(self.pc_counts, -count)[-count:] if count < 0x10000 else np.arange(0x10000)
+        hot = hot[np.argsort(self.pc_counts[hot])[::-1]]
+        return [(int(address), int(self.pc_counts[address])) for address in hot if self.pc_counts[address]]
+
+    def top_routines(self, count: int = 20) -> list:
+        """Returns (target, calls, inclusive cycles) for the routines with the most cycles"""
+        return [(target, self.call_counts[target], cycles) for target, cycles in self.call_cycles.most_common(count)]
+
+    def report(self, count: int = 20) -> str:
+        """Returns a text report of the hottest opcodes, addresses and routines"""
+        self.flush()
+        total = int(self.opcode_counts.sum())
+        lines = [f"Instructions: {total}", "", "Opcodes:"]
+        for opcode, name, executions in self.top_opcodes(count):
+            lines.append(f"  ${opcode:02X} {name:<8} {executions:>12} {executions / total:7.2%}")
+        lines += ["", "Addresses:"]
+        for address, executions in self.top_addresses(count):
+            lines.append(f"  {self.name(address):<16} {executions:>12} {executions / total:7.2%}")
+        lines += ["", "Routines (inclusive cycles):"]
+        for target, calls, cycles in self.top_routines(count):
+            lines.append(f"  {self.name(target):<16} {calls:>8} calls {cycles:>14} cycles")
+        return "\n".join(lines)
+
+    def write_folded(self, path: str, root: str = "main") -> None:
+        """Writes cycles per call stack in the folded format read by flamegraph.pl,
+            speedscope and similar tools: one "root;caller;callee cycles" line per stack"""
+        with open(path, "w") as file:
+            for stack, cycles in sorted(self.stack_cycles.items()):
+                frames = ";".join([root] + [self.name(target) for target in stack])
+                file.write(f"{frames} {cycles}\n")
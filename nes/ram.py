@@ -12,8 +12,12 @@ KB = 2
 
 class RAM(object):
 
-    def __init__(self):
-        self.memory = np.array([0] * (KB * 1024), dtype=np.uint8)
+    def __init__(self, buffer=None):
+        # buffer, if given, holds the RAM instead, e.g. a shared memory segment
+        if buffer is not None:
+            self.memory = np.ndarray(KB * 1024, dtype=np.uint8, buffer=buffer)
+        else:
+            self.memory = np.array([0] * (KB * 1024), dtype=np.uint8)
 
     def get_memory(self) -> np.array(np.uint8):
         return self.memory
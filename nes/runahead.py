@@ -0,0 +1,101 @@
+# Author: Chase Smith
+# GitHub username: ChaseSmith67
+# Description: Run-ahead. Each displayed frame is emulated a few frames in the future
+#               with the current input, hiding the input lag built into a game, and
+#               the real timeline is restored from a savestate afterwards.
+
+import collections
+import json
+import time
+
+from .savestate import save_state, load_state
+
+NTSC_FPS = 60.0988
+
+
+def load_config(path: str) -> dict:
+    """Reads per-game run-ahead settings: a JSON object mapping a game's PRG CRC as 8
+        hex digits (or its ROM file name) to a number of frames"""
+    with open(path) as file:
+        return json.load(file)
+
+
+def frames_for(cartridge, config: dict, default: int = 0) -> int:
+    """Returns the configured run-ahead for the cartridge, looked up by PRG CRC first and
+        then by ROM file name"""
+    key = f"{cartridge.prg_crc:08X}"
+    if key in config:
+        return int(config[key])
+    if cartridge.path is not None:
+        name = cartridge.path.replace("\\", "/").rsplit("/", 1)[-1]
+        if name in config:
+            return int(config[name])
+    return default
+
+
+class RunAhead(object):
+    """
+    Runs a System with run-ahead of `frames` frames. Each call to run_frame():
+        1. runs one real frame with only audio output on and saves its state,
+        2. runs `frames` frames further with the same input, with video output only for
+           the last of them, which is what gets shown,
+        3. restores the saved state, leaving the real timeline one frame on.
+    Audio always comes from the real timeline: speculative audio would repeat or skip
+    sound whenever the input changes. So the host has to emulate frames + 1 frames per
+    displayed frame. The cost of each call is measured, and if the average over `window`
+    frames doesn't fit in a display frame run-ahead switches itself off (see
+    disabled_reason).
+    """
+    def __init__(self, system, frames: int = 1, fps: float = NTSC_FPS, window: int = 120,
+                 auto_disable: bool = True):
+        self.system = system
+        self.frames = frames
+        self.budget = 1.0 / fps
+        self.auto_disable = auto_disable
+        self.costs = collections.deque(maxlen=window)
+        self.enabled = frames > 0
+        self.disabled_reason = None
+
+    @property
+    def average_cost(self) -> float:
+        """Average seconds spent per displayed frame over the window"""
+        return sum(self.costs) / len(self.costs) if self.costs else 0.0
+
+    def run_frame(self) -> None:
+        """Advances the real timeline one frame and leaves the run-ahead frame on screen"""
+        system = self.system
+        if not self.enabled:
+            system.run_frame()
+            return
+        start = time.perf_counter()
+        shared = getattr(system, "shared", None)
+        if shared is not None:
+            # Exported state only shows the real timeline, with the run-ahead frame
+            shared.begin()
+        system.set_output(video=False, audio=True)
+        try:
+            system.run_frame()
+            state = save_state(system)
+            # Saving caught the APU up past the frame's mix; that audio is real too
+            system.apu.end_frame()
+            system.set_output(False)
+            for frame in range(self.frames):
+                if frame == self.frames - 1:
+                    system.set_output(video=True, audio=False)
+                system.run_frame()
+            load_state(system, state)
+        finally:
+            system.set_output(True)
+            if shared is not None:
+                shared.publish(system)
+        self.costs.append(time.perf_counter() - start)
+        self.check_cost()
+
+    def check_cost(self) -> None:
+        """Turns run-ahead off once a full window of frames has averaged over budget"""
+        if not self.auto_disable or len(self.costs) < self.costs.maxlen:
+            return
+        if self.average_cost > self.budget:
+            self.enabled = False
+            self.disabled_reason = (f"{self.frames + 1} frames took {self.average_cost * 1000:.1f}ms on average, "
+                                    f"over the {self.budget * 1000:.1f}ms frame budget")
@@ -0,0 +1,180 @@
+# Author: Chase Smith
+# GitHub username: ChaseSmith67
+# Description: Headless test runner. Runs a corpus of test ROMs and assembly programs
+#               in parallel over a process pool, one emulator per worker, and writes
+#               a JSON report of the results.
+
+import argparse
+import concurrent.futures
+import hashlib
+import json
+import os
+import sys
+import time
+
+# blargg's test ROM protocol: $6000 holds the status once $6001-$6003 hold the signature
+STATUS = 0x6000
+SIGNATURE = bytes([0xDE, 0xB0, 0x61])
+TEXT = 0x6004
+RUNNING = 0x80
+NEEDS_RESET = 0x81
+RESET_DELAY = 6     # Frames to wait before pressing reset when asked
+
+EXTENSIONS = {".nes": "rom", ".s": "asm", ".asm": "asm"}
+CHECK_CYCLES = 10000    # Cycles between status checks for assembly programs
+
+
+def find_tests(paths: list) -> list:
+    """Expands files and directories into a sorted list of test files"""
+    tests = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                tests += [os.path.join(root, name) for name in files
+                          if os.path.splitext(name)[1].lower() in EXTENSIONS]
+        else:
+            tests.append(path)
+    return sorted(tests)
+
+
+def read_status(read) -> tuple:
+    """Returns (status, message) from the blargg protocol, or (None, "") if the test
+        hasn't written the signature yet"""
+    if bytes(read(STATUS + 1 + offset) for offset in range(3)) != SIGNATURE:
+        return None, ""
+    text = bytearray()
+    for address in range(TEXT, 0x8000):
+        value = read(address)
+        if not value:
+            break
+        text.append(value)
+    return read(STATUS), text.decode("ascii", "replace").strip()
+
+
+def outcome(status: int | None) -> str:
+    """Maps a final status byte to pass, fail or timeout"""
+    if status is None or status >= RUNNING:
+        return "timeout"
+    return "pass" if status == 0 else "fail"
+
+
+def run_rom(path: str, frames: int, cycles: int) -> dict:
+    """Runs a ROM on a full System until it reports a result or runs out of budget"""
+    from .cartridge import load_rom
+    from .main import System
+
+    system = System()
+    system.insert_cartridge(load_rom(path))
+    read = system.memory.read_mem
+    status, message = None, ""
+    reset_at = None
+    frame = 0
+    while frame < frames and (not cycles or system.cpu.cycles < cycles):
+        system.run_frame()
+        frame += 1
+        status, message = read_status(read)
+        if status == NEEDS_RESET:
+            if reset_at is None:
+                reset_at = frame + RESET_DELAY
+            elif frame >= reset_at:
+                system.cpu.reset()
+                reset_at = None
+        elif status is not None and status < RUNNING:
+            break
+    state = system.memory.get_memory().tobytes() + bytes(system.cartridge.mapper.prg_ram)
+    return {"status": status, "message": message, "cycles": system.cpu.cycles, "frames": frame,
+            "hash": hashlib.sha1(state).hexdigest()}
+
+
+def run_program(path: str, frames: int, cycles: int) -> dict:
+    """Assembles a program and runs it on a bare CPU, starting at the reset vector if
+        the program sets one and at its origin otherwise"""
+    from .assembler import assemble_file
+    from .cpu6502 import CPU, Memory
+    from .main import FRAME_CYCLES
+
+    program = assemble_file(path)
+    memory = Memory()
+    program.load_into(memory)
+    cpu = CPU(memory)
+    end = program.origin + len(program)
+    if program.origin <= 0xFFFC and end >= 0xFFFE:
+        cpu.reset()
+    else:
+        cpu.set_pc(program.origin)
+    budget = cycles or frames * FRAME_CYCLES
+    status, message = None, ""
+    while cpu.cycles < budget:
+        cpu.run(CHECK_CYCLES)
+        status, message = read_status(memory.read_mem)
+        if status is not None and status < RUNNING:
+            break
+    state = bytes(memory.read_mem(address) for address in range(0x0800))
+    state += bytes(memory.read_mem(address) for address in range(0x6000, 0x8000))
+    return {"status": status, "message": message, "cycles": cpu.cycles, "frames": None,
+            "hash": hashlib.sha1(state).hexdigest()}
+
+
+def run_test(job: tuple) -> dict:
+    """Worker entry point: runs one test and returns its result"""
+    path, frames, cycles = job
+    start = time.perf_counter()
+    kind = EXTENSIONS.get(os.path.splitext(path)[1].lower())
+    result = {"path": path}
+    try:
+        if kind is None:
+            raise ValueError(f"Don't know how to run {path}")
+        result.update(run_rom(path, frames, cycles) if kind == "rom" else run_program(path, frames, cycles))
+        result["result"] = outcome(result["status"])
+    except Exception as error:
+        result.update({"result": "error", "message": f"{type(error).__name__}: {error}"})
+    result["seconds"] = round(time.perf_counter() - start, 4)
+    return result
+
+
+def run_corpus(tests: list, frames: int, cycles: int, workers: int = None) -> dict:
+    """Runs every test over a process pool and returns the report"""
+    start = time.perf_counter()
+    jobs = [(path, frames, cycles) for path in tests]
+    if workers == 1:
+        results = [run_test(job) for job in jobs]
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(run_test, jobs, chunksize=1))
+    summary = {kind: 0 for kind in ("pass", "fail", "timeout", "error")}
+    for result in results:
+        summary[result["result"]] += 1
+    summary["total"] = len(results)
+    summary["seconds"] = round(time.perf_counter() - start, 3)
+    return {"summary": summary, "results": results}
+
+
+def parse_args() -> object:
+    parser = argparse.ArgumentParser(description="Run test ROMs and programs headless, in parallel")
+    parser.add_argument("paths", nargs="+", help="Test files (.nes, .s, .asm) or directories of them")
+    parser.add_argument("--workers", "-j", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--frames", type=int, default=1800, help="Frame budget per test")
+    parser.add_argument("--cycles", type=int, default=0, help="CPU cycle budget per test (0: frames only)")
+    parser.add_argument("--report", "-o", type=str, help="Write the JSON report to this file")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    tests = find_tests(args.paths)
+    report = run_corpus(tests, args.frames, args.cycles, args.workers)
+    text = json.dumps(report, indent=2)
+    if args.report:
+        with open(args.report, "w") as file:
+            file.write(text)
+    for result in report["results"]:
+        print(f"{result['result']:<8} {result['path']}  {result.get('message', '')}", file=sys.stderr)
+    summary = report["summary"]
+    print(f"{summary['pass']}/{summary['total']} passed in {summary['seconds']}s", file=sys.stderr)
+    if not args.report:
+        print(text)
+    return 0 if summary["pass"] == summary["total"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,187 @@
+# Author: Chase Smith
+# GitHub username: ChaseSmith67
+# Description: Binary savestates of a System and a rewind buffer built on them. A
+#               savestate is a fixed-layout header followed by raw memory blobs, so
+#               saving and loading are a handful of struct calls and slice copies.
+
+import collections
+import struct
+import zlib
+
+import numpy as np
+
+from .controller import STATE as CONTROLLER_STATE
+
+MAGIC = b"NESS"
+VERSION = 3
+
+# magic, version, mapper number, PRG-ROM CRC, A, X, Y, SP, PC, P, CPU cycles, frame,
+# then the lengths of the blobs that follow: RAM, PRG-RAM, CHR-RAM, PPU, APU, mapper,
+# controllers
+HEADER = struct.Struct("<4sHHIBBBBHBqqIIIIIII")
+
+
+def save_state(system) -> bytes:
+    """Returns the complete state of the system. The machine must be between
+        instructions, i.e. not inside a bus handler or event."""
+    cpu, cartridge = system.cpu, system.cartridge
+    mapper = cartridge.mapper
+    regs = cpu.regs
+    chr_ram = cartridge.chr_ram if cartridge.chr_ram is not None else b""
+    ppu = system.ppu.save_state()
+    apu = system.apu.save_state()
+    mapper_state = mapper.save_state()
+    controllers = b"".join(controller.save_state() for controller in system.controllers)
+    ram = system.memory.get_memory()
+    header = HEADER.pack(MAGIC, VERSION, cartridge.mapper_number, cartridge.prg_crc,
+                         regs.A, regs.X, regs.Y, regs.SP, regs.PC, regs.P, cpu.cycles, system.frame,
+                         ram.nbytes, len(mapper.prg_ram), len(chr_ram), len(ppu), len(apu), len(mapper_state),
+                         len(controllers))
+    return b"".join((header, ram.tobytes(), mapper.prg_ram, chr_ram, ppu, apu, mapper_state, controllers))
+
+
+def load_state(system, data) -> None:
+    """Restores a state from save_state(). Raises ValueError if it isn't a savestate of
+        this version for the cartridge in the system."""
+    cpu, cartridge = system.cpu, system.cartridge
+    mapper = cartridge.mapper
+    if len(data) < HEADER.size:
+        raise ValueError("Savestate is truncated")
+    (magic, version, mapper_number, prg_crc, a, x, y, sp, pc, p, cycles, frame,
+     ram_size, prg_ram_size, chr_ram_size, ppu_size, apu_size, mapper_size,
+     controllers_size) = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("Not a savestate")
+    if version != VERSION:
+        raise ValueError(f"Savestate version {version} is not supported (expected {VERSION})")
+    if mapper_number != cartridge.mapper_number or prg_crc != cartridge.prg_crc:
+        raise ValueError("Savestate is for a different game")
+    chr_ram = cartridge.chr_ram
+    ram = system.memory.get_memory()
+    if (ram_size != ram.nbytes or prg_ram_size != len(mapper.prg_ram)
+            or chr_ram_size != (len(chr_ram) if chr_ram is not None else 0)
+            or controllers_size != CONTROLLER_STATE.size * len(system.controllers)
+            or len(data) != (HEADER.size + ram_size + prg_ram_size + chr_ram_size + ppu_size + apu_size + mapper_size
+                             + controllers_size)):
+        raise ValueError("Savestate layout does not match this system")
+
+    shared = getattr(system, "shared", None)
+    if shared is not None:
+        # Readers of the shared state see the load as a single update
+        shared.begin()
+    try:
+        view = memoryview(data)
+        offset = HEADER.size
+        ram[:] = np.frombuffer(view, dtype=np.uint8, count=ram_size, offset=offset)
+        offset += ram_size
+        mapper.prg_ram[:] = view[offset:offset + prg_ram_size]
+        offset += prg_ram_size
+        if chr_ram_size:
+            chr_ram[:] = view[offset:offset + chr_ram_size]
+        offset += chr_ram_size
+        ppu_state = view[offset:offset + ppu_size]
+        offset += ppu_size
+        apu_state = view[offset:offset + apu_size]
+        offset += apu_size
+        mapper.load_state(bytes(view[offset:offset + mapper_size]))
+        offset += mapper_size
+        for controller in system.controllers:
+            controller.load_state(view[offset:offset + CONTROLLER_STATE.size])
+            offset += CONTROLLER_STATE.size
+
+        regs = cpu.regs
+        regs.A, regs.X, regs.Y, regs.SP, regs.PC, regs.P = a, x, y, sp, pc, p
+        cpu.cycles = cycles
+        system.frame = frame
+        if cpu.translator is not None:
+            # Memory was replaced behind the translator's write hooks
+            cpu.translator.flush()
+        if cpu.idle is not None:
+            cpu.idle.reset()
+
+        scheduler = system.scheduler
+        scheduler.clear()
+        for component in scheduler.components:
+            component.cycle = cycles
+        system.ppu.load_state(ppu_state)
+        system.apu.load_state(apu_state)
+    finally:
+        if shared is not None:
+            shared.publish(system)
+
+
+class RewindBuffer(object):
+    """
+    Keeps a snapshot every `interval` frames within a memory budget. Snapshots are
+    stored in groups: a compressed keyframe followed by up to keyframe_interval - 1
+    snapshots stored as the compressed XOR of the state against that keyframe, which is
+    almost all zeros. When the budget is exceeded the oldest group is evicted.
+
+    Call record() once per frame and rewind() to step back.
+    """
+    def __init__(self, system, interval: int = 1, keyframe_interval: int = 60, budget: int = 32 << 20):
+        self.system = system
+        self.interval = interval
+        self.keyframe_interval = keyframe_interval
+        self.budget = budget
+        self.groups = collections.deque()   # [compressed keyframe, [compressed deltas]]
+        self.keyframe = None                # The newest group's keyframe, uncompressed
+        self.frames = 0
+        self.size = 0
+
+    def __len__(self) -> int:
+        return sum(1 + len(deltas) for _, deltas in self.groups)
+
+    def record(self) -> None:
+        """Counts a frame, taking a snapshot every interval frames"""
+        self.frames += 1
+        if self.frames % self.interval:
+            return
+        state = np.frombuffer(save_state(self.system), dtype=np.uint8)
+        if (not self.groups or len(self.groups[-1][1]) + 1 >= self.keyframe_interval
+                or state.size != self.keyframe.size):
+            self.keyframe = state
+            entry = zlib.compress(state, 1)
+            self.groups.append([entry, []])
+        else:
+            entry = zlib.compress(np.bitwise_xor(state, self.keyframe), 1)
+            self.groups[-1][1].append(entry)
+        self.size += len(entry)
+        self.evict()
+
+    def evict(self) -> None:
+        """Drops the oldest groups until the buffer fits its budget. The newest group is
+            always kept."""
+        while self.size > self.budget and len(self.groups) > 1:
+            keyframe, deltas = self.groups.popleft()
+            self.size -= len(keyframe) + sum(len(delta) for delta in deltas)
+
+    def rewind(self, snapshots: int = 1) -> bool:
+        """Discards the newest snapshots and restores the one `snapshots` back from the
+            newest. Returns False, leaving the system untouched, if there aren't enough."""
+        if snapshots >= len(self):
+            return False
+        for _ in range(snapshots):
+            keyframe, deltas = self.groups[-1]
+            if deltas:
+                self.size -= len(deltas.pop())
+            else:
+                self.size -= len(keyframe)
+                self.groups.pop()
+                self.keyframe = None
+        keyframe, deltas = self.groups[-1]
+        if self.keyframe is None:
+            self.keyframe = np.frombuffer(zlib.decompress(keyframe), dtype=np.uint8)
+        if deltas:
+            delta = np.frombuffer(zlib.decompress(deltas[-1]), dtype=np.uint8)
+            state = np.bitwise_xor(delta, self.keyframe)
+        else:
+            state = self.keyframe
+        load_state(self.system, state.tobytes())
+        return True
+
+    def clear(self) -> None:
+        """Drops every snapshot"""
+        self.groups.clear()
+        self.keyframe = None
+        self.size = 0
@@ -0,0 +1,153 @@
+# Author: Chase Smith
+# GitHub username: ChaseSmith67
+# Description: Master clock for the system. The CPU runs freely up to the next
+#               scheduled event and other components are only brought up to date
+#               when they are accessed or an event comes due.
+
+import heapq
+import itertools
+
+
+class Component(object):
+    """
+    A device clocked from the master clock that is only advanced when needed. cycle is
+    the CPU cycle it has been emulated up to; run_until does the actual work.
+    """
+    def __init__(self):
+        self.cycle = 0
+
+    def catch_up(self, cycle: int) -> None:
+        """Emulates the component up to the given CPU cycle"""
+        if cycle > self.cycle:
+            self.run_until(cycle)
+            self.cycle = cycle
+
+    def run_until(self, cycle: int) -> None:
+        """Advances the component's own state from self.cycle to the given cycle"""
+        pass
+
+
+class Event(object):
+    """
+    A callback scheduled for a CPU cycle. Cancelled events stay in the queue and are
+    skipped when they come up.
+    """
+    __slots__ = ("cycle", "order", "name", "callback", "cancelled")
+
+    def __init__(self, cycle: int, order: int, name: str, callback):
+        self.cycle = cycle
+        self.order = order
+        self.name = name
+        self.callback = callback
+        self.cancelled = False
+
+    def __lt__(self, other) -> bool:
+        return (self.cycle, self.order) < (other.cycle, other.order)
+
+
+class Scheduler(object):
+    """
+    Runs the CPU in slices that end at the next scheduled event (NMI, IRQ, end of
+    frame, ...), then fires every event that has come due. Components are caught up
+    to the current cycle only when synced: before one of their registers is accessed
+    (see synced()) or by an event that needs them.
+
+    The CPU adds an instruction's cycles after executing it, so a register access is
+    seen at the cycle the instruction started on.
+
+    The IRQ line is polled between slices. Devices only assert it from events, which
+    end a slice, and the CPU ends a slice itself when it unmasks a waiting IRQ, so the
+    interrupt is taken at the first instruction boundary where it can be.
+    """
+    def __init__(self, cpu):
+        self.cpu = cpu
+        self.components = []
+        self.events = []
+        self.counter = itertools.count()
+
+    @property
+    def now(self) -> int:
+        """The current CPU cycle"""
+        return self.cpu.cycles
+
+    def add_component(self, component: Component) -> None:
+        """Adds a component, starting it at the current cycle"""
+        component.cycle = self.now
+        self.components.append(component)
+
+    def schedule(self, cycle: int, callback, name: str = "") -> Event:
+        """Calls callback(cycle) once the CPU reaches the given cycle. Returns the Event,
+            which can be passed to cancel()."""
+        event = Event(cycle, next(self.counter), name, callback)
+        heapq.heappush(self.events, event)
+        return event
+
+    def schedule_in(self, cycles: int, callback, name: str = "") -> Event:
+        """Schedules a callback the given number of cycles from now"""
+        return self.schedule(self.now + cycles, callback, name)
+
+    def cancel(self, event: Event) -> None:
+        """Stops a scheduled event from firing"""
+        event.cancelled = True
+
+    def clear(self) -> None:
+        """Drops every pending event, for when the machine state is replaced wholesale"""
+        self.events.clear()
+
+    def next_event_cycle(self) -> int | None:
+        """Returns the cycle of the next pending event, or None if there are none"""
+        events = self.events
+        while events and events[0].cancelled:
+            heapq.heappop(events)
+        return events[0].cycle if events else None
+
+    def sync(self, component: Component) -> None:
+        """Catches a component up to the current cycle"""
+        component.catch_up(self.cpu.cycles)
+
+    def sync_all(self) -> None:
+        """Catches every component up to the current cycle"""
+        cycle = self.cpu.cycles
+        for component in self.components:
+            component.catch_up(cycle)
+
+    def synced(self, component: Component, handler):
+        """Wraps a bus read or write handler so that the component is caught up before
+            the handler runs"""
+        cpu = self.cpu
+
+        def handle(*args):
+            component.catch_up(cpu.cycles)
+            return handler(*args)
+        return handle
+
+    def run(self, cycles: int) -> int:
+        """Runs the CPU for at least the given number of cycles, firing events as they
+            come due. Returns the number of cycles actually run."""
+        return self.run_until(self.cpu.cycles + cycles)
+
+    def run_until(self, target: int) -> int:
+        """Runs the CPU until the given cycle, firing events as they come due and taking
+            the IRQ between slices. Returns early if a CPU monitor (e.g. a debugger
+            breakpoint) stops execution."""
+        cpu = self.cpu
+        start = cpu.cycles
+        while cpu.cycles < target:
+            if cpu.irq_line:
+                cpu.poll_irq()
+            next_cycle = self.next_event_cycle()
+            stop = target if next_cycle is None or next_cycle > target else next_cycle
+            if cpu.cycles < stop:
+                cpu.run(stop - cpu.cycles)
+                if cpu.stopped:
+                    break
+            self.fire_due()
+        return cpu.cycles - start
+
+    def fire_due(self) -> None:
+        """Fires every event whose cycle has been reached, in order"""
+        events = self.events
+        while events and events[0].cycle <= self.cpu.cycles:
+            event = heapq.heappop(events)
+            if not event.cancelled:
+                event.callback(event.cycle)
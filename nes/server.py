@@ -0,0 +1,389 @@
+# Author: Chase Smith
+# GitHub username: ChaseSmith67
+# Description: A local asyncio server for watching and driving a running System over a
+#               socket. Frames go out as the 8x8 tiles that changed since the frame the
+#               client last acknowledged, audio as chunks of samples, and controller
+#               input comes back with timestamps. Emulation runs on its own thread so
+#               that clients, however slow, never hold it up.
+
+import asyncio
+import collections
+import struct
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from .ppu import WIDTH, HEIGHT
+from .runahead import NTSC_FPS
+
+TILE = 8
+TILES_DOWN = HEIGHT // TILE
+TILES_ACROSS = WIDTH // TILE
+
+# Message kinds. Every message is a MESSAGE header, then `length` bytes of payload.
+HELLO = 0       # Server: frame width, height, tile size and audio sample rate
+FRAME = 1       # Server: frame number, number of the frame it's a delta of, tile count, tiles
+AUDIO = 2       # Server: frame number, then 16-bit samples
+ACK = 3         # Client: number of the frame it has applied
+INPUT = 4       # Client: timestamp, controller port, buttons
+
+MESSAGE = struct.Struct("<BI")
+HELLO_FORMAT = struct.Struct("<HHHI")
+FRAME_HEADER = struct.Struct("<IIH")
+NUMBER = struct.Struct("<I")
+INPUT_FORMAT = struct.Struct("<dBB")
+
+BLANK = 0               # Frame number of the all-black frame every client starts from
+AUDIO_BACKLOG = 1 << 16  # Bytes a client may have unsent before its audio is dropped
+
+
+def message(kind: int, payload: bytes) -> bytes:
+    """Returns a framed message"""
+    return MESSAGE.pack(kind, len(payload)) + payload
+
+
+async def read_message(reader: asyncio.StreamReader) -> tuple:
+    """Reads one message and returns (kind, payload)"""
+    kind, length = MESSAGE.unpack(await reader.readexactly(MESSAGE.size))
+    return kind, await reader.readexactly(length)
+
+
+def tiles(image: np.ndarray) -> np.ndarray:
+    """Returns a view of the frame as (tile row, tile column, 8, 8, RGB)"""
+    return image.reshape(TILES_DOWN, TILE, TILES_ACROSS, TILE, 3).swapaxes(1, 2)
+
+
+def encode_frame(number: int, base: int, previous: np.ndarray, image: np.ndarray) -> bytes:
+    """Returns the FRAME payload that turns frame `base`, previous, into frame `number`:
+        the indices of the tiles that differ, then their pixels, compressed"""
+    current = tiles(image)
+    changed = np.flatnonzero((tiles(previous) != current).any(axis=(2, 3, 4)))
+    body = changed.astype("<u2").tobytes() + current.reshape(-1, TILE, TILE, 3)[changed].tobytes()
+    return FRAME_HEADER.pack(number, base, changed.size) + zlib.compress(body, 1)
+
+
+def apply_frame(image: np.ndarray, payload: bytes) -> tuple:
+    """Applies a FRAME payload to image in place. Returns (number, base)."""
+    number, base, count = FRAME_HEADER.unpack_from(payload)
+    body = zlib.decompress(payload[FRAME_HEADER.size:])
+    changed = np.frombuffer(body, dtype="<u2", count=count)
+    pixels = np.frombuffer(body, dtype=np.uint8, offset=count * 2).reshape(count, TILE, TILE, 3)
+    view = tiles(image)
+    view[changed // TILES_ACROSS, changed % TILES_ACROSS] = pixels
+    return number, base
+
+
+class Client(object):
+    """
+    A subscriber. At most one frame is in flight to it: until that frame is
+    acknowledged newer frames are not sent, and when it is only the newest is, so a
+    slow client skips frames instead of falling further behind. Frames are deltas of
+    the last frame it acknowledged.
+    """
+    def __init__(self, writer: asyncio.StreamWriter, blank: np.ndarray):
+        self.writer = writer
+        self.base = BLANK           # Last frame acknowledged, and its image
+        self.image = blank
+        self.in_flight = None       # (number, image) sent but not acknowledged
+        self.waiting = False        # A newer frame came while one was in flight
+
+        self.frames_sent = 0
+        self.frames_dropped = 0
+        self.audio_sent = 0
+        self.audio_dropped = 0
+        self.bytes_sent = 0
+
+    def send(self, data: bytes) -> None:
+        """Queues a message on the connection"""
+        self.writer.write(data)
+        self.bytes_sent += len(data)
+
+    def stats(self) -> dict:
+        """Returns the counters"""
+        return {"frames_sent": self.frames_sent, "frames_dropped": self.frames_dropped,
+                "audio_sent": self.audio_sent, "audio_dropped": self.audio_dropped, "bytes_sent": self.bytes_sent}
+
+
+class FrameServer(object):
+    """
+    Serves a System, with its cartridge inserted, to any number of clients on a local
+    socket. run() starts the emulation thread, which runs frames at fps (or as fast as
+    it can with fps None) and hands each finished frame and its audio to the event loop.
+    Only the newest frame is kept for the loop, and a bounded backlog of audio, so
+    nothing the clients do can block emulation.
+
+    Input is applied on the emulation thread at the start of the first frame that
+    starts at or after its timestamp (time.time() seconds), in timestamp order; input
+    older than what was last applied to the same controller is ignored.
+
+    frame_listeners are called with the server on the emulation thread after each frame.
+    """
+    def __init__(self, system, host: str = "127.0.0.1", port: int = 0, fps: float | None = NTSC_FPS):
+        self.system = system
+        self.host = host
+        self.port = port
+        self.fps = fps
+        self.clients = set()
+        self.server = None
+        self.loop = None
+        self.thread = None
+        self.stopping = threading.Event()
+        self.blank = np.zeros((HEIGHT, WIDTH, 3), dtype=np.uint8)
+
+        # Handed from the emulation thread to the loop under lock
+        self.lock = threading.Lock()
+        self.latest = None                              # (number, image)
+        self.audio = collections.deque(maxlen=64)       # (number, samples)
+        self.scheduled = False
+        self.inputs = []                                # (timestamp, port, buttons)
+        self.applied = [0.0, 0.0]                       # Timestamp of the last input per port
+
+        self.samples = []
+        self.frames = 0
+        self.frames_skipped = 0     # Frames replaced before the loop got to them
+        self.encoded_number = None
+        self.encoded = {}           # Base frame number -> FRAME message of frame encoded_number
+        self.frame_listeners = []
+        system.apu.output_listeners.append(lambda apu, samples: self.samples.append(samples.copy()))
+
+    # ----- Emulation thread
+
+    def emulate(self, frames: int | None) -> None:
+        """Runs frames until stopped or `frames` have been run"""
+        system = self.system
+        period = 1.0 / self.fps if self.fps else 0.0
+        deadline = time.perf_counter()
+        while not self.stopping.is_set() and (frames is None or self.frames < frames):
+            self.apply_inputs()
+            system.run_frame()
+            self.frames += 1
+            for listener in self.frame_listeners:
+                listener(self)
+            samples = np.concatenate(self.samples) if self.samples else None
+            self.samples.clear()
+            self.hand_over(system.frame, system.ppu.frame.copy(), samples)
+            if period:
+                deadline += period
+                delay = deadline - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                elif delay < -period:
+                    deadline = time.perf_counter()  # Too far behind to catch up
+        self.loop.call_soon_threadsafe(self.finished)
+
+    def apply_inputs(self) -> None:
+        """Sets the controllers from the input that is due"""
+        now = time.time()
+        with self.lock:
+            if not self.inputs:
+                return
+            self.inputs.sort()
+            due = [entry for entry in self.inputs if entry[0] <= now]
+            self.inputs = [entry for entry in self.inputs if entry[0] > now]
+        for timestamp, port, buttons in due:
+            if timestamp >= self.applied[port]:
+                self.applied[port] = timestamp
+                self.system.controllers[port].set_buttons(buttons)
+
+    def hand_over(self, number: int, image: np.ndarray, samples: np.ndarray | None) -> None:
+        """Leaves the frame and audio for the loop, waking it if it isn't already due to
+            run publish()"""
+        with self.lock:
+            self.latest = (number, image)
+            if samples is not None:
+                self.audio.append((number, samples))
+            if self.scheduled:
+                self.frames_skipped += 1
+                return
+            self.scheduled = True
+        self.loop.call_soon_threadsafe(self.publish)
+
+    # ----- Event loop
+
+    def publish(self) -> None:
+        """Sends the newest frame to every client that is ready for one, and the audio"""
+        with self.lock:
+            self.scheduled = False
+            latest = self.latest
+            audio = list(self.audio)
+            self.audio.clear()
+        for client in list(self.clients):
+            for number, samples in audio:
+                if client.writer.transport.get_write_buffer_size() > AUDIO_BACKLOG:
+                    client.audio_dropped += 1
+                    continue
+                client.send(message(AUDIO, NUMBER.pack(number) + samples.astype("<i2", copy=False).tobytes()))
+                client.audio_sent += 1
+            if latest is not None:
+                self.offer(client, latest)
+
+    def offer(self, client: Client, latest: tuple) -> None:
+        """Sends the frame if nothing is in flight to the client, else marks it waiting"""
+        if client.in_flight is not None:
+            if client.waiting:
+                client.frames_dropped += 1
+            client.waiting = True
+            return
+        number, image = latest
+        if number == client.base:
+            return
+        if number != self.encoded_number:
+            self.encoded_number = number
+            self.encoded = {}
+        # Clients that acknowledged the same frame share one encoding
+        data = self.encoded.get(client.base)
+        if data is None:
+            data = self.encoded[client.base] = message(FRAME, encode_frame(number, client.base, client.image, image))
+        client.send(data)
+        client.in_flight = (number, image)
+        client.waiting = False
+        client.frames_sent += 1
+
+    def acknowledged(self, client: Client, number: int) -> None:
+        """The client has applied a frame: it becomes the base of the next delta"""
+        if client.in_flight is None or client.in_flight[0] != number:
+            return
+        client.base, client.image = client.in_flight
+        client.in_flight = None
+        if client.waiting:
+            with self.lock:
+                latest = self.latest
+            client.waiting = False
+            self.offer(client, latest)
+
+    def queue_input(self, timestamp: float, port: int, buttons: int) -> None:
+        """Queues controller input for the emulation thread"""
+        if port not in (0, 1):
+            return
+        with self.lock:
+            self.inputs.append((timestamp, port, buttons & 0xFF))
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Serves one client until it disconnects"""
+        client = Client(writer, self.blank)
+        self.clients.add(client)
+        client.send(message(HELLO, HELLO_FORMAT.pack(WIDTH, HEIGHT, TILE, self.system.apu.resampler.rate)))
+        with self.lock:
+            latest = self.latest
+        if latest is not None:
+            self.offer(client, latest)
+        try:
+            while True:
+                kind, payload = await read_message(reader)
+                if kind == ACK:
+                    self.acknowledged(client, NUMBER.unpack(payload)[0])
+                elif kind == INPUT:
+                    self.queue_input(*INPUT_FORMAT.unpack(payload))
+        except (asyncio.IncompleteReadError, ConnectionError, struct.error):
+            pass
+        finally:
+            self.clients.discard(client)
+            writer.close()
+
+    def finished(self) -> None:
+        """Called on the loop once the emulation thread has stopped"""
+        if self.server is not None:
+            self.server.close()
+
+    async def start(self, frames: int | None = None) -> int:
+        """Starts listening and the emulation thread, which stops after `frames` frames
+            if given. Returns the port."""
+        self.loop = asyncio.get_running_loop()
+        self.server = await asyncio.start_server(self.handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.thread = threading.Thread(target=self.emulate, args=(frames,), name="emulation", daemon=True)
+        self.thread.start()
+        return self.port
+
+    async def run(self, frames: int | None = None, started=None) -> None:
+        """Serves until the emulation thread stops, or forever without a frame limit.
+            started, if given, is called with the port once it is listening."""
+        port = await self.start(frames)
+        if started is not None:
+            started(port)
+        try:
+            await self.server.serve_forever()
+        except asyncio.CancelledError:
+            pass
+        finally:
+            await self.stop()
+
+    async def stop(self) -> None:
+        """Stops emulating, closes the listener and disconnects every client"""
+        self.stopping.set()
+        if self.thread is not None:
+            await asyncio.to_thread(self.thread.join)
+        self.server.close()
+        for client in list(self.clients):
+            client.writer.close()
+        self.clients.clear()
+
+    def stats(self) -> dict:
+        """Returns the server's counters and every connected client's"""
+        return {"frames": self.frames, "frames_skipped": self.frames_skipped,
+                "clients": [client.stats() for client in self.clients]}
+
+
+class FrameClient(object):
+    """
+    A client for FrameServer, e.g. for a viewer or a test over loopback. image holds
+    the latest frame; every frame is acknowledged once applied unless auto_ack is off,
+    in which case ack() must be called. Audio chunks are kept in `audio`.
+    """
+    def __init__(self, auto_ack: bool = True):
+        self.auto_ack = auto_ack
+        self.reader = None
+        self.writer = None
+        self.image = None
+        self.number = BLANK
+        self.rate = None
+        self.audio = collections.deque(maxlen=256)
+        self.frames = 0
+
+    async def connect(self, host: str, port: int) -> None:
+        """Connects and reads the server's HELLO"""
+        self.reader, self.writer = await asyncio.open_connection(host, port)
+        kind, payload = await read_message(self.reader)
+        if kind != HELLO:
+            raise ValueError("Server did not say hello")
+        width, height, tile, self.rate = HELLO_FORMAT.unpack(payload)
+        if tile != TILE:
+            raise ValueError(f"Tiles of {tile} pixels are not supported")
+        self.image = np.zeros((height, width, 3), dtype=np.uint8)
+
+    async def receive(self) -> int:
+        """Handles messages until a frame has been applied, and returns its number"""
+        while True:
+            kind, payload = await read_message(self.reader)
+            if kind == AUDIO:
+                self.audio.append((NUMBER.unpack_from(payload)[0],
+                                   np.frombuffer(payload, dtype="<i2", offset=NUMBER.size)))
+            elif kind == FRAME:
+                number, base = FRAME_HEADER.unpack_from(payload)[:2]
+                if base != self.number:
+                    raise ValueError(f"Frame {number} is a delta of frame {base}, but frame {self.number} is shown")
+                apply_frame(self.image, payload)
+                self.number = number
+                self.frames += 1
+                if self.auto_ack:
+                    self.ack()
+                return number
+
+    def ack(self) -> None:
+        """Acknowledges the frame shown"""
+        self.writer.write(message(ACK, NUMBER.pack(self.number)))
+
+    def send_input(self, port: int, buttons: int, timestamp: float = None) -> None:
+        """Sends the buttons held on a controller, to apply at timestamp (default now)"""
+        timestamp = time.time() if timestamp is None else timestamp
+        self.writer.write(message(INPUT, INPUT_FORMAT.pack(timestamp, port, buttons)))
+
+    async def close(self) -> None:
+        """Disconnects"""
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except ConnectionError:
+            pass
@@ -0,0 +1,166 @@
+# Author: Chase Smith
+# GitHub username: ChaseSmith67
+# Description: Exports a running System's RAM, registers and frame buffer through a
+#               shared memory segment, so that tools in other processes can read them
+#               every frame without copies, pipes or pickling. A sequence counter
+#               (a seqlock) lets readers tell whether what they read is consistent.
+
+import struct
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from .ppu import WIDTH, HEIGHT
+from .ram import KB
+
+MAGIC = b"NESX"
+VERSION = 1
+
+# magic, version, frame width, frame height, RAM size, then at SEQUENCE two 64-bit
+# counters: the sequence number and the number of frames emulated
+HEADER = struct.Struct("<4sHHHH")
+SEQUENCE = 16
+
+# A, X, Y, SP, PC, P and CPU cycles, as of the end of the last frame
+REGISTERS = struct.Struct("<BBBBHBxq")
+REGISTERS_OFFSET = 32
+RAM_OFFSET = 64
+FRAME_OFFSET = RAM_OFFSET + KB * 1024
+
+
+def segment_size(width: int, height: int, ram_size: int) -> int:
+    """Returns the bytes needed for the segment's layout"""
+    return RAM_OFFSET + ram_size + width * height * 3
+
+
+class SharedState(object):
+    """
+    The writer's side. The segment holds a header, a register block, the 2KB of work
+    RAM and the RGB frame buffer; the System's RAM and the PPU's frame buffer are views
+    of it, so emulation writes straight into shared memory.
+
+    The sequence counter is odd while the state is being changed and even when it is
+    consistent: begin() makes it odd before a frame is run, publish() writes the
+    registers and frame number and makes it even again. Calls nest, so run-ahead wraps
+    its frames and the state it loads back in one update, and loading a savestate is
+    one update too. Anything else that changes RAM between frames should do the same.
+    """
+    def __init__(self, name: str = None):
+        self.memory = shared_memory.SharedMemory(name=name, create=True,
+                                                 size=segment_size(WIDTH, HEIGHT, KB * 1024))
+        self.name = self.memory.name
+        buffer = self.memory.buf
+        HEADER.pack_into(buffer, 0, MAGIC, VERSION, WIDTH, HEIGHT, KB * 1024)
+        self.counters = np.ndarray(2, dtype=np.uint64, buffer=buffer, offset=SEQUENCE)
+        self.ram = np.ndarray(KB * 1024, dtype=np.uint8, buffer=buffer, offset=RAM_OFFSET)
+        self.frame = np.ndarray((HEIGHT, WIDTH, 3), dtype=np.uint8, buffer=buffer, offset=FRAME_OFFSET)
+        self.depth = 0
+
+    def begin(self) -> None:
+        """Marks the state as changing"""
+        if not self.depth:
+            self.counters[0] += 1
+        self.depth += 1
+
+    def publish(self, system) -> None:
+        """Writes the registers and frame number and, once the outermost update is done,
+            marks the state as consistent"""
+        self.depth -= 1
+        if self.depth:
+            return
+        cpu = system.cpu
+        regs = cpu.regs
+        REGISTERS.pack_into(self.memory.buf, REGISTERS_OFFSET, regs.A, regs.X, regs.Y, regs.SP, regs.PC, regs.P,
+                            cpu.cycles)
+        self.counters[1] = system.frame
+        self.counters[0] += 1
+
+    def close(self) -> None:
+        """Removes the segment. Attached readers keep their mapping until they close it,
+            and so does this process while the System's RAM and frame buffer are still
+            around."""
+        del self.counters, self.ram, self.frame
+        self.memory.unlink()
+        try:
+            self.memory.close()
+        except BufferError:
+            pass
+
+
+class SharedStateReader(object):
+    """
+    Attaches to a SharedState by name from another process. ram and frame are live
+    views of the segment. A consistent read goes:
+
+        sequence = reader.read_begin()
+        ... read reader.ram, reader.frame, reader.registers() ...
+        if reader.read_retry(sequence): read again
+
+    snapshot() does that and returns copies.
+    """
+    def __init__(self, name: str):
+        try:
+            self.memory = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            # Before Python 3.13 attaching also registers the segment with the resource
+            # tracker, which would remove it when this process exits
+            from multiprocessing import resource_tracker
+
+            self.memory = shared_memory.SharedMemory(name=name)
+            resource_tracker.unregister(self.memory._name, "shared_memory")
+        buffer = self.memory.buf
+        magic, version, width, height, ram_size = HEADER.unpack_from(buffer)
+        if magic != MAGIC:
+            self.memory.close()
+            raise ValueError(f"{name} is not an emulator state segment")
+        if version != VERSION:
+            self.memory.close()
+            raise ValueError(f"Segment version {version} is not supported (expected {VERSION})")
+        self.counters = np.ndarray(2, dtype=np.uint64, buffer=buffer, offset=SEQUENCE)
+        self.ram = np.ndarray(ram_size, dtype=np.uint8, buffer=buffer, offset=RAM_OFFSET)
+        self.frame = np.ndarray((height, width, 3), dtype=np.uint8, buffer=buffer, offset=RAM_OFFSET + ram_size)
+
+    def read_begin(self, timeout: float = None) -> int:
+        """Waits for the state to be consistent and returns its sequence number. Raises
+            TimeoutError if it is still changing after timeout seconds."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            sequence = int(self.counters[0])
+            if not sequence & 1:
+                return sequence
+            if deadline is not None and time.monotonic() > deadline:
+                raise TimeoutError("Emulator state is still being updated")
+            time.sleep(0)
+
+    def read_retry(self, sequence: int) -> bool:
+        """Whether the state changed since read_begin() returned sequence, so what was
+            read may be torn"""
+        return int(self.counters[0]) != sequence
+
+    @property
+    def frame_number(self) -> int:
+        """Frames emulated as of the last publish"""
+        return int(self.counters[1])
+
+    def registers(self) -> dict:
+        """Returns the register block"""
+        a, x, y, sp, pc, p, cycles = REGISTERS.unpack_from(self.memory.buf, REGISTERS_OFFSET)
+        return {"A": a, "X": x, "Y": y, "SP": sp, "PC": pc, "P": p, "cycles": cycles}
+
+    def snapshot(self, timeout: float = None) -> dict:
+        """Returns a consistent copy of the frame number, registers, RAM and frame"""
+        while True:
+            sequence = self.read_begin(timeout)
+            state = {"frame": self.frame_number, "registers": self.registers(), "ram": self.ram.copy(),
+                     "image": self.frame.copy()}
+            if not self.read_retry(sequence):
+                return state
+
+    def close(self) -> None:
+        """Detaches from the segment, once no views of it are left"""
+        del self.counters, self.ram, self.frame
+        try:
+            self.memory.close()
+        except BufferError:
+            pass
@@ -0,0 +1,155 @@
+# Author: Chase Smith
+# GitHub username: ChaseSmith67
+# Description: Execution trace recorder. Each instruction is recorded as a fixed-width
+#               record in a preallocated NumPy ring buffer; text and disassembly are
+#               only produced when the trace is dumped, and a trace can be compared
+#               against a reference log (nestest style) to find the first divergence.
+
+import re
+
+import numpy as np
+
+from .alu import FLAG_U
+from .instructions import opcode_table, IMP, ACC, IMM, ZP, ZPX, ZPY, ABS, ABX, ABY, IND, IZX, IZY, REL
+
+RECORD = np.dtype([("pc", "<u2"), ("opcode", "u1"), ("operand1", "u1"), ("operand2", "u1"),
+                   ("a", "u1"), ("x", "u1"), ("y", "u1"), ("p", "u1"), ("sp", "u1"), ("cycles", "<u8")])
+
+OPERAND_FORMATS = {
+    IMP: "", ACC: "A", IMM: "#${0:02X}", ZP: "${0:02X}", ZPX: "${0:02X},X", ZPY: "${0:02X},Y",
+    ABS: "${1:04X}", ABX: "${1:04X},X", ABY: "${1:04X},Y", IND: "(${1:04X})",
+    IZX: "(${0:02X},X)", IZY: "(${0:02X}),Y", REL: "${2:04X}",
+}
+
+REFERENCE_LINE = re.compile(r"^([0-9A-Fa-f]{4})\s.*?A:([0-9A-Fa-f]{2}) X:([0-9A-Fa-f]{2}) Y:([0-9A-Fa-f]{2}) "
+                            r"P:([0-9A-Fa-f]{2}) SP:([0-9A-Fa-f]{2})(?:.*?CYC:(\d+))?")
+
+
+def disassemble(pc: int, opcode: int, operand1: int, operand2: int) -> tuple:
+    """Returns (instruction bytes, assembly text) for an instruction"""
+    entry = opcode_table[opcode]
+    if entry is None:
+        return f"{opcode:02X}", f"??? ${opcode:02X}"
+    handler, mode, length, _, _ = entry
+    word = operand1 | (operand2 << 8)
+    target = (pc + 2 + (operand1 - 256 if operand1 & 0x80 else operand1)) & 0xFFFF
+    operand = OPERAND_FORMATS[mode].format(operand1, word, target)
+    raw = " ".join(f"{value:02X}" for value in (opcode, operand1, operand2)[:length])
+    return raw, f"{handler[:3]} {operand}".rstrip()
+
+
+def format_record(record) -> str:
+    """Formats one record as a nestest-style log line"""
+    pc, opcode, operand1, operand2 = int(record["pc"]), int(record["opcode"]), int(record["operand1"]), int(record["operand2"])
+    raw, text = disassemble(pc, opcode, operand1, operand2)
+    return (f"{pc:04X}  {raw:<8}  {text:<30}  A:{int(record['a']):02X} X:{int(record['x']):02X} "
+            f"Y:{int(record['y']):02X} P:{int(record['p']):02X} SP:{int(record['sp']):02X} CYC:{int(record['cycles'])}")
+
+
+def load_trace(path: str) -> np.ndarray:
+    """Reads records streamed to a file by a Tracer"""
+    return np.fromfile(path, dtype=RECORD)
+
+
+class Tracer(object):
+    """
+    Records every instruction the CPU executes: PC, opcode, the two bytes after it,
+    A/X/Y/P/SP and the cycle count before it ran. It is a CPU monitor, so it costs
+    nothing until attach() and nothing again after detach().
+
+    Records go into a ring of `capacity` entries. Without a stream the oldest records
+    are overwritten; with one, the full ring is written to the stream in one block each
+    time it fills, so the file ends up holding the whole trace.
+    """
+    def __init__(self, cpu, capacity: int = 1 << 16, stream=None):
+        self.cpu = cpu
+        self.ring = np.zeros(capacity, dtype=RECORD)
+        self.capacity = capacity
+        self.index = 0
+        self.total = 0
+        self.stream = open(stream, "wb") if isinstance(stream, str) else stream
+        self.written = 0
+
+        # Operands are peeked from memory pages so device registers aren't disturbed
+        self.read_pages = cpu.memory.read_pages
+
+    def attach(self) -> None:
+        """Starts tracing"""
+        self.cpu.add_monitor(self)
+
+    def detach(self) -> None:
+        """Stops tracing"""
+        self.cpu.remove_monitor(self)
+
+    def instruction(self, pc: int, opcode: int) -> bool:
+        """Records the instruction about to execute"""
+        page = self.read_pages[((pc + 1) & 0xFFFF) >> 8]
+        operand1 = page[(pc + 1) & 0xFF] if page is not None else 0
+        page = self.read_pages[((pc + 2) & 0xFFFF) >> 8]
+        operand2 = page[(pc + 2) & 0xFF] if page is not None else 0
+        regs = self.cpu.regs
+        self.ring[self.index] = (pc, opcode, operand1, operand2, regs.A, regs.X, regs.Y,
+                                 regs.P | FLAG_U, regs.SP, self.cpu.cycles)
+        self.index += 1
+        self.total += 1
+        if self.index == self.capacity:
+            if self.stream is not None:
+                self.stream.write(memoryview(self.ring).cast("B"))
+                self.written += self.capacity
+            self.index = 0
+        return False
+
+    def flush(self) -> None:
+        """Writes the records not yet streamed"""
+        if self.stream is not None and self.index:
+            self.stream.write(memoryview(self.ring[:self.index]).cast("B"))
+            self.written += self.index
+            self.index = 0
+        if self.stream is not None:
+            self.stream.flush()
+
+    def close(self) -> None:
+        """Stops tracing, flushes and closes the stream"""
+        self.detach()
+        if self.stream is not None:
+            self.flush()
+            self.stream.close()
+            self.stream = None
+
+    def records(self) -> np.ndarray:
+        """Returns the records still held in memory, oldest first"""
+        if self.stream is None and self.total > self.capacity:
+            return np.concatenate((self.ring[self.index:], self.ring[:self.index]))
+        return self.ring[:self.index].copy()
+
+    def lines(self, records: np.ndarray = None):
+        """Yields the records (by default those in memory) as text lines"""
+        for record in self.records() if records is None else records:
+            yield format_record(record)
+
+    def dump(self, path: str, records: np.ndarray = None) -> None:
+        """Writes records as a text log"""
+        with open(path, "w") as file:
+            for line in self.lines(records):
+                file.write(line + "\n")
+
+
+def diff(records: np.ndarray, reference, compare_cycles: bool = False) -> dict | None:
+    """Compares records against reference log lines (an iterable of nestest-style text).
+        Returns None if they agree as far as both go, otherwise a dict with the index of
+        the first divergence, the differing fields and both lines."""
+    for index, line in enumerate(reference):
+        if index >= len(records):
+            break
+        match = REFERENCE_LINE.match(line)
+        if match is None:
+            continue
+        record = records[index]
+        expected = {"pc": int(match.group(1), 16), "a": int(match.group(2), 16), "x": int(match.group(3), 16),
+                    "y": int(match.group(4), 16), "p": int(match.group(5), 16), "sp": int(match.group(6), 16)}
+        if compare_cycles and match.group(7) is not None:
+            expected["cycles"] = int(match.group(7))
+        fields = {name: (value, int(record[name])) for name, value in expected.items() if int(record[name]) != value}
+        if fields:
+            return {"index": index, "fields": fields, "expected": line.rstrip("\n"), "actual": format_record(record)}
+    return None
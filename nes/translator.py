@@ -0,0 +1,397 @@
+# Author: Chase Smith
+# GitHub username: ChaseSmith67
+# Description: Optional execution mode that translates straight-line runs of 6502
+#               code into generated Python functions, cached by entry address.
+
+from collections import OrderedDict
+
+from . import alu
+from .alu import FLAG_C, FLAG_Z, FLAG_I, FLAG_D, FLAG_V, FLAG_N
+from .alu import KEEP_NZ, KEEP_NZC, KEEP_NVZ, KEEP_NVZC
+from .instructions import opcode_table
+
+# Longest run of instructions compiled into one block
+MAX_BLOCK_LENGTH = 32
+
+# Instructions that read their operand: Python statement with {v} as the value
+READS = {
+    "ADC": "A, f = add(A, {v}, P & 1); P = (P & KEEP_NVZC) | f",
+    "SBC": "A, f = add(A, {v} ^ 0xFF, P & 1); P = (P & KEEP_NVZC) | f",
+    "AND": "A &= {v}; P = (P & KEEP_NZ) | NZ[A]",
+    "ORA": "A |= {v}; P = (P & KEEP_NZ) | NZ[A]",
+    "EOR": "A ^= {v}; P = (P & KEEP_NZ) | NZ[A]",
+    "LDA": "A = {v}; P = (P & KEEP_NZ) | NZ[A]",
+    "LDX": "X = {v}; P = (P & KEEP_NZ) | NZ[X]",
+    "LDY": "Y = {v}; P = (P & KEEP_NZ) | NZ[Y]",
+    "CMP": "P = (P & KEEP_NZC) | COMPARE[(A << 8) | {v}]",
+    "CPX": "P = (P & KEEP_NZC) | COMPARE[(X << 8) | {v}]",
+    "CPY": "P = (P & KEEP_NZC) | COMPARE[(Y << 8) | {v}]",
+    "BIT": "m = {v}; P = (P & KEEP_NVZ) | (m & 0xC0) | (NZ[m & A] & 0x02)",
+}
+
+# Instructions that write to their operand address {a}
+WRITES = {
+    "STA": "write({a}, A)",
+    "STX": "write({a}, X)",
+    "STY": "write({a}, Y)",
+}
+
+# Read-modify-write instructions, with the address already in ad
+MODIFIES = {
+    "ASL": "m, f = ASL[read(ad)]; write(ad, m); P = (P & KEEP_NZC) | f",
+    "LSR": "m, f = LSR[read(ad)]; write(ad, m); P = (P & KEEP_NZC) | f",
+    "ROL": "m, f = ROL[((P & 1) << 8) | read(ad)]; write(ad, m); P = (P & KEEP_NZC) | f",
+    "ROR": "m, f = ROR[((P & 1) << 8) | read(ad)]; write(ad, m); P = (P & KEEP_NZC) | f",
+    "INC": "m = (read(ad) + 1) & 0xFF; write(ad, m); P = (P & KEEP_NZ) | NZ[m]",
+    "DEC": "m = (read(ad) - 1) & 0xFF; write(ad, m); P = (P & KEEP_NZ) | NZ[m]",
+}
+
+# Implied and Accumulator instructions
+IMPLIED = {
+    "ASL_A": "A, f = ASL[A]; P = (P & KEEP_NZC) | f",
+    "LSR_A": "A, f = LSR[A]; P = (P & KEEP_NZC) | f",
+    "ROL_A": "A, f = ROL[((P & 1) << 8) | A]; P = (P & KEEP_NZC) | f",
+    "ROR_A": "A, f = ROR[((P & 1) << 8) | A]; P = (P & KEEP_NZC) | f",
+    "CLC": f"P &= 0x{~FLAG_C & 0xFF:02X}",
+    "CLD": f"P &= 0x{~FLAG_D & 0xFF:02X}",
+    "CLV": f"P &= 0x{~FLAG_V & 0xFF:02X}",
+    "SEC": f"P |= 0x{FLAG_C:02X}",
+    "SED": f"P |= 0x{FLAG_D:02X}",
+    "SEI": f"P |= 0x{FLAG_I:02X}",
+    "DEX": "X = (X - 1) & 0xFF; P = (P & KEEP_NZ) | NZ[X]",
+    "DEY": "Y = (Y - 1) & 0xFF; P = (P & KEEP_NZ) | NZ[Y]",
+    "INX": "X = (X + 1) & 0xFF; P = (P & KEEP_NZ) | NZ[X]",
+    "INY": "Y = (Y + 1) & 0xFF; P = (P & KEEP_NZ) | NZ[Y]",
+    "TAX": "X = A; P = (P & KEEP_NZ) | NZ[X]",
+    "TAY": "Y = A; P = (P & KEEP_NZ) | NZ[Y]",
+    "TSX": "X = SP; P = (P & KEEP_NZ) | NZ[X]",
+    "TXA": "A = X; P = (P & KEEP_NZ) | NZ[A]",
+    "TYA": "A = Y; P = (P & KEEP_NZ) | NZ[A]",
+    "TXS": "SP = X",
+    "NOP": "pass",
+    "PHA": "write(0x100 | SP, A); SP = (SP - 1) & 0xFF",
+    "PHP": "write(0x100 | SP, P | 0x30); SP = (SP - 1) & 0xFF",
+    "PLA": "SP = (SP + 1) & 0xFF; A = read(0x100 | SP); P = (P & KEEP_NZ) | NZ[A]",
+}
+
+# Branches: the flag tested and whether it must be set to take the branch
+BRANCHES = {
+    "BCC": (FLAG_C, False), "BCS": (FLAG_C, True),
+    "BNE": (FLAG_Z, False), "BEQ": (FLAG_Z, True),
+    "BPL": (FLAG_N, False), "BMI": (FLAG_N, True),
+    "BVC": (FLAG_V, False), "BVS": (FLAG_V, True),
+}
+
+# Instructions that end a block by setting PC themselves
+JUMPS = ("JMP", "JSR", "RTS")
+
+# Instructions always left to the interpreter: BRK, and those that can clear Interrupt
+# Disable, since run() has to stop after them if an IRQ is waiting
+INTERPRETED = ("BRK", "CLI", "PLP", "RTI")
+
+# Names visible to generated code
+BLOCK_GLOBALS = {
+    "NZ": alu.NZ, "ASL": alu.ASL, "LSR": alu.LSR, "ROL": alu.ROL, "ROR": alu.ROR,
+    "COMPARE": alu.COMPARE, "add": alu.add,
+    "KEEP_NZ": KEEP_NZ, "KEEP_NZC": KEEP_NZC, "KEEP_NVZ": KEEP_NVZ, "KEEP_NVZC": KEEP_NVZC,
+}
+
+
+class Block(object):
+    """
+    A translated run of instructions. fn(cpu, regs) executes all of them and leaves
+    the Program Counter at the next instruction; fn is None when the instruction at
+    the entry address can't be translated and must be interpreted.
+    """
+    __slots__ = ("start", "fn", "pages", "count", "source")
+
+    def __init__(self, start: int, fn, pages: set, count: int, source: str):
+        self.start = start
+        self.fn = fn
+        self.pages = pages
+        self.count = count
+        self.source = source
+
+
+class Translator(object):
+    """
+    Translates basic blocks of 6502 code into Python functions with operand fetches
+    and flag updates inlined, and caches them by entry address. The cache holds at
+    most max_blocks blocks, evicting the least recently used.
+
+    A block is invalidated when the bus sees a write to any page it was decoded from.
+    This is done by swapping a hook into the bus's write page table for pages that
+    hold translated code, so other writes cost nothing extra. Read-only pages such as
+    PRG-ROM aren't hooked: writes there go to mapper registers and can't change the
+    code, and a bank switch is seen through remapped(). A block ends after any
+    store to a fixed address in the code that follows it, so a store patching the next
+    instructions takes effect. Writes through a mirror of a page, and indexed or
+    indirect writes made by a block to its own code, are not seen until the block
+    finishes.
+
+    Cycles are added when a block finishes rather than per instruction, so devices
+    synced against the cycle count see block granularity in this mode.
+    """
+    def __init__(self, cpu, max_blocks: int = 1024):
+        self.cpu = cpu
+        self.bus = cpu.memory
+        self.max_blocks = max_blocks
+        self.blocks = OrderedDict()
+
+        # Page number: set of block entry addresses decoded from it
+        self.code_pages = {}
+
+        # Page number: (write page, writer) that the invalidation hook replaced, and the hook
+        self.hooked = {}
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+        self.globals = dict(BLOCK_GLOBALS, read=self.bus.read_mem, write=self.bus.write_mem)
+        self.bus.add_map_listener(self.remapped)
+
+    def stats(self) -> dict:
+        """Returns the cache counters"""
+        return {"blocks": len(self.blocks), "hits": self.hits, "misses": self.misses,
+                "invalidations": self.invalidations, "evictions": self.evictions}
+
+    def run(self, cycles: int) -> int:
+        """Executes translated blocks until at least the given number of cycles have
+            elapsed, interpreting any instruction that couldn't be translated. Like the
+            CPU's run(), stops early after an instruction that unmasks a waiting IRQ.
+            Returns the number of cycles actually executed."""
+        cpu = self.cpu
+        regs = cpu.regs
+        blocks = self.blocks
+        start = cpu.cycles
+        cpu.run_target = start + cycles
+        while cpu.cycles < cpu.run_target:
+            pc = regs.PC
+            block = blocks.get(pc)
+            if block is None:
+                self.misses += 1
+                block = self.translate(pc)
+            else:
+                self.hits += 1
+                blocks.move_to_end(pc)
+            if block.fn is None:
+                cpu.step()
+            else:
+                block.fn(cpu, regs)
+        cpu.run_target = 0
+        return cpu.cycles - start
+
+    # ----- Translation
+
+    def translate(self, pc: int) -> Block:
+        """Decodes the block starting at pc, compiles it and adds it to the cache"""
+        source, count, pages = self.generate(pc)
+        fn = None
+        if count:
+            namespace = {}
+            exec(compile(source, f"<block ${pc:04X}>", "exec"), self.globals, namespace)
+            fn = namespace["block"]
+        block = Block(pc, fn, pages, count, source)
+        self.blocks[pc] = block
+        for page in pages:
+            self.code_pages.setdefault(page, set()).add(pc)
+            self.hook(page)
+        while len(self.blocks) > self.max_blocks:
+            self.discard(next(iter(self.blocks)))
+            self.evictions += 1
+        return block
+
+    def generate(self, start: int) -> tuple:
+        """Returns the Python source of the block starting at the given address, the
+            number of instructions in it and the set of pages it was decoded from."""
+        read = self.bus.read_mem
+        read_pages = self.bus.read_pages
+        lines = []
+        pages = set()
+        cycles = 0
+        count = 0
+        pc = start
+        ends = False
+        while count < MAX_BLOCK_LENGTH and not ends:
+            entry = opcode_table[read(pc)]
+            if entry is None or entry[0] in INTERPRETED:
+                break
+            handler, mode, length, base, penalty = entry
+            if any(read_pages[((pc + offset) & 0xFFFF) >> 8] is None for offset in range(length)):
+                break
+            lo = read((pc + 1) & 0xFFFF)
+            hi = read((pc + 2) & 0xFFFF)
+            following = (pc + length) & 0xFFFF
+            lines.append(f"# ${pc:04X} {handler}")
+            body, ends = self.emit(handler, mode, lo, hi, penalty, following)
+            lines.extend(body)
+            for offset in range(length):
+                pages.add(((pc + offset) & 0xFFFF) >> 8)
+            cycles += base
+            count += 1
+            pc = following
+            if (handler in WRITES or handler in MODIFIES) and mode in ("ZP", "ABS"):
+                # The rest of the block would run from code the store may have changed
+                target = lo if mode == "ZP" else lo | (hi << 8)
+                if following <= target < following + 3 * MAX_BLOCK_LENGTH:
+                    break
+        if not count:
+            return "", 0, pages
+        if not ends:
+            lines.append(f"PC = 0x{pc:04X}")
+        source = ["def block(cpu, regs):",
+                  "    A = regs.A; X = regs.X; Y = regs.Y; P = regs.P; SP = regs.SP",
+                  f"    c = {cycles}"]
+        source.extend("    " + line for line in lines)
+        source.append("    regs.A = A; regs.X = X; regs.Y = Y; regs.P = P; regs.SP = SP; regs.PC = PC")
+        source.append("    cpu.cycles += c")
+        return "\n".join(source) + "\n", count, pages
+
+    def address(self, mode: str, lo: int, hi: int, penalty: bool) -> tuple:
+        """Returns the setup statements and the expression for an operand's effective
+            address. Constant addresses are folded in at translation time."""
+        word = lo | (hi << 8)
+        if mode == "ZP":
+            return [], f"0x{lo:02X}"
+        if mode == "ZPX":
+            return [], f"((0x{lo:02X} + X) & 0xFF)"
+        if mode == "ZPY":
+            return [], f"((0x{lo:02X} + Y) & 0xFF)"
+        if mode == "ABS":
+            return [], f"0x{word:04X}"
+        if mode in ("ABX", "ABY"):
+            index = mode[2]
+            setup = [f"c += (0x{lo:02X} + {index}) >> 8"] if penalty else []
+            return setup, f"((0x{word:04X} + {index}) & 0xFFFF)"
+        if mode == "IZX":
+            return [f"t = (0x{lo:02X} + X) & 0xFF",
+                    "ad = read(t) | (read((t + 1) & 0xFF) << 8)"], "ad"
+        if mode == "IZY":
+            setup = [f"b = read(0x{lo:02X}) | (read(0x{(lo + 1) & 0xFF:02X}) << 8)",
+                     "ad = (b + Y) & 0xFFFF"]
+            if penalty:
+                setup.append("c += ((b & 0xFF) + Y) >> 8")
+            return setup, "ad"
+        raise ValueError(f"No address for addressing mode {mode}")
+
+    def emit(self, handler: str, mode: str, lo: int, hi: int, penalty: bool, following: int) -> tuple:
+        """Returns the statements for one instruction and whether it ends the block"""
+        if handler in IMPLIED:
+            return IMPLIED[handler].split("; "), False
+        if handler in READS:
+            if mode == "IMM":
+                return READS[handler].format(v=f"0x{lo:02X}").split("; "), False
+            setup, address = self.address(mode, lo, hi, penalty)
+            return setup + READS[handler].format(v=f"read({address})").split("; "), False
+        if handler in WRITES:
+            setup, address = self.address(mode, lo, hi, penalty)
+            return setup + [WRITES[handler].format(a=address)], False
+        if handler in MODIFIES:
+            setup, address = self.address(mode, lo, hi, penalty)
+            return setup + [f"ad = {address}"] + MODIFIES[handler].split("; "), False
+        if handler in BRANCHES:
+            flag, taken_when_set = BRANCHES[handler]
+            offset = lo - 0x100 if lo >= 0x80 else lo
+            target = (following + offset) & 0xFFFF
+            extra = 2 if (following ^ target) & 0xFF00 else 1
+            test = f"P & 0x{flag:02X}" if taken_when_set else f"not P & 0x{flag:02X}"
+            return [f"if {test}:",
+                    f"    c += {extra}; PC = 0x{target:04X}",
+                    "else:",
+                    f"    PC = 0x{following:04X}"], True
+        word = lo | (hi << 8)
+        if handler == "JMP" and mode == "ABS":
+            return [f"PC = 0x{word:04X}"], True
+        if handler == "JMP":
+            high = (word & 0xFF00) | ((word + 1) & 0x00FF)
+            return [f"PC = read(0x{word:04X}) | (read(0x{high:04X}) << 8)"], True
+        if handler == "JSR":
+            ret = (following - 1) & 0xFFFF
+            return [f"write(0x100 | SP, 0x{ret >> 8:02X}); SP = (SP - 1) & 0xFF",
+                    f"write(0x100 | SP, 0x{ret & 0xFF:02X}); SP = (SP - 1) & 0xFF",
+                    f"PC = 0x{word:04X}"], True
+        if handler == "RTS":
+            return ["SP = (SP + 1) & 0xFF; lo = read(0x100 | SP)",
+                    "SP = (SP + 1) & 0xFF; PC = ((lo | (read(0x100 | SP) << 8)) + 1) & 0xFFFF"], True
+        raise ValueError(f"No translation for {handler}")
+
+    # ----- Cache maintenance
+
+    def discard(self, pc: int) -> None:
+        """Removes a block from the cache, unhooking pages that no longer hold any code"""
+        block = self.blocks.pop(pc)
+        for page in block.pages:
+            entries = self.code_pages.get(page)
+            if entries is None:
+                continue
+            entries.discard(pc)
+            if not entries:
+                del self.code_pages[page]
+                self.unhook(page)
+
+    def invalidate_page(self, page: int) -> None:
+        """Discards every block decoded from the given page"""
+        for pc in list(self.code_pages.get(page, ())):
+            self.discard(pc)
+            self.invalidations += 1
+
+    def flush(self) -> None:
+        """Discards every block"""
+        for pc in list(self.blocks):
+            self.discard(pc)
+
+    def hook(self, page: int) -> None:
+        """Routes writes to a page through the invalidation hook, unless it is read-only"""
+        if page in self.hooked:
+            return
+        bus = self.bus
+        view, writer = bus.write_pages[page], bus.writers[page]
+        if view is None and bus.read_pages[page] is not None:
+            return
+
+        if view is not None:
+            def write(address: int, value: int) -> None:
+                self.invalidate_page(page)
+                view[address & 0xFF] = value
+        else:
+            def write(address: int, value: int) -> None:
+                self.invalidate_page(page)
+                writer(address, value)
+
+        self.hooked[page] = (view, writer, write)
+        bus.write_pages[page] = None
+        bus.writers[page] = write
+
+    def unhook(self, page: int) -> None:
+        """Restores the page's original write mapping"""
+        hooked = self.hooked.pop(page, None)
+        if hooked is None:
+            return
+        view, writer, _ = hooked
+        self.bus.write_pages[page] = view
+        self.bus.writers[page] = writer
+
+    def remapped(self, pages: range) -> None:
+        """Called by the bus when pages are remapped, e.g. by a bank switch. Blocks decoded
+            from the old mapping are discarded and the new mapping is left unhooked. A
+            read-only mapping leaves the write handler alone, so if the hook is still
+            installed the handler it wrapped is put back."""
+        bus = self.bus
+        for page in pages:
+            hooked = self.hooked.pop(page, None)
+            if hooked is not None and bus.writers[page] is hooked[2]:
+                bus.writers[page] = hooked[1]
+            for pc in list(self.code_pages.get(page, ())):
+                self.invalidations += 1
+                block = self.blocks.pop(pc)
+                for other in block.pages:
+                    entries = self.code_pages.get(other)
+                    if entries is not None:
+                        entries.discard(pc)
+                        if not entries:
+                            del self.code_pages[other]
+                            if other not in pages:
+                                self.unhook(other)
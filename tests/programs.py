@@ -0,0 +1,83 @@
+# Author: Chase Smith
+# GitHub username: ChaseSmith67
+# Description: Test programs shared by the differential tests. Each runs forever and
+#               keeps its code and data in $0000-$07FF, so flat memory and the NES
+#               bus (which mirrors that RAM) see the same thing.
+
+import random
+
+from nes.assembler import assemble
+from nes.benchmark import WORKLOADS, PROGRAM_START
+
+# Arithmetic, shifts, compares, branches, the stack and every addressing mode, on data
+# in $0200-$03FF. Indexed zero page is only read, so the pointers at $20-$23 stay put.
+ALU_MIX = assemble("""
+        .org $0600
+start:  LDA #$00
+        STA $20
+        STA $22
+        LDA #$02
+        STA $21
+        LDA #$03
+        STA $23
+        LDX #$00
+loop:   LDA $0200,X
+        ADC $0300,X
+        STA $0300,X
+        ROL A
+        EOR $10
+        STA $10
+        ROR $11
+        SBC #$37
+        CMP $0201,X
+        BCC skip
+        INC $12
+skip:   BIT $10
+        BVS over
+        DEC $13
+over:   PHP
+        LSR A
+        ASL $0300,X
+        PLP
+        LDY $12
+        LDA ($20),Y
+        CPY #$80
+        BCS high
+        JSR mix
+high:   TXA
+        PHA
+        AND #$02
+        TAX
+        LDA ($20,X)
+        STA ($22),Y
+        PLA
+        TAX
+        LDA $0200,Y
+        ADC $0400,X
+        STA $0400,X
+        LDY $15,X
+        STY $11
+        LDX $16,Y
+        STX $17
+        TAX
+        CLV
+        SEC
+        INX
+        BNE loop
+        INC $18
+        JMP start
+mix:    SBC $12
+        ORA $0300,Y
+        AND $13
+        STA $0340,Y
+        CLC
+        RTS
+""")
+
+PROGRAMS = {name: (PROGRAM_START, program) for name, program in WORKLOADS.items()}
+PROGRAMS["alu_mix"] = (ALU_MIX.origin, ALU_MIX.data)
+
+
+def random_data(seed: int) -> bytes:
+    """Returns 512 reproducible random bytes for $0200-$03FF"""
+    return random.Random(seed).randbytes(0x200)
@@ -0,0 +1,21 @@
+# Author: Chase Smith
+# GitHub username: ChaseSmith67
+# Description: Builds small iNES images in memory for the tests.
+
+from nes.cartridge import Cartridge
+
+PRG_BANK = 0x4000
+CHR_BANK = 0x2000
+
+
+def make_rom(banks: list, mapper: int = 0, chr_banks: int = 1, vertical: bool = False) -> Cartridge:
+    """Returns a Cartridge whose PRG-ROM is the given 16KB banks, each padded with $EA
+        (NOP). The reset vector points at $8000 unless the last bank sets it."""
+    prg = bytearray()
+    for bank in banks:
+        prg += bytes(bank) + b"\xEA" * (PRG_BANK - len(bank))
+    if prg[-4:-2] == b"\xEA\xEA":
+        prg[-4:-2] = b"\x00\x80"
+    flags6 = ((mapper & 0x0F) << 4) | (1 if vertical else 0)
+    header = b"NES\x1a" + bytes([len(banks), chr_banks, flags6, mapper & 0xF0]) + bytes(8)
+    return Cartridge(header + bytes(prg) + bytes(chr_banks * CHR_BANK))
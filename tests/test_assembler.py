@@ -0,0 +1,52 @@
+# Author: Chase Smith
+# GitHub username: ChaseSmith67
+# Description: Tests for the assembler.
+
+from nes.assembler import Assembler, assemble
+
+
+def test_parse_cache_is_bounded():
+    """The cache keeps at most max_files files and reparses the ones it evicted"""
+    assembler = Assembler(max_files=4)
+    sources = [f"LDA #{value}\nRTS\n" for value in range(10)]
+    for source in sources:
+        assembler.assemble(source)
+    assert len(assembler.cache) == 4
+    assert assembler.parses == 10
+
+    assembler.assemble(sources[-1])
+    assert assembler.parses == 10
+    assembler.assemble(sources[0])
+    assert assembler.parses == 11
+    assert len(assembler.cache) == 4
+
+
+def test_parse_cache_keeps_recently_used():
+    """A hit moves the file to the back, so it outlives files parsed after it"""
+    assembler = Assembler(max_files=2)
+    first, second, third = (f"LDX #{value}\n" for value in range(3))
+    assembler.assemble(first)
+    assembler.assemble(second)
+    assembler.assemble(first)
+    assembler.assemble(third)
+    assembler.assemble(first)
+    assert assembler.parses == 3
+
+
+def test_tabs_separate_mnemonic_and_operand():
+    assert assemble("\tLDA\t#$10\n\tSTA\t$0200\n").data == bytes([0xA9, 0x10, 0x8D, 0x00, 0x02])
+
+
+def test_byte_arguments_honor_single_quotes():
+    assert assemble(".byte ',', 1, '\"', \"a,b\"\n").data == b',\x01"a,b'
+
+
+def test_deferred_constant_uses_pc_where_it_is_defined():
+    program = assemble("""
+        .org $0600
+        NOP
+gap = end - *
+        NOP
+end:    RTS
+""")
+    assert program.symbols["gap"] == 1
@@ -0,0 +1,73 @@
+# Author: Chase Smith
+# GitHub username: ChaseSmith67
+# Description: Tests that every lane of a BatchCPU runs exactly like its own CPU.
+
+import numpy as np
+import pytest
+
+from nes.batch_cpu import BatchCPU
+from nes.cpu6502 import CPU, Memory
+
+from programs import PROGRAMS, random_data
+
+LANES = 16
+
+
+def lane_cpus(program: bytes, origin: int) -> tuple:
+    """Returns a BatchCPU and a CPU per lane, each with different random data in
+        $0200-$03FF and different starting registers"""
+    batch = BatchCPU(LANES)
+    batch.load(origin, program)
+    batch.PC[:] = origin
+    rng = np.random.default_rng(7)
+    for register in (batch.A, batch.X, batch.Y):
+        register[:] = rng.integers(0, 0x100, LANES)
+    batch.P[:] = rng.integers(0, 0x100, LANES) & 0xCF
+    cpus = []
+    for lane in range(LANES):
+        data = random_data(lane)
+        batch.load(0x0200, data, lanes=lane)
+        memory = Memory()
+        memory.load(0x0200, data)
+        memory.load(origin, program)
+        cpu = CPU(memory)
+        state = batch.lane_state(lane)
+        for register in ("A", "X", "Y", "SP", "PC", "P"):
+            setattr(cpu.regs, register, state[register])
+        cpus.append(cpu)
+    return batch, cpus
+
+
+def assert_lanes_match(batch: BatchCPU, cpus: list) -> None:
+    for lane, cpu in enumerate(cpus):
+        state = batch.lane_state(lane)
+        assert not state["halted"]
+        for register in ("A", "X", "Y", "SP", "PC", "P"):
+            assert state[register] == getattr(cpu.regs, register), (lane, register)
+        assert state["cycles"] == cpu.cycles, lane
+        assert (batch.memory[lane, :0x800] == cpu.memory.get_memory()).all(), lane
+
+
+@pytest.mark.parametrize("name", sorted(PROGRAMS))
+def test_lanes_match_the_interpreter(name):
+    origin, program = PROGRAMS[name]
+    batch, cpus = lane_cpus(program, origin)
+    for _ in range(10):
+        batch.run(300)
+        for cpu in cpus:
+            for _ in range(300):
+                cpu.step()
+        assert_lanes_match(batch, cpus)
+
+
+def test_lanes_diverge_and_halt_independently():
+    # LDA $0200 / BEQ stop / JMP $0600 / stop: an illegal opcode
+    origin = 0x0600
+    program = bytes([0xAD, 0x00, 0x02, 0xF0, 0x03, 0x4C, 0x00, 0x06, 0x02])
+    batch = BatchCPU(4)
+    batch.load(origin, program)
+    batch.PC[:] = origin
+    batch.load(0x0200, b"\x01", lanes=[0, 2])
+    batch.run(30)
+    assert list(batch.halted) == [False, True, False, True]
+    assert list(batch.halted_at) == [0, 0x0608, 0, 0x0608]
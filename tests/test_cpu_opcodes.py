@@ -0,0 +1,382 @@
+# Author: Chase Smith
+# GitHub username: ChaseSmith67
+# Description: Checks every legal opcode's result, flags and cycle count against the
+#               6502 datasheet and a bit-by-bit reference written without the ALU
+#               tables, plus the vectors the flag-table rewrite fixed.
+
+import itertools
+
+import pytest
+
+from nes import alu
+from nes.cpu6502 import CPU, Memory
+from nes.instructions import opcode_table
+
+# Opcode: (mnemonic, addressing mode, cycles), from the datasheet. Cycles are without
+# the extra one for crossing a page (PAGE_PENALTY) or taking a branch.
+DATASHEET = {
+    0x69: ("ADC", "IMM", 2), 0x65: ("ADC", "ZP", 3), 0x75: ("ADC", "ZPX", 4), 0x6D: ("ADC", "ABS", 4),
+    0x7D: ("ADC", "ABX", 4), 0x79: ("ADC", "ABY", 4), 0x61: ("ADC", "IZX", 6), 0x71: ("ADC", "IZY", 5),
+    0x29: ("AND", "IMM", 2), 0x25: ("AND", "ZP", 3), 0x35: ("AND", "ZPX", 4), 0x2D: ("AND", "ABS", 4),
+    0x3D: ("AND", "ABX", 4), 0x39: ("AND", "ABY", 4), 0x21: ("AND", "IZX", 6), 0x31: ("AND", "IZY", 5),
+    0x0A: ("ASL", "ACC", 2), 0x06: ("ASL", "ZP", 5), 0x16: ("ASL", "ZPX", 6), 0x0E: ("ASL", "ABS", 6),
+    0x1E: ("ASL", "ABX", 7),
+    0x90: ("BCC", "REL", 2), 0xB0: ("BCS", "REL", 2), 0xF0: ("BEQ", "REL", 2), 0x30: ("BMI", "REL", 2),
+    0xD0: ("BNE", "REL", 2), 0x10: ("BPL", "REL", 2), 0x50: ("BVC", "REL", 2), 0x70: ("BVS", "REL", 2),
+    0x24: ("BIT", "ZP", 3), 0x2C: ("BIT", "ABS", 4),
+    0x00: ("BRK", "IMP", 7),
+    0x18: ("CLC", "IMP", 2), 0xD8: ("CLD", "IMP", 2), 0x58: ("CLI", "IMP", 2), 0xB8: ("CLV", "IMP", 2),
+    0xC9: ("CMP", "IMM", 2), 0xC5: ("CMP", "ZP", 3), 0xD5: ("CMP", "ZPX", 4), 0xCD: ("CMP", "ABS", 4),
+    0xDD: ("CMP", "ABX", 4), 0xD9: ("CMP", "ABY", 4), 0xC1: ("CMP", "IZX", 6), 0xD1: ("CMP", "IZY", 5),
+    0xE0: ("CPX", "IMM", 2), 0xE4: ("CPX", "ZP", 3), 0xEC: ("CPX", "ABS", 4),
+    0xC0: ("CPY", "IMM", 2), 0xC4: ("CPY", "ZP", 3), 0xCC: ("CPY", "ABS", 4),
+    0xC6: ("DEC", "ZP", 5), 0xD6: ("DEC", "ZPX", 6), 0xCE: ("DEC", "ABS", 6), 0xDE: ("DEC", "ABX", 7),
+    0xCA: ("DEX", "IMP", 2), 0x88: ("DEY", "IMP", 2),
+    0x49: ("EOR", "IMM", 2), 0x45: ("EOR", "ZP", 3), 0x55: ("EOR", "ZPX", 4), 0x4D: ("EOR", "ABS", 4),
+    0x5D: ("EOR", "ABX", 4), 0x59: ("EOR", "ABY", 4), 0x41: ("EOR", "IZX", 6), 0x51: ("EOR", "IZY", 5),
+    0xE6: ("INC", "ZP", 5), 0xF6: ("INC", "ZPX", 6), 0xEE: ("INC", "ABS", 6), 0xFE: ("INC", "ABX", 7),
+    0xE8: ("INX", "IMP", 2), 0xC8: ("INY", "IMP", 2),
+    0x4C: ("JMP", "ABS", 3), 0x6C: ("JMP", "IND", 5), 0x20: ("JSR", "ABS", 6),
+    0xA9: ("LDA", "IMM", 2), 0xA5: ("LDA", "ZP", 3), 0xB5: ("LDA", "ZPX", 4), 0xAD: ("LDA", "ABS", 4),
+    0xBD: ("LDA", "ABX", 4), 0xB9: ("LDA", "ABY", 4), 0xA1: ("LDA", "IZX", 6), 0xB1: ("LDA", "IZY", 5),
+    0xA2: ("LDX", "IMM", 2), 0xA6: ("LDX", "ZP", 3), 0xB6: ("LDX", "ZPY", 4), 0xAE: ("LDX", "ABS", 4),
+    0xBE: ("LDX", "ABY", 4),
+    0xA0: ("LDY", "IMM", 2), 0xA4: ("LDY", "ZP", 3), 0xB4: ("LDY", "ZPX", 4), 0xAC: ("LDY", "ABS", 4),
+    0xBC: ("LDY", "ABX", 4),
+    0x4A: ("LSR", "ACC", 2), 0x46: ("LSR", "ZP", 5), 0x56: ("LSR", "ZPX", 6), 0x4E: ("LSR", "ABS", 6),
+    0x5E: ("LSR", "ABX", 7),
+    0xEA: ("NOP", "IMP", 2),
+    0x09: ("ORA", "IMM", 2), 0x05: ("ORA", "ZP", 3), 0x15: ("ORA", "ZPX", 4), 0x0D: ("ORA", "ABS", 4),
+    0x1D: ("ORA", "ABX", 4), 0x19: ("ORA", "ABY", 4), 0x01: ("ORA", "IZX", 6), 0x11: ("ORA", "IZY", 5),
+    0x48: ("PHA", "IMP", 3), 0x08: ("PHP", "IMP", 3), 0x68: ("PLA", "IMP", 4), 0x28: ("PLP", "IMP", 4),
+    0x2A: ("ROL", "ACC", 2), 0x26: ("ROL", "ZP", 5), 0x36: ("ROL", "ZPX", 6), 0x2E: ("ROL", "ABS", 6),
+    0x3E: ("ROL", "ABX", 7),
+    0x6A: ("ROR", "ACC", 2), 0x66: ("ROR", "ZP", 5), 0x76: ("ROR", "ZPX", 6), 0x6E: ("ROR", "ABS", 6),
+    0x7E: ("ROR", "ABX", 7),
+    0x40: ("RTI", "IMP", 6), 0x60: ("RTS", "IMP", 6),
+    0xE9: ("SBC", "IMM", 2), 0xE5: ("SBC", "ZP", 3), 0xF5: ("SBC", "ZPX", 4), 0xED: ("SBC", "ABS", 4),
+    0xFD: ("SBC", "ABX", 4), 0xF9: ("SBC", "ABY", 4), 0xE1: ("SBC", "IZX", 6), 0xF1: ("SBC", "IZY", 5),
+    0x38: ("SEC", "IMP", 2), 0xF8: ("SED", "IMP", 2), 0x78: ("SEI", "IMP", 2),
+    0x85: ("STA", "ZP", 3), 0x95: ("STA", "ZPX", 4), 0x8D: ("STA", "ABS", 4), 0x9D: ("STA", "ABX", 5),
+    0x99: ("STA", "ABY", 5), 0x81: ("STA", "IZX", 6), 0x91: ("STA", "IZY", 6),
+    0x86: ("STX", "ZP", 3), 0x96: ("STX", "ZPY", 4), 0x8E: ("STX", "ABS", 4),
+    0x84: ("STY", "ZP", 3), 0x94: ("STY", "ZPX", 4), 0x8C: ("STY", "ABS", 4),
+    0xAA: ("TAX", "IMP", 2), 0xA8: ("TAY", "IMP", 2), 0xBA: ("TSX", "IMP", 2), 0x8A: ("TXA", "IMP", 2),
+    0x9A: ("TXS", "IMP", 2), 0x98: ("TYA", "IMP", 2),
+}
+
+# Reads that take a cycle more when the indexed address crosses a page
+PAGE_PENALTY = {opcode for opcode, (name, mode, _) in DATASHEET.items()
+                if mode in ("ABX", "ABY", "IZY") and name not in ("ASL", "LSR", "ROL", "ROR", "INC", "DEC",
+                                                                   "STA")}
+
+# Branches: flag tested and whether it must be set
+BRANCHES = {"BCC": (0x01, False), "BCS": (0x01, True), "BNE": (0x02, False), "BEQ": (0x02, True),
+            "BPL": (0x80, False), "BMI": (0x80, True), "BVC": (0x40, False), "BVS": (0x40, True)}
+
+LEGAL = sorted(DATASHEET)
+ORIGIN = 0x0300     # Where each instruction is placed
+TARGET = 0x0234     # Effective address of every memory operand outside the zero page
+IRQ_VECTOR = 0x4321
+
+# Operand bytes and register values that exercise carries, overflow, zero and sign
+VALUES = (0x00, 0x01, 0x3F, 0x40, 0x7F, 0x80, 0x81, 0xC0, 0xFE, 0xFF)
+
+
+def nz(value: int) -> int:
+    return (0x80 if value & 0x80 else 0) | (0x02 if value == 0 else 0)
+
+
+_cpu = None
+
+
+def shared_cpu() -> CPU:
+    """Returns the CPU every case runs on. setup() rewrites everything an instruction
+        reads, so nothing carries over between cases."""
+    global _cpu
+    if _cpu is None:
+        _cpu = CPU(Memory())
+    return _cpu
+
+
+def setup(opcode: int, a: int, m: int, p: int, x: int = 4, y: int = 4, base: int = TARGET - 4) -> tuple:
+    """Returns a CPU about to execute the opcode with the given registers, the memory
+        operand m at the address its mode resolves to, and that address"""
+    name, mode, _ = DATASHEET[opcode]
+    cpu = shared_cpu()
+    memory = cpu.memory
+    regs = cpu.regs
+    regs.A, regs.X, regs.Y, regs.P, regs.SP, regs.PC = a, x, y, p, 0xF0, ORIGIN
+    lo, hi = 0, 0
+    address = None
+    if name in ("JMP", "JSR") and mode == "ABS":
+        lo, hi = 0x78, 0x56
+    elif mode == "IMM":
+        lo = m
+    elif mode in ("ZP", "ZPX", "ZPY"):
+        lo = 0x10
+        address = (0x10 + {"ZP": 0, "ZPX": x, "ZPY": y}[mode]) & 0xFF
+    elif mode == "ABS":
+        lo, hi = TARGET & 0xFF, TARGET >> 8
+        address = TARGET
+    elif mode in ("ABX", "ABY"):
+        lo, hi = base & 0xFF, base >> 8
+        address = (base + (x if mode == "ABX" else y)) & 0xFFFF
+    elif mode == "IZX":
+        lo = 0x10
+        pointer = (0x10 + x) & 0xFF
+        memory.load(pointer, bytes([TARGET & 0xFF, TARGET >> 8]))
+        address = TARGET
+    elif mode == "IZY":
+        lo = 0x20
+        memory.load(0x20, bytes([base & 0xFF, base >> 8]))
+        address = (base + y) & 0xFFFF
+    elif mode == "IND":
+        lo, hi = 0x40, 0x02
+        memory.load(0x0240, bytes([0x78, 0x56]))
+    elif mode == "REL":
+        lo = m
+    memory.load(ORIGIN, bytes([opcode, lo, hi]))
+    if address is not None:
+        memory.write_mem(address, m)
+    # Stack contents for PLA/PLP/RTS/RTI, and the IRQ/BRK vector
+    memory.load(0x01F1, bytes([m, m, 0x12, 0x34]))
+    memory.load(0xFFFE, bytes([IRQ_VECTOR & 0xFF, IRQ_VECTOR >> 8]))
+    return cpu, address
+
+
+def reference(opcode: int, a: int, m: int, p: int, x: int = 4, y: int = 4) -> dict:
+    """Returns the registers, memory operand and cycles after the opcode, worked out bit
+        by bit from the datasheet"""
+    name, mode, cycles = DATASHEET[opcode]
+    sp = 0xF0
+    length = {"IMP": 1, "ACC": 1, "IMM": 2, "ZP": 2, "ZPX": 2, "ZPY": 2, "IZX": 2, "IZY": 2, "REL": 2}.get(mode, 3)
+    pc = ORIGIN + length
+    carry = p & 0x01
+    pushed = {}
+    if mode == "ACC":
+        m = a
+    if name in ("ADC", "SBC"):
+        operand = m if name == "ADC" else m ^ 0xFF
+        total = a + operand + carry
+        result = total & 0xFF
+        overflow = (a & 0x80) == (operand & 0x80) and (result & 0x80) != (a & 0x80)
+        p = (p & 0x3C) | nz(result) | (0x01 if total > 0xFF else 0) | (0x40 if overflow else 0)
+        a = result
+    elif name in ("AND", "ORA", "EOR"):
+        a = {"AND": a & m, "ORA": a | m, "EOR": a ^ m}[name]
+        p = (p & 0x7D) | nz(a)
+    elif name in ("LDA", "LDX", "LDY"):
+        p = (p & 0x7D) | nz(m)
+        if name == "LDA":
+            a = m
+        elif name == "LDX":
+            x = m
+        else:
+            y = m
+    elif name in ("CMP", "CPX", "CPY"):
+        register = {"CMP": a, "CPX": x, "CPY": y}[name]
+        difference = (register - m) & 0xFF
+        p = (p & 0x7C) | (0x80 if difference & 0x80 else 0) | (0x02 if register == m else 0) \
+            | (0x01 if register >= m else 0)
+    elif name == "BIT":
+        p = (p & 0x3D) | (m & 0xC0) | (0x02 if a & m == 0 else 0)
+    elif name in ("ASL", "LSR", "ROL", "ROR"):
+        if name == "ASL":
+            result, out = (m << 1) & 0xFF, m >> 7
+        elif name == "LSR":
+            result, out = m >> 1, m & 1
+        elif name == "ROL":
+            result, out = ((m << 1) & 0xFF) | carry, m >> 7
+        else:
+            result, out = (m >> 1) | (carry << 7), m & 1
+        p = (p & 0x7C) | nz(result) | out
+        if mode == "ACC":
+            a = result
+        else:
+            m = result
+    elif name in ("INC", "DEC"):
+        m = (m + (1 if name == "INC" else -1)) & 0xFF
+        p = (p & 0x7D) | nz(m)
+    elif name in ("INX", "DEX"):
+        x = (x + (1 if name == "INX" else -1)) & 0xFF
+        p = (p & 0x7D) | nz(x)
+    elif name in ("INY", "DEY"):
+        y = (y + (1 if name == "INY" else -1)) & 0xFF
+        p = (p & 0x7D) | nz(y)
+    elif name in ("STA", "STX", "STY"):
+        m = {"STA": a, "STX": x, "STY": y}[name]
+    elif name in ("TAX", "TAY", "TXA", "TYA", "TSX"):
+        value = {"TAX": a, "TAY": a, "TXA": x, "TYA": y, "TSX": sp}[name]
+        if name in ("TAX", "TSX"):
+            x = value
+        elif name == "TAY":
+            y = value
+        else:
+            a = value
+        p = (p & 0x7D) | nz(value)
+    elif name == "TXS":
+        sp = x
+    elif name in ("CLC", "CLD", "CLI", "CLV", "SEC", "SED", "SEI"):
+        bit = {"C": 0x01, "D": 0x08, "I": 0x04, "V": 0x40}[name[2]]
+        p = p | bit if name.startswith("SE") else p & ~bit & 0xFF
+    elif name == "PHA":
+        pushed[0x1F0] = a
+        sp = 0xEF
+    elif name == "PHP":
+        pushed[0x1F0] = p | 0x30
+        sp = 0xEF
+    elif name == "PLA":
+        a = m
+        p = (p & 0x7D) | nz(a)
+        sp = 0xF1
+    elif name == "PLP":
+        p = m & 0xCF
+        sp = 0xF1
+    elif name == "JMP":
+        pc = 0x5678
+    elif name == "JSR":
+        ret = ORIGIN + 2
+        pushed[0x1F0], pushed[0x1EF] = ret >> 8, ret & 0xFF
+        sp = 0xEE
+        pc = 0x5678
+    elif name == "RTS":
+        pc = ((m | (m << 8)) + 1) & 0xFFFF
+        sp = 0xF2
+    elif name == "RTI":
+        p = m & 0xCF
+        pc = m | 0x12 << 8
+        sp = 0xF3
+    elif name == "BRK":
+        ret = ORIGIN + 2
+        pushed[0x1F0], pushed[0x1EF], pushed[0x1EE] = ret >> 8, ret & 0xFF, p | 0x30
+        p |= 0x04
+        sp = 0xED
+        pc = IRQ_VECTOR
+    elif name in BRANCHES:
+        flag, taken_when_set = BRANCHES[name]
+        if bool(p & flag) == taken_when_set:
+            target = (pc + m - (0x100 if m & 0x80 else 0)) & 0xFFFF
+            cycles += 1 + ((pc ^ target) >> 8 != 0)
+            pc = target
+    return {"A": a, "X": x, "Y": y, "SP": sp, "PC": pc, "P": p, "M": m, "cycles": cycles, "pushed": pushed}
+
+
+def check(opcode: int, a: int, m: int, p: int, **kwargs) -> None:
+    cpu, address = setup(opcode, a, m, p, **kwargs)
+    expected = reference(opcode, a, m, p, **{key: kwargs[key] for key in ("x", "y") if key in kwargs})
+    if "base" in kwargs:
+        expected["cycles"] += 1 if opcode in PAGE_PENALTY else 0
+    cycles = cpu.step()
+    where = f"${opcode:02X} {DATASHEET[opcode][0]} {DATASHEET[opcode][1]} A={a:02X} M={m:02X} P={p:02X}"
+    regs = cpu.regs
+    actual = {"A": regs.A, "X": regs.X, "Y": regs.Y, "SP": regs.SP, "PC": regs.PC, "P": regs.P}
+    for register, value in actual.items():
+        assert value == expected[register], f"{where}: {register} is {value:02X}, expected {expected[register]:02X}"
+    assert cycles == expected["cycles"], f"{where}: took {cycles} cycles, expected {expected['cycles']}"
+    if address is not None:
+        assert cpu.memory.read_mem(address) == expected["M"], f"{where}: memory"
+    for stack, value in expected["pushed"].items():
+        assert cpu.memory.read_mem(stack) == value, f"{where}: stack ${stack:04X}"
+
+
+def test_opcode_table_matches_the_datasheet():
+    for opcode, entry in enumerate(opcode_table):
+        if entry is None:
+            assert opcode not in DATASHEET, f"${opcode:02X} is missing"
+            continue
+        handler, mode, _, cycles, penalty = entry
+        assert (handler.removesuffix("_A"), mode, cycles) == DATASHEET[opcode], f"${opcode:02X}"
+        assert penalty == (opcode in PAGE_PENALTY), f"${opcode:02X}"
+    assert len(DATASHEET) == 151
+
+
+@pytest.mark.parametrize("opcode", LEGAL, ids=lambda opcode: f"{opcode:02X}_{DATASHEET[opcode][0]}")
+def test_opcode(opcode):
+    # Every flag combination that matters (N, V, D, I, Z, C) with a spread of values
+    for a, m in itertools.product(VALUES, repeat=2):
+        for p in (0x00, 0x01, 0xC3, 0xCF):
+            check(opcode, a, m, p)
+
+
+@pytest.mark.parametrize("opcode", [opcode for opcode in LEGAL if DATASHEET[opcode][1] in ("ABX", "ABY", "IZY")],
+                         ids=lambda opcode: f"{opcode:02X}_{DATASHEET[opcode][0]}_{DATASHEET[opcode][1]}")
+def test_page_crossing(opcode):
+    check(opcode, 0x5A, 0xA5, 0x00, x=0x10, y=0x10, base=0x04F8)
+
+
+# ----- Vectors for what the flag tables changed
+
+
+def test_negative_is_bit_7_of_the_result():
+    for opcode, a, m in ((0xA9, 0x00, 0x80), (0x69, 0x70, 0x10), (0x09, 0x00, 0xC0), (0xE9, 0x00, 0x01)):
+        cpu, _ = setup(opcode, a, m, 0x01 if opcode == 0xE9 else 0x00)
+        cpu.step()
+        assert cpu.regs.P & alu.FLAG_N, f"${opcode:02X}"
+    # A result of $7F or $00 never sets it, whatever the operand
+    for opcode, a, m in ((0xA9, 0x00, 0x7F), (0x29, 0xFF, 0x7F), (0x49, 0x80, 0x80)):
+        cpu, _ = setup(opcode, a, m, 0x80)
+        cpu.step()
+        assert not cpu.regs.P & alu.FLAG_N, f"${opcode:02X}"
+
+
+@pytest.mark.parametrize("opcode", [0x0A, 0x4A, 0x2A, 0x6A, 0x06, 0x46, 0x26, 0x66])
+def test_shifts_set_n_and_z(opcode):
+    name = DATASHEET[opcode][0]
+    # A shift that leaves zero, and one that leaves bit 7 set
+    zero = {"ASL": 0x80, "LSR": 0x01, "ROL": 0x80, "ROR": 0x01}[name]
+    cpu, address = setup(opcode, zero, zero, 0x80)
+    cpu.step()
+    assert cpu.regs.P & (alu.FLAG_N | alu.FLAG_Z | alu.FLAG_C) == alu.FLAG_Z | alu.FLAG_C
+    negative = {"ASL": 0x40, "LSR": 0x01, "ROL": 0x40, "ROR": 0x00}[name]
+    cpu, address = setup(opcode, negative, negative, 0x01 if name == "ROR" else 0x00)
+    cpu.step()
+    if name == "LSR":
+        # LSR always clears N
+        assert not cpu.regs.P & alu.FLAG_N
+    else:
+        assert cpu.regs.P & alu.FLAG_N
+
+
+def test_rotate_tables_take_the_carry_in():
+    for carry in (0, 1):
+        for value in range(256):
+            result, flags = alu.ROL[(carry << 8) | value]
+            assert result == ((value << 1) & 0xFF) | carry
+            assert flags == nz(result) | (value >> 7)
+            result, flags = alu.ROR[(carry << 8) | value]
+            assert result == (value >> 1) | (carry << 7)
+            assert flags == nz(result) | (value & 1)
+
+
+def test_rotates_shift_the_carry_through():
+    # ROL A with carry set: $80 -> $01, carry out set
+    cpu, _ = setup(0x2A, 0x80, 0, 0x01)
+    cpu.step()
+    assert (cpu.regs.A, cpu.regs.P & 0x83) == (0x01, 0x01)
+    # ROR memory with carry set: $01 -> $80, carry out set, N set
+    cpu, address = setup(0x66, 0, 0x01, 0x01)
+    cpu.step()
+    assert (cpu.memory.read_mem(address), cpu.regs.P & 0x83) == (0x80, 0x81)
+
+
+def test_compare_table():
+    assert len(alu.COMPARE) == 0x10000
+    for register in range(256):
+        for memory in range(256):
+            flags = alu.COMPARE[(register << 8) | memory]
+            assert flags & alu.FLAG_C == (alu.FLAG_C if register >= memory else 0)
+            assert flags & alu.FLAG_Z == (alu.FLAG_Z if register == memory else 0)
+            assert flags & alu.FLAG_N == ((register - memory) & 0x80)
+            assert not flags & ~(alu.FLAG_N | alu.FLAG_Z | alu.FLAG_C)
+
+
+def test_compare_sign_comes_from_the_difference():
+    # $10 - $F0 = $20: carry clear and N clear, though the operand is negative
+    cpu, _ = setup(0xC9, 0x10, 0xF0, 0x00)
+    cpu.step()
+    assert cpu.regs.P & 0x83 == 0x00
+    # $F0 - $10 = $E0: carry set and N set
+    cpu, _ = setup(0xC9, 0xF0, 0x10, 0x00)
+    cpu.step()
+    assert cpu.regs.P & 0x83 == 0x81
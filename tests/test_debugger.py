@@ -0,0 +1,59 @@
+# Author: Chase Smith
+# GitHub username: ChaseSmith67
+# Description: Tests for the debugger's breakpoints and watchpoints.
+
+from nes.assembler import assemble
+from nes.cpu6502 import CPU, Memory
+from nes.debugger import Debugger
+
+# Calls a subroutine on page 3 until X reaches 100, then writes X to the same page
+COUNTER = assemble("""
+        .org $0300
+sub:    RTS
+        .org $0400
+loop:   INX
+        JSR sub
+        CPX #100
+        BNE loop
+        STX $03F0
+done:   JMP done
+""", origin=0x0300)
+
+
+def test_watchpoint_on_a_translated_page():
+    memory = Memory()
+    COUNTER.load_into(memory)
+    cpu = CPU(memory)
+    cpu.set_pc(0x0400)
+    cpu.enable_translation()
+    cpu.run(500)
+    assert 3 in cpu.translator.hooked
+
+    debugger = Debugger(cpu)
+    debugger.add_watchpoint(0x03F0, write=True)
+    cpu.run(5000)
+
+    assert cpu.stopped
+    assert debugger.hit is not None
+    assert (debugger.hit.kind, debugger.hit.address) == ("write", 0x03F0)
+    assert cpu.regs.X == 100
+
+
+def test_breakpoint_stops_single_stepping():
+    memory = Memory()
+    COUNTER.load_into(memory)
+    cpu = CPU(memory)
+    cpu.set_pc(0x0400)
+    debugger = Debugger(cpu)
+    debugger.add_breakpoint(0x0300)
+
+    assert cpu.step() == 2          # INX
+    assert cpu.step() == 6          # JSR sub
+    assert cpu.step() == 0
+    assert cpu.stopped and debugger.stopped
+    assert cpu.regs.PC == 0x0300
+    assert debugger.hit.kind == "break"
+
+    assert debugger.step() == 6     # RTS, run past the breakpoint
+    assert not cpu.stopped
+    assert cpu.regs.PC == 0x0404
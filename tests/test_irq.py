@@ -0,0 +1,172 @@
+# Author: Chase Smith
+# GitHub username: ChaseSmith67
+# Description: Tests for the level-triggered IRQ line and where it is taken.
+
+import pytest
+
+from nes.assembler import assemble
+from nes.cpu6502 import CPU, Memory, IRQ_MAPPER
+from nes.scheduler import Scheduler
+
+# Asserts nothing itself: the tests hold the line from scheduler events
+MASKED_THEN_UNMASKED = assemble("""
+        .org $0600
+        SEI
+        LDX #$00
+        INX
+        INX
+        INX
+        CLI
+after:  INX
+        INX
+wait:   JMP wait
+        .org $0700
+irq:    STX $10
+        LDA #$01
+        STA $11
+done:   JMP done
+""")
+
+
+def system_with(program, translated: bool) -> tuple:
+    memory = Memory()
+    program.load_into(memory)
+    memory.load(0xFFFE, bytes([program.symbols["irq"] & 0xFF, program.symbols["irq"] >> 8]))
+    cpu = CPU(memory)
+    cpu.set_pc(program.origin)
+    if translated:
+        cpu.enable_translation()
+    return memory, cpu, Scheduler(cpu)
+
+
+@pytest.mark.parametrize("translated", (False, True))
+def test_irq_held_while_masked_is_taken_when_unmasked(translated):
+    memory, cpu, scheduler = system_with(MASKED_THEN_UNMASKED, translated)
+    scheduler.schedule(4, lambda cycle: cpu.set_irq(IRQ_MAPPER, True))
+    scheduler.run(200)
+    # Taken straight after CLI, with the return address of the next instruction
+    assert memory.read_mem(0x10) == 3
+    after = MASKED_THEN_UNMASKED.symbols["after"]
+    assert (memory.read_mem(0x1FE), memory.read_mem(0x1FF)) == (after & 0xFF, after >> 8)
+    # Taking it masked further IRQs, so the held line doesn't re-enter the handler
+    assert cpu.regs.PC == MASKED_THEN_UNMASKED.symbols["done"]
+    assert cpu.regs.SP == 0xFC
+
+
+@pytest.mark.parametrize("translated", (False, True))
+def test_released_irq_is_not_taken(translated):
+    memory, cpu, scheduler = system_with(MASKED_THEN_UNMASKED, translated)
+    scheduler.schedule(4, lambda cycle: cpu.set_irq(IRQ_MAPPER, True))
+    scheduler.schedule(8, lambda cycle: cpu.set_irq(IRQ_MAPPER, False))
+    scheduler.run(200)
+    assert memory.read_mem(0x11) == 0
+    assert cpu.regs.PC == MASKED_THEN_UNMASKED.symbols["wait"]
+
+
+# Masks interrupts while a device raises its IRQ, then unmasks them and records the
+# handler's count straight after CLI. The handler acknowledges through ACKNOWLEDGE.
+DEVICE_MASKED = """
+        .org $0600
+        SEI
+        {setup}
+        LDX #$00
+        LDY #$00
+delay:  DEY
+        BNE delay
+        DEX
+        BNE delay
+        CLI
+        LDA $11
+        STA $13
+wait:   JMP wait
+        .org $0700
+irq:    {acknowledge}
+        INC $11
+        RTI
+"""
+
+
+def masked_system(setup: str, acknowledge: str, cartridge=None) -> tuple:
+    from nes.main import System
+
+    program = assemble(DEVICE_MASKED.format(setup=setup, acknowledge=acknowledge))
+    system = System()
+    if cartridge is not None:
+        system.insert_cartridge(cartridge)
+    else:
+        system.memory.load(0xFFFE, b"\x00\x07")
+    program.load_into(system.memory)
+    system.cpu.set_pc(program.origin)
+    return system, program
+
+
+def test_frame_irq_raised_while_masked_is_taken_at_cli():
+    system, _ = masked_system("", "LDA $4015\n        STA $10")
+    # The delay loop is far longer than a frame sequence
+    system.scheduler.run(400000)
+    memory = system.memory
+    assert memory.read_mem(0x13) == 1
+    assert memory.read_mem(0x10) & 0x40
+    assert system.cpu.irq_line == 0
+
+
+def test_dmc_irq_raised_while_masked_is_taken_at_cli():
+    # One-byte sample at the fastest rate with its IRQ enabled, and the frame IRQ off
+    setup = """LDA #$40
+        STA $4017
+        LDA #$8F
+        STA $4010
+        LDA #$00
+        STA $4012
+        STA $4013
+        LDA #$10
+        STA $4015"""
+    system, _ = masked_system(setup, "LDA $4015\n        STA $10\n        LDA #$00\n        STA $4015")
+    system.scheduler.run(400000)
+    memory = system.memory
+    assert memory.read_mem(0x13) == 1
+    assert memory.read_mem(0x11) == 1
+    assert memory.read_mem(0x10) & 0x80
+    assert system.cpu.irq_line == 0
+
+
+def test_mmc3_irq_raised_while_masked_is_taken_at_cli():
+    from roms import make_rom
+
+    # IRQ vector -> $0700
+    last = bytes(0x3FFE) + b"\x00\x07"
+    setup = """LDA #$40
+        STA $4017
+        LDA #$08
+        STA $2001
+        LDA #$05
+        STA $C000
+        STA $C001
+        STA $E001"""
+    system, _ = masked_system(setup, "STA $E000", make_rom([bytes(0x4000), last], mapper=4))
+    system.scheduler.run(400000)
+    memory = system.memory
+    # Writing $E000 acknowledges and disables the counter's IRQ
+    assert memory.read_mem(0x13) == 1
+    assert memory.read_mem(0x11) == 1
+    assert system.cpu.irq_line == 0
+
+
+def test_acknowledging_releases_the_line():
+    from nes.cpu6502 import IRQ_FRAME
+    from nes.main import System
+    from roms import make_rom
+
+    system = System()
+    system.insert_cartridge(make_rom([bytes(0x4000)] * 2, mapper=4))
+    cpu, memory, mapper = system.cpu, system.memory, system.cartridge.mapper
+    mapper.set_irq_pending(True)
+    assert cpu.irq_line == IRQ_MAPPER
+    memory.write_mem(0xE000, 0)
+    assert cpu.irq_line == 0
+
+    system.apu.frame_irq = 1
+    system.apu.update_irq()
+    assert cpu.irq_line == IRQ_FRAME
+    assert memory.read_mem(0x4015) & 0x40
+    assert cpu.irq_line == 0
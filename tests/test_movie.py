@@ -0,0 +1,85 @@
+# Author: Chase Smith
+# GitHub username: ChaseSmith67
+# Description: Tests for recording and playing back input movies.
+
+from nes.assembler import assemble
+from nes.main import System
+from nes.movie import Movie, Recorder, play
+
+from roms import make_rom
+
+# Every frame the NMI reads controller 1 and adds the buttons held to a running total
+ADDING = assemble("""
+        .org $8000
+start:  SEI
+        LDA #$80
+        STA $2000
+loop:   JMP loop
+nmi:    LDA #$01
+        STA $4016
+        LDA #$00
+        STA $4016
+        LDX #$08
+read:   LDA $4016
+        LSR A
+        ROL $10
+        DEX
+        BNE read
+        CLC
+        LDA $10
+        ADC $11
+        STA $11
+        RTI
+        .org $FFFA
+        .word nmi, start, start
+""")
+
+
+def adding_system() -> System:
+    system = System()
+    system.insert_cartridge(make_rom([ADDING.data[:0x4000], ADDING.data[0x4000:]]))
+    return system
+
+
+def record(system: System, frames: int, **options) -> Movie:
+    recorder = Recorder(system, **options)
+    for frame in range(frames):
+        system.controllers[0].set_buttons(frame * 37)
+        system.controllers[1].set_buttons(frame)
+        system.run_frame()
+        recorder.record()
+    return recorder.movie
+
+
+def test_recording_from_power_on_plays_back():
+    system = adding_system()
+    movie = Movie.from_bytes(record(system, 30, power_on=True).to_bytes())
+    assert movie.state is None
+    assert movie.frames == 30
+    assert movie.buttons(5) == (5 * 37 & 0xFF, 5)
+
+    result = play(adding_system(), movie)
+    assert result["divergence"] is None
+    assert result["checked"] == 30
+
+
+def test_recording_from_a_savestate_plays_back():
+    system = adding_system()
+    for _ in range(10):
+        system.run_frame()
+    movie = record(system, 20, interval=4)
+    assert movie.state is not None
+    assert len(movie.hashes) == 5
+    expected = system.memory.read_mem(0x11)
+
+    other = adding_system()
+    result = play(other, movie)
+    assert result["divergence"] is None
+    assert result["checked"] == 5
+    assert other.memory.read_mem(0x11) == expected
+
+
+def test_different_input_diverges():
+    movie = record(adding_system(), 30, power_on=True)
+    movie.inputs[10 * 2] ^= 0x01
+    assert play(adding_system(), movie)["divergence"]["frame"] == 11
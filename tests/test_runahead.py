@@ -0,0 +1,69 @@
+# Author: Chase Smith
+# GitHub username: ChaseSmith67
+# Description: Tests for run-ahead's video and audio output.
+
+import numpy as np
+
+from nes.assembler import assemble
+from nes.cartridge import Cartridge
+from nes.main import System
+from nes.runahead import RunAhead
+
+from roms import make_rom
+
+# Every frame the NMI changes the backdrop colour and the pitch of pulse 1
+CHANGING = assemble("""
+        .org $8000
+start:  SEI
+        LDA #$40
+        STA $4017
+        LDA #$01
+        STA $4015
+        LDA #$BF
+        STA $4000
+        LDA #$80
+        STA $2000
+loop:   JMP loop
+nmi:    INC $10
+        LDA #$3F
+        STA $2006
+        LDA #$00
+        STA $2006
+        LDA $10
+        AND #$3F
+        STA $2007
+        LDA $10
+        STA $4002
+        LDA #$08
+        STA $4003
+        RTI
+        .org $FFFA
+        .word nmi, start, start
+""")
+
+
+def recorded(frames: int, run_ahead: int = 0) -> tuple:
+    """Returns the frames shown, the audio output for each frame and the final RAM"""
+    system = System()
+    system.insert_cartridge(make_rom([CHANGING.data[:0x4000], CHANGING.data[0x4000:]]))
+    shown, audio = [], []
+    system.ppu.output_listeners.append(lambda ppu: shown.append(ppu.frame.copy()))
+    system.apu.output_listeners.append(lambda apu, samples: audio.append(samples.copy()))
+    runner = RunAhead(system, run_ahead, auto_disable=False)
+    for _ in range(frames):
+        runner.run_frame()
+    return shown, audio, system.memory.get_memory().copy()
+
+
+def test_run_ahead_shows_future_video_and_plays_real_audio():
+    plain_video, plain_audio, _ = recorded(22)
+    video, audio, ram = recorded(20, run_ahead=2)
+    assert len(video) == 20
+    for frame in range(20):
+        assert (video[frame] == plain_video[frame + 2]).all(), frame
+    # The same samples, though a frame's may arrive in more than one piece
+    audio, plain_audio = np.concatenate(audio), np.concatenate(plain_audio)
+    assert audio.size > 19 * plain_audio.size // 22
+    assert (audio == plain_audio[:audio.size]).all()
+    # The real timeline is where it would be without run-ahead
+    assert recorded(20)[2].tobytes() == ram.tobytes()
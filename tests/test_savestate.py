@@ -0,0 +1,62 @@
+# Author: Chase Smith
+# GitHub username: ChaseSmith67
+# Description: Tests for savestates.
+
+import struct
+
+import pytest
+
+from nes.main import System
+from nes.savestate import save_state, load_state, VERSION
+
+from roms import make_rom
+
+
+def running_system() -> System:
+    system = System()
+    system.insert_cartridge(make_rom([b"\x4C\x00\x80"]))
+    system.run_frame()
+    return system
+
+
+def read_buttons(system: System, port: int, count: int) -> list:
+    return [system.memory.read_mem(0x4016 + port) & 1 for _ in range(count)]
+
+
+def test_controller_read_in_progress_survives_a_load():
+    system = running_system()
+    system.controllers[0].set_buttons(0b10110101)
+    system.controllers[1].set_buttons(0b01001010)
+    system.memory.write_mem(0x4016, 1)
+    system.memory.write_mem(0x4016, 0)
+    first = read_buttons(system, 0, 3)
+    state = save_state(system)
+    expected = read_buttons(system, 0, 6), read_buttons(system, 1, 8)
+
+    # Input changes and a new strobe, then back to the saved point
+    system.controllers[0].set_buttons(0)
+    system.controllers[1].set_buttons(0xFF)
+    system.memory.write_mem(0x4016, 1)
+    load_state(system, state)
+    assert first == [1, 0, 1]
+    assert (read_buttons(system, 0, 6), read_buttons(system, 1, 8)) == expected
+    assert system.controllers[0].buttons == 0b10110101
+
+
+def test_strobe_is_restored():
+    system = running_system()
+    system.memory.write_mem(0x4016, 1)
+    state = save_state(system)
+    system.memory.write_mem(0x4016, 0)
+    load_state(system, state)
+    system.controllers[0].set_buttons(0x01)
+    # Still strobing: every read returns A
+    assert read_buttons(system, 0, 3) == [1, 1, 1]
+
+
+def test_older_versions_are_rejected():
+    system = running_system()
+    state = bytearray(save_state(system))
+    struct.pack_into("<H", state, 4, VERSION - 1)
+    with pytest.raises(ValueError, match="version"):
+        load_state(system, bytes(state))
@@ -0,0 +1,165 @@
+# Author: Chase Smith
+# GitHub username: ChaseSmith67
+# Description: Tests for the basic-block translator.
+
+import pytest
+
+from nes.assembler import assemble
+from nes.cpu6502 import CPU, Memory
+
+from programs import PROGRAMS, random_data
+from roms import make_rom
+
+# Fixed UxROM bank at $C000, with the reset vector pointing at it:
+#   LDX #$00 / loop: INX / TXA / AND #$03 / STA $FFF0 / JSR $8000 / JMP loop
+FIXED_BANK_LOOP = bytes([0xA2, 0x00, 0xE8, 0x8A, 0x29, 0x03, 0x8D, 0xF0, 0xFF, 0x20, 0x00, 0x80,
+                         0x4C, 0x02, 0xC0]).ljust(0x3FFC, b"\xEA") + b"\x00\xC0"
+
+# Every switchable bank: RTS
+SWITCHED_BANK = bytes([0x60])
+
+# Cycles per trip around the loop
+LOOP_CYCLES = 25
+
+
+def test_bank_switches_do_not_stack_write_hooks():
+    cartridge = make_rom([SWITCHED_BANK] * 7 + [FIXED_BANK_LOOP], mapper=2)
+    memory = Memory()
+    cartridge.attach(memory)
+    cpu = CPU(memory)
+    cpu.reset()
+    cpu.enable_translation()
+
+    # Each switch remaps $8000-$BFFF while the RTS decoded there is translated
+    cpu.run(LOOP_CYCLES * 5000)
+
+    mapper = cartridge.mapper
+    assert cpu.regs.X == 5000 & 0xFF
+    assert mapper.bank == 5000 & 0x03
+    # PRG-ROM is read-only, so its pages are never hooked
+    assert 0x80 not in cpu.translator.hooked
+    assert memory.writers[0x80] == mapper.write
+
+    # Goes straight to the mapper, not through thousands of stale hooks
+    memory.write_mem(0x8000, 1)
+    assert mapper.bank == 1
+
+
+# MMC3 code in the fixed bank at $E000 that keeps rewriting a CHR bank register:
+#   LDX #$00 / loop: LDA #$00 / STA $8000 / STX $8001 / INX / JMP loop
+CHR_SWITCH_LOOP = (bytes(0x2000) + bytes([0xA2, 0x00, 0xA9, 0x00, 0x8D, 0x00, 0x80, 0x8E, 0x01, 0x80, 0xE8,
+                                          0x4C, 0x02, 0xE0]).ljust(0x1FFC, b"\xEA") + b"\x00\xE0")
+
+
+def test_mapper_register_writes_keep_translated_code():
+    cartridge = make_rom([b"", CHR_SWITCH_LOOP], mapper=4, chr_banks=2)
+    memory = Memory()
+    cartridge.attach(memory)
+    cpu = CPU(memory)
+    cpu.reset()
+    cpu.enable_translation()
+    cpu.run(20000)
+
+    # Only the CHR mapping changes, so the loop is translated once and never discarded
+    assert cartridge.mapper.chr_offsets[0] != 0
+    assert cpu.translator.invalidations == 0
+    assert cpu.translator.misses <= 4
+
+
+def interpreter_and_translator(program: bytes, origin: int, data: bytes = b"") -> tuple:
+    """Returns two CPUs loaded with the same program and data, the second translating"""
+    cpus = []
+    for translated in (False, True):
+        memory = Memory()
+        memory.load(0x0200, data)
+        memory.load(origin, program)
+        cpu = CPU(memory)
+        cpu.set_pc(origin)
+        if translated:
+            cpu.enable_translation()
+        cpus.append(cpu)
+    return tuple(cpus)
+
+
+def catch_up(interpreter: CPU, translated: CPU) -> None:
+    """Steps the interpreter to the translated CPU's cycle count. Blocks end on
+        instruction boundaries, so the counts meet exactly."""
+    while interpreter.cycles < translated.cycles:
+        interpreter.step()
+    assert interpreter.cycles == translated.cycles
+
+
+def assert_same_state(interpreter: CPU, translated: CPU) -> None:
+    for register in ("A", "X", "Y", "SP", "PC", "P"):
+        assert getattr(translated.regs, register) == getattr(interpreter.regs, register), register
+    assert (translated.memory.get_memory() == interpreter.memory.get_memory()).all()
+
+
+@pytest.mark.parametrize("name", sorted(PROGRAMS))
+def test_translated_programs_match_the_interpreter(name):
+    origin, program = PROGRAMS[name]
+    interpreter, translated = interpreter_and_translator(program, origin, random_data(1))
+    for _ in range(20):
+        translated.run(997)
+        catch_up(interpreter, translated)
+        assert_same_state(interpreter, translated)
+
+
+@pytest.mark.parametrize("source", [
+    # The store changes an instruction in an earlier block
+    """
+            .org $0600
+    loop:   LDA #$00
+            STA $0200
+            JMP next
+    next:   INC loop + 1
+            CLC
+            ADC $0201
+            STA $0201
+            JMP loop
+    """,
+    # The store changes the next instruction in its own block
+    """
+            .org $0600
+    loop:   LDX $0200
+            INX
+            STX $0200
+            STX patch + 1
+            CLC
+    patch:  LDA #$00
+            ADC $0201
+            STA $0201
+            JMP loop
+    """,
+])
+def test_self_modifying_code_invalidates_blocks(source):
+    program = assemble(source)
+    interpreter, translated = interpreter_and_translator(program.data, program.origin)
+    for _ in range(10):
+        translated.run(1000)
+        catch_up(interpreter, translated)
+        assert_same_state(interpreter, translated)
+    assert translated.translator.invalidations
+
+
+def test_translated_bank_switches_match_the_interpreter():
+    # Fixed bank at $C000: LDX #$00 / loop: INX / TXA / AND #$03 / STA $FFF0 /
+    # LDA $10 / JSR $8000 / STA $10 / JMP loop
+    fixed = bytes([0xA2, 0x00, 0xE8, 0x8A, 0x29, 0x03, 0x8D, 0xF0, 0xFF, 0xA5, 0x10, 0x20, 0x00, 0x80,
+                   0x85, 0x10, 0x4C, 0x02, 0xC0]).ljust(0x3FFC, b"\xEA") + b"\x00\xC0"
+    # Bank n: CLC / ADC #(3n + 1) / RTS
+    banks = [bytes([0x18, 0x69, 3 * bank + 1, 0x60]) for bank in range(7)]
+    cpus = []
+    for translated in (False, True):
+        memory = Memory()
+        make_rom(banks + [fixed], mapper=2).attach(memory)
+        cpu = CPU(memory)
+        cpu.reset()
+        if translated:
+            cpu.enable_translation()
+        cpus.append(cpu)
+    interpreter, translated = cpus
+    for _ in range(20):
+        translated.run(5000)
+        catch_up(interpreter, translated)
+        assert_same_state(interpreter, translated)